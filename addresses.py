@@ -0,0 +1,159 @@
+"""
+    normalizing the e-mail addresses found in calendars, shared by Contact and
+    CalendarEvent. The results are memoized since the same few addresses turn
+    up in event after event
+"""
+from functools import lru_cache
+import re
+import sys
+from typing import Dict, Iterable, Pattern, Tuple
+
+# room and resource calendars, not people
+_DEFAULT_IGNORED_DOMAINS = ("calendar.google.com",)
+_CACHE_SIZE = 65536
+
+_ignored_domains: Tuple[str, ...] = _DEFAULT_IGNORED_DOMAINS
+_ignored_patterns: Tuple[Pattern[str], ...] = ()
+# the first spelling seen of each address in a calendar, so the names inferred
+# from it keep the case the calendar used
+_spellings: Dict[str, str] = {}
+
+
+def configure(
+    ignored_domains: Iterable[str] | None = None,
+    ignored_patterns: Iterable[str] | None = None,
+) -> None:
+    """
+    configure set the rules for the addresses that aren't people, like rooms
+    and mailing lists
+
+    Args:
+        ignored_domains (Iterable[str] | None, optional): addresses ending with
+        any of these are ignored. Defaults to None, which ignores google
+        calendar resources.
+        ignored_patterns (Iterable[str] | None, optional): regular expressions,
+        addresses matching any of them are ignored. Defaults to None.
+
+    Raises:
+        re.error: if a pattern isn't a valid regular expression
+    """
+    global _ignored_domains, _ignored_patterns  # pylint: disable=W0603,C0103
+    if ignored_domains is None:
+        ignored_domains = _DEFAULT_IGNORED_DOMAINS
+    _ignored_domains = tuple(domain.strip().lower() for domain in ignored_domains)
+    _ignored_patterns = tuple(
+        re.compile(pattern, re.IGNORECASE) for pattern in ignored_patterns or ()
+    )
+    is_ignored.cache_clear()
+    parse_person.cache_clear()
+
+
+def rules() -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """
+    rules get the current rules, to pass to configure in another process
+
+    Returns:
+        Tuple[Tuple[str, ...], Tuple[str, ...]]: the ignored domains and patterns
+    """
+    return _ignored_domains, tuple(pattern.pattern for pattern in _ignored_patterns)
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def canonical(address: str) -> str:
+    """
+    canonical get the form of an address used to compare it, without the
+    mailto: prefix or surrounding whitespace and in lower case
+
+    Args:
+        address (str): the address
+
+    Returns:
+        str: the canonical address, interned
+    """
+    return sys.intern(_strip(address).lower())
+
+
+def _strip(address: str) -> str:
+    """
+    _strip get an address without the mailto: prefix or surrounding
+    whitespace, in the case it was written
+
+    Args:
+        address (str): the address
+
+    Returns:
+        str: the address
+    """
+    address = address.strip()
+    if address[:7].lower() == "mailto:":
+        address = address[7:].strip()
+    return address
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def is_ignored(address: str) -> bool:
+    """
+    is_ignored check an address against the rules for addresses that aren't
+    people
+
+    Args:
+        address (str): the canonical address
+
+    Returns:
+        bool: True if the address should be left out
+    """
+    if address.endswith(_ignored_domains):
+        return True
+    return any(pattern.search(address) for pattern in _ignored_patterns)
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def parse_person(event_person: str) -> str:
+    """
+    parse_person given an organizer or attendee from an event, get the
+    canonical address of the person
+
+    Args:
+        event_person (str): the organizer or attendee
+
+    Returns:
+        str: the canonical address, or an empty string if it isn't a person
+    """
+    address = canonical(event_person)
+    if is_ignored(address):
+        return ""
+    _spellings.setdefault(address, _strip(event_person))
+    return address
+
+
+def spelling(address: str) -> str:
+    """
+    spelling get an address as a calendar first wrote it, for an address
+    parse_person has seen, otherwise as it's given without the mailto: prefix
+
+    Args:
+        address (str): the address, canonical or not
+
+    Returns:
+        str: the address in its original case
+    """
+    address = _strip(address)
+    return _spellings.get(address, address)
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def infer_name(address: str) -> Tuple[str, str]:
+    """
+    infer_name guess a name from the part of an address before the @, a
+    first.last address gives a first and last name, anything else just a
+    first name
+
+    Args:
+        address (str): the address
+
+    Returns:
+        Tuple[str, str]: the first and last name, the last name may be empty
+    """
+    name = address.partition("@")[0]
+    first_name, _, last_name = name.partition(".")
+    return first_name, last_name
@@ -0,0 +1,363 @@
+"""
+    meeting analytics over expanded calendar events: hours per person, week and
+    organizer, who meets with whom, back-to-back meetings and focus time. The
+    events are turned into numpy arrays once and every statistic is computed
+    with array operations rather than loops over the events
+"""
+import argparse
+import datetime
+import json
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from calendar_event import CalendarEvent
+
+_DAY = 24 * 60 * 60
+_WEEK = 7 * _DAY
+# 1970-01-01 was a Thursday, weeks start on the Monday after
+_FIRST_MONDAY = 4 * _DAY
+_BACK_TO_BACK_GAP = 5 * 60
+_FOCUS_GAP = 2 * 60 * 60
+# larger meetings, all hands and the like, say little about who works together
+# and would dominate the pairs, as in contact_graph
+_MAX_MEETING_SIZE = 50
+
+
+def _epoch_seconds(value: datetime.datetime) -> int:
+    """
+    _epoch_seconds get a time as seconds since the epoch, a time without a
+    timezone is taken to be in UTC
+
+    Args:
+        value (datetime.datetime): the time
+
+    Returns:
+        int: the seconds
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return int(value.timestamp())
+
+
+class EventArrays:
+    """
+    the events as arrays. Events are numbered in the order they were given and
+    people in the order they were first seen; start and end are seconds since
+    the epoch. Every (event, person) pair where the person organized or
+    attended the event is a row of participant_event and participant_person,
+    sorted by person and then start time
+    """
+
+    def __init__(self, events: Iterable[CalendarEvent]) -> None:
+        """
+        __init__ build the arrays, all day events are left out since they don't
+        take up meeting time
+
+        Args:
+            events (Iterable[CalendarEvent]): the events
+        """
+        person_ids: Dict[str, int] = {}
+        starts: List[int] = []
+        ends: List[int] = []
+        organizers: List[int] = []
+        participant_events: List[int] = []
+        participant_people: List[int] = []
+        for cal_event in events:
+            if not isinstance(cal_event.start, datetime.datetime):
+                continue
+            index = len(starts)
+            starts.append(_epoch_seconds(cal_event.start))
+            ends.append(_epoch_seconds(cal_event.end))
+            organizer = -1
+            if cal_event.organizer:
+                organizer = person_ids.setdefault(cal_event.organizer, len(person_ids))
+            organizers.append(organizer)
+            people = {
+                person_ids.setdefault(person, len(person_ids))
+                for person in cal_event.attendees
+            }
+            if organizer >= 0:
+                people.add(organizer)
+            participant_events.extend([index] * len(people))
+            participant_people.extend(people)
+
+        self.people: List[str] = list(person_ids)
+        self.start = np.array(starts, dtype=np.int64)
+        self.end = np.array(ends, dtype=np.int64)
+        self.organizer = np.array(organizers, dtype=np.int64)
+        event_ids = np.array(participant_events, dtype=np.int64)
+        person_column = np.array(participant_people, dtype=np.int64)
+        order = np.lexsort((self.start[event_ids], person_column))
+        self.participant_event = event_ids[order]
+        self.participant_person = person_column[order]
+
+    def __str__(self) -> str:
+        """
+        __str__ return a string summary of the object
+
+        Returns:
+            str: a description of the object
+        """
+        return f"event arrays: {len(self.start)} events, {len(self.people)} people"
+
+    @property
+    def hours(self) -> np.ndarray:
+        """
+        hours the length of each event in hours
+
+        Returns:
+            np.ndarray: the lengths
+        """
+        return (self.end - self.start) / 3600
+
+
+def _by_name(names: List[str], values: np.ndarray) -> Dict[str, float]:
+    """
+    _by_name label an array of per person totals, leaving out the zeros
+
+    Args:
+        names (List[str]): the people
+        values (np.ndarray): a value for each person
+
+    Returns:
+        Dict[str, float]: the values by person, largest first
+    """
+    order = np.argsort(-values, kind="stable")
+    return {names[index]: float(values[index]) for index in order if values[index]}
+
+
+def hours_per_person(arrays: EventArrays) -> Dict[str, float]:
+    """
+    hours_per_person total meeting hours for each person who organized or
+    attended a meeting
+
+    Args:
+        arrays (EventArrays): the events
+
+    Returns:
+        Dict[str, float]: the hours by address, largest first
+    """
+    totals = np.bincount(
+        arrays.participant_person,
+        weights=arrays.hours[arrays.participant_event],
+        minlength=len(arrays.people),
+    )
+    return _by_name(arrays.people, totals)
+
+
+def hours_per_organizer(arrays: EventArrays) -> Dict[str, float]:
+    """
+    hours_per_organizer total hours of the meetings each person organized
+
+    Args:
+        arrays (EventArrays): the events
+
+    Returns:
+        Dict[str, float]: the hours by address, largest first
+    """
+    organized = arrays.organizer >= 0
+    totals = np.bincount(
+        arrays.organizer[organized],
+        weights=arrays.hours[organized],
+        minlength=len(arrays.people),
+    )
+    return _by_name(arrays.people, totals)
+
+
+def hours_per_week(arrays: EventArrays) -> Dict[str, float]:
+    """
+    hours_per_week total meeting hours in each week, by the UTC time the
+    meetings start
+
+    Args:
+        arrays (EventArrays): the events
+
+    Returns:
+        Dict[str, float]: the hours by the date of the Monday starting the week
+    """
+    weeks = (arrays.start - _FIRST_MONDAY) // _WEEK
+    week_numbers, week_index = np.unique(weeks, return_inverse=True)
+    totals = np.bincount(week_index, weights=arrays.hours)
+    epoch = datetime.date(1970, 1, 5)
+    return {
+        (epoch + datetime.timedelta(weeks=int(week))).isoformat(): float(total)
+        for week, total in zip(week_numbers, totals)
+    }
+
+
+def co_occurrence(
+    arrays: EventArrays, top: int = 20, max_meeting_size: int = _MAX_MEETING_SIZE
+) -> List[Tuple[str, str, int]]:
+    """
+    co_occurrence the pairs of people who are in the most meetings together
+
+    Args:
+        arrays (EventArrays): the events
+        top (int, optional): the number of pairs. Defaults to 20.
+        max_meeting_size (int, optional): meetings with more people are left
+        out. Defaults to 50.
+
+    Returns:
+        List[Tuple[str, str, int]]: the two addresses and the number of
+        meetings, most meetings first
+    """
+    order = np.lexsort((arrays.participant_person, arrays.participant_event))
+    events = arrays.participant_event[order]
+    people = arrays.participant_person[order]
+    if not len(events):
+        return []
+    sizes = np.bincount(events)
+    # where each event's participants start among the sorted rows
+    offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    keys = []
+    # every pair of participants of the events of each size at once, so the
+    # work is in proportion to the pairs
+    for size in np.unique(sizes[(sizes > 1) & (sizes <= max_meeting_size)]):
+        first, second = np.triu_indices(int(size), k=1)
+        rows = offsets[sizes == size][:, np.newaxis]
+        keys.append(
+            (people[rows + first] * len(arrays.people) + people[rows + second]).ravel()
+        )
+    if not keys:
+        return []
+    pair_keys, counts = np.unique(np.concatenate(keys), return_counts=True)
+    best = np.argsort(-counts, kind="stable")[:top]
+    return [
+        (
+            arrays.people[pair_keys[index] // len(arrays.people)],
+            arrays.people[pair_keys[index] % len(arrays.people)],
+            int(counts[index]),
+        )
+        for index in best
+    ]
+
+
+def _gaps(arrays: EventArrays) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    _gaps the time between each of a person's meetings and the end of all
+    their earlier meetings
+
+    Args:
+        arrays (EventArrays): the events
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: for every participant row
+        after a person's first, the person, the meeting's start and the gap in
+        seconds, negative when the meeting overlaps an earlier one
+    """
+    people = arrays.participant_person
+    starts = arrays.start[arrays.participant_event]
+    ends = arrays.end[arrays.participant_event]
+    # a running maximum of the ends per person: offsetting each person's ends
+    # past the previous person's keeps the maximum from crossing people
+    first_end = int(ends.min()) if len(ends) else 0
+    span = int(ends.max()) - first_end + 1 if len(ends) else 1
+    offset = people * span
+    latest_end = np.maximum.accumulate(ends - first_end + offset) - offset + first_end
+    same_person = people[1:] == people[:-1]
+    return (
+        people[1:][same_person],
+        starts[1:][same_person],
+        (starts[1:] - latest_end[:-1])[same_person],
+    )
+
+
+def back_to_back(
+    arrays: EventArrays, max_gap: int = _BACK_TO_BACK_GAP
+) -> Dict[str, float]:
+    """
+    back_to_back for each person, the share of their meetings that start no
+    more than max_gap after their previous meeting ended, overlapping meetings
+    included
+
+    Args:
+        arrays (EventArrays): the events
+        max_gap (int, optional): the most seconds between meetings that still
+        counts as back to back. Defaults to 5 minutes.
+
+    Returns:
+        Dict[str, float]: the share from 0 to 1 by address, largest first
+    """
+    people, _, gaps = _gaps(arrays)
+    size = len(arrays.people)
+    meetings = np.bincount(arrays.participant_person, minlength=size)
+    close = np.bincount(people[gaps <= max_gap], minlength=size)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = np.where(meetings > 0, close / np.maximum(meetings, 1), 0.0)
+    return _by_name(arrays.people, share)
+
+
+def focus_time(
+    arrays: EventArrays, min_gap: int = _FOCUS_GAP, utc_offset: int = 0
+) -> Dict[str, float]:
+    """
+    focus_time for each person, the hours between meetings on the same day in
+    gaps of at least min_gap
+
+    Args:
+        arrays (EventArrays): the events
+        min_gap (int, optional): the shortest gap in seconds that counts.
+        Defaults to 2 hours.
+        utc_offset (int, optional): seconds to add to UTC to get the local time
+        that decides which day a meeting is on. Defaults to 0.
+
+    Returns:
+        Dict[str, float]: the hours by address, largest first
+    """
+    people, starts, gaps = _gaps(arrays)
+    # the gap ends at starts and began at starts - gaps, on the same day
+    same_day = (starts + utc_offset) // _DAY == (starts - gaps + utc_offset) // _DAY
+    focus = (gaps >= min_gap) & same_day
+    totals = np.bincount(
+        people[focus], weights=gaps[focus] / 3600, minlength=len(arrays.people)
+    )
+    return _by_name(arrays.people, totals)
+
+
+def summary(
+    arrays: EventArrays, top: int = 20, max_meeting_size: int = _MAX_MEETING_SIZE
+) -> dict:
+    """
+    summary all the statistics, each cut to the top entries
+
+    Args:
+        arrays (EventArrays): the events
+        top (int, optional): the number of entries in each. Defaults to 20.
+        max_meeting_size (int, optional): larger meetings are left out of the
+        co-occurrence. Defaults to 50.
+
+    Returns:
+        dict: the statistics
+    """
+
+    def first(values: Dict[str, float]) -> Dict[str, float]:
+        return dict(list(values.items())[:top])
+
+    return {
+        "events": len(arrays.start),
+        "people": len(arrays.people),
+        "hours_per_person": first(hours_per_person(arrays)),
+        "hours_per_organizer": first(hours_per_organizer(arrays)),
+        "hours_per_week": hours_per_week(arrays),
+        "co_occurrence": co_occurrence(arrays, top, max_meeting_size),
+        "back_to_back": first(back_to_back(arrays)),
+        "focus_time": first(focus_time(arrays)),
+    }
+
+
+if __name__ == "__main__":
+    import parse_calendar  # pylint: disable=C0412
+
+    arg_parser = argparse.ArgumentParser(description="summarize a calendar.")
+    arg_parser.add_argument("calendar_file", type=argparse.FileType("rb"))
+    arg_parser.add_argument("--start", type=parse_calendar.parse_date, required=True)
+    arg_parser.add_argument("--end", type=parse_calendar.parse_date, required=True)
+    arg_parser.add_argument("--top", type=int, default=20)
+    arg_parser.add_argument("--max-meeting-size", type=int, default=_MAX_MEETING_SIZE)
+    ns = arg_parser.parse_args()
+    with ns.calendar_file:
+        event_arrays = EventArrays(
+            parse_calendar.calendar_events(ns.calendar_file, ns.start, ns.end)
+        )
+    print(json.dumps(summary(event_arrays, ns.top, ns.max_meeting_size), indent=2))
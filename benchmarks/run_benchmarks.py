@@ -0,0 +1,286 @@
+"""
+    time the stages of parse_calendar on a synthetic calendar and write the
+    results as JSON so runs can be compared across commits
+
+    run from the repository root: python -m benchmarks.run_benchmarks
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict
+
+from icalendar import Calendar  # type: ignore
+import x_wr_timezone  # type: ignore
+
+from benchmarks.synthetic_calendar import generate_calendar
+from calendar_cache import CalendarCache
+import calendar_event
+from contact import Contact
+import contact_dedup
+from contact_list import ContactList
+from ics_stream import IcsStream
+import parse_calendar
+
+
+def time_function(function: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """
+    time_function run a function several times and time it
+
+    Args:
+        function (Callable[[], Any]): the function to time
+        repeat (int): how many times to run it
+
+    Returns:
+        Dict[str, Any]: the fastest and median times and all the times, in seconds
+    """
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        runs.append(time.perf_counter() - start)
+    return {"min": min(runs), "median": statistics.median(runs), "runs": runs}
+
+
+def _retained(function: Callable[[], Any]) -> int:
+    """
+    _retained measure the memory held by what a function returns, with
+    tracemalloc, which is left stopped
+
+    Args:
+        function (Callable[[], Any]): the function to measure
+
+    Returns:
+        int: the bytes allocated by the function and still in use by its result
+    """
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        result = function()
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+    del result
+    return retained
+
+
+def _memory(cal_events: list, build: Callable[[], list]) -> Dict[str, Any]:
+    """
+    _memory measure the memory of the events and contacts a calendar is
+    turned into, per occurrence and per contact, and of the events read back
+    from the cache
+
+    Args:
+        cal_events (list): the expanded events, for the contacts
+        build (Callable[[], list]): builds the CalendarEvents again
+
+    Returns:
+        Dict[str, Any]: the bytes in all and per item of each
+    """
+    # the attendee tuples shared between occurrences are counted, once
+    calendar_event._shared_attendees.cache_clear()
+    events_bytes = _retained(build)
+    people = sorted(
+        {
+            person
+            for cal_event in cal_events
+            for person in cal_event.attendees + (cal_event.organizer,)
+            if person
+        }
+    )
+    contacts_bytes = _retained(lambda: [Contact(email=person) for person in people])
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = CalendarCache(cache_dir)
+        for _ in cache.store("memory", cal_events):
+            pass
+        calendar_event._shared_attendees.cache_clear()
+        cached_bytes = _retained(lambda: list(cache.load("memory") or []))
+    return {
+        "calendar_events": {
+            "bytes": events_bytes,
+            "per_occurrence": events_bytes / max(1, len(cal_events)),
+        },
+        "cached_events": {
+            "bytes": cached_bytes,
+            "per_occurrence": cached_bytes / max(1, len(cal_events)),
+        },
+        "contacts": {
+            "bytes": contacts_bytes,
+            "per_contact": contacts_bytes / max(1, len(people)),
+        },
+    }
+
+
+def _git_commit() -> str:
+    """
+    _git_commit get the commit being benchmarked
+
+    Returns:
+        str: the commit hash, or an empty string outside a git checkout
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run_benchmarks(
+    params: Dict[str, Any], window: tuple, repeat: int = 3
+) -> Dict[str, Any]:
+    """
+    run_benchmarks time each stage separately, every stage gets the output of
+    the previous one prepared up front so only the stage itself is timed. The
+    memory the events and contacts take is measured separately, since
+    tracemalloc slows down anything it traces
+
+    Args:
+        params (Dict[str, Any]): the arguments for generate_calendar
+        window (tuple): the start and end dates to expand
+        repeat (int, optional): how many times to run each stage. Defaults to 3.
+
+    Returns:
+        Dict[str, Any]: the parameters, counts, environment, stage timings and
+        memory
+    """
+    start_date, end_date = window
+    ical_data = generate_calendar(**params)
+    calendar = Calendar.from_ical(ical_data)
+    standard_calendar = x_wr_timezone.to_standard(calendar)
+    events = list(
+        parse_calendar.confirmed_events(
+            parse_calendar.expand_events(standard_calendar, start_date, end_date)
+        )
+    )
+    cal_events = list(parse_calendar.build_calendar_events(events))
+    addresses = [
+        person
+        for cal_event in cal_events
+        for person in cal_event.attendees + (cal_event.organizer,)
+        if person
+    ]
+    contact_list = ContactList()
+    for cal_event in parse_calendar.collect_contacts(cal_events, contact_list):
+        pass
+
+    def add_contacts() -> None:
+        new_list = ContactList()
+        for address in addresses:
+            new_list.add(Contact(email=address))
+
+    def add_many_contacts() -> None:
+        ContactList().add_many(Contact(email=address) for address in addresses)
+
+    def collect_contacts() -> None:
+        for _ in parse_calendar.collect_contacts(cal_events, ContactList()):
+            pass
+
+    results: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        contacts_file = os.path.join(temp_dir, "contacts.csv")
+        calendar_file = os.path.join(temp_dir, "cal.csv")
+        ics_file = os.path.join(temp_dir, "cal.ics")
+        with open(ics_file, "wb") as file:
+            file.write(ical_data)
+
+        def stream_parse() -> None:
+            # the streaming equivalent of from_ical
+            with open(ics_file, "rb") as file:
+                stream = IcsStream(file)
+            for _ in stream.calendars():
+                pass
+            stream.close()
+
+        contact_list.save_to_file(contacts_file)
+        stages: Dict[str, Callable[[], Any]] = {
+            "from_ical": lambda: Calendar.from_ical(ical_data),
+            "stream_parse": stream_parse,
+            "to_standard": lambda: x_wr_timezone.to_standard(calendar),
+            "expand": lambda: list(
+                parse_calendar.expand_events(standard_calendar, start_date, end_date)
+            ),
+            "build_calendar_events": lambda: list(
+                parse_calendar.build_calendar_events(events)
+            ),
+            "contact_list_add": add_contacts,
+            "contact_list_add_many": add_many_contacts,
+            "collect_contacts": collect_contacts,
+            "find_duplicate_contacts": lambda: contact_dedup.find_duplicates(
+                contact_list.contacts
+            ),
+            "contacts_save_to_file": lambda: contact_list.save_to_file(contacts_file),
+            "contacts_load_from_file": lambda: ContactList().load_from_file(
+                contacts_file
+            ),
+            "save_calendar_list": lambda: parse_calendar.save_calendar_list(
+                cal_events, calendar_file
+            ),
+        }
+        for name, stage in stages.items():
+            results[name] = time_function(stage, repeat)
+
+    return {
+        "params": dict(params, start_date=start_date, end_date=end_date),
+        "counts": {
+            "ical_bytes": len(ical_data),
+            "occurrences": len(events),
+            "attendee_references": len(addresses),
+            "contacts": len(contact_list.contacts),
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "commit": _git_commit(),
+        },
+        "stages": results,
+        "memory": _memory(
+            cal_events, lambda: list(parse_calendar.build_calendar_events(events))
+        ),
+    }
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="benchmark parse_calendar.")
+    arg_parser.add_argument("--events", type=int, default=1000)
+    arg_parser.add_argument("--recurring", type=float, default=0.3)
+    arg_parser.add_argument("--attendees", type=int, default=8)
+    arg_parser.add_argument("--people", type=int, default=500)
+    arg_parser.add_argument("--seed", type=int, default=1)
+    arg_parser.add_argument("--start", type=parse_calendar.parse_date, default=None)
+    arg_parser.add_argument("--end", type=parse_calendar.parse_date, default=None)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument(
+        "--output", "-o", help="write the results here instead of stdout"
+    )
+    ns = arg_parser.parse_args()
+    bench_params = {
+        "events": ns.events,
+        "recurring": ns.recurring,
+        "attendees": ns.attendees,
+        "people": ns.people,
+        "seed": ns.seed,
+    }
+    bench_window = (ns.start or (2023, 1, 1), ns.end or (2024, 1, 1))
+    bench_results = run_benchmarks(bench_params, bench_window, ns.repeat)
+    if ns.output:
+        with open(ns.output, "w", encoding="utf-8") as output_file:
+            json.dump(bench_results, output_file, indent=2)
+        for stage_name, timing in bench_results["stages"].items():
+            print(f"{stage_name}: {timing['min']:.4f}s")
+        memory = bench_results["memory"]
+        print(
+            f"memory: {memory['calendar_events']['per_occurrence']:.0f} bytes per "
+            f"occurrence, {memory['contacts']['per_contact']:.0f} bytes per contact"
+        )
+    else:
+        print(json.dumps(bench_results, indent=2))
@@ -0,0 +1,138 @@
+"""
+    time how long parse_calendar takes to start, and check which of the slow
+    to import packages get loaded, so cheap invocations such as --help or the
+    contact commands stay cheap
+
+    run from the repository root: python -m benchmarks.startup
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, List
+
+from benchmarks.run_benchmarks import time_function
+
+_REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_SCRIPT = os.path.join(_REPO_DIR, "parse_calendar.py")
+# packages that are only needed to parse calendars or for some of the options
+HEAVY_MODULES = [
+    "icalendar",
+    "recurring_ical_events",
+    "x_wr_timezone",
+    "pyarrow",
+    "numpy",
+    "asyncio",
+    "urllib.request",
+    "importlib.metadata",
+    "concurrent.futures.process",
+    "sqlite3",
+    "cProfile",
+]
+_RUN_SCRIPT = """
+import json, runpy, sys
+sys.argv = {argv!r}
+try:
+    if sys.argv[1:]:
+        runpy.run_path({script!r}, run_name="__main__")
+    else:
+        import parse_calendar
+except SystemExit:
+    pass
+print(json.dumps([name for name in {heavy!r} if name in sys.modules]))
+"""
+# the arguments for parse_calendar.py, None to only import it
+_COMMANDS: Dict[str, List[str] | None] = {
+    "import": None,
+    "help": ["--help"],
+    "find_contact": ["--find-contact", "nobody@example.com"],
+}
+
+
+def heavy_imports(args: List[str] | None, cwd: str) -> List[str]:
+    """
+    heavy_imports run parse_calendar.py in a new interpreter and list the
+    heavy modules it imported
+
+    Args:
+        args (List[str] | None): the command line arguments for
+        parse_calendar.py, or None to only import it
+        cwd (str): the directory to run in
+
+    Returns:
+        List[str]: the modules from HEAVY_MODULES that were imported
+    """
+    code = _RUN_SCRIPT.format(
+        argv=[_SCRIPT] + (args or []), script=_SCRIPT, heavy=HEAVY_MODULES
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        check=True,
+        text=True,
+        cwd=cwd,
+        env=dict(os.environ, PYTHONPATH=_REPO_DIR),
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def run_startup_benchmarks(repeat: int = 5) -> Dict[str, Any]:
+    """
+    run_startup_benchmarks time a fresh interpreter running each of the cheap
+    commands, in an empty directory so no config or contacts are read
+
+    Args:
+        repeat (int, optional): how many times to run each command. Defaults to 5.
+
+    Returns:
+        Dict[str, Any]: the timings of each command, and the heavy modules
+        each one imported
+    """
+    results: Dict[str, Any] = {"commands": {}, "heavy_imports": {}}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        env = dict(os.environ, PYTHONPATH=_REPO_DIR)
+        for name, args in _COMMANDS.items():
+            command = [sys.executable] + (
+                [_SCRIPT] + args
+                if args is not None
+                else ["-c", "import parse_calendar"]
+            )
+            results["commands"][name] = time_function(
+                lambda command=command: subprocess.run(
+                    command, capture_output=True, check=True, cwd=temp_dir, env=env
+                ),
+                repeat,
+            )
+            results["heavy_imports"][name] = heavy_imports(args, temp_dir)
+        results["commands"]["python"] = time_function(
+            lambda: subprocess.run([sys.executable, "-c", "pass"], check=True),
+            repeat,
+        )
+    return results
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="benchmark startup time.")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument(
+        "--max-seconds",
+        type=float,
+        help="exit with an error if a command's fastest run takes longer than "
+        "this, or if it imports a heavy module",
+    )
+    ns = arg_parser.parse_args()
+    startup_results = run_startup_benchmarks(ns.repeat)
+    print(json.dumps(startup_results, indent=2))
+    if ns.max_seconds is not None:
+        slow = [
+            name
+            for name, timing in startup_results["commands"].items()
+            if timing["min"] > ns.max_seconds
+        ]
+        heavy = [
+            name for name, mods in startup_results["heavy_imports"].items() if mods
+        ]
+        if slow or heavy:
+            sys.exit(f"startup regressed: slow {slow}, heavy imports {heavy}")
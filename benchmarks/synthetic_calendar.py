@@ -0,0 +1,108 @@
+"""
+    generate synthetic ical calendars for benchmarking
+"""
+import argparse
+import datetime
+import random
+from typing import List
+
+_DOMAINS = ["devnull.com", "example.org", "corp.example.com"]
+_FREQUENCIES = ["DAILY", "WEEKLY", "MONTHLY"]
+
+
+def _address(person: int) -> str:
+    """
+    _address get the e-mail address of a synthetic person, most have a
+    first.last form so names can be inferred, some have just a first name
+
+    Args:
+        person (int): the person's number
+
+    Returns:
+        str: the e-mail address
+    """
+    domain = _DOMAINS[person % len(_DOMAINS)]
+    if person % 5 == 0:
+        return f"person{person}@{domain}"
+    return f"first{person}.last{person}@{domain}"
+
+
+def generate_calendar(
+    events: int = 1000,
+    recurring: float = 0.3,
+    attendees: int = 8,
+    people: int = 500,
+    start_date: tuple = (2023, 1, 1),
+    days: int = 365,
+    seed: int = 1,
+) -> bytes:
+    """
+    generate_calendar generate an ical calendar
+
+    Args:
+        events (int, optional): the number of VEVENTs. Defaults to 1000.
+        recurring (float, optional): the fraction of the events that recur
+        daily, weekly or monthly. Defaults to 0.3.
+        attendees (int, optional): the number of attendees per event. Defaults to 8.
+        people (int, optional): the number of distinct addresses the attendees
+        are drawn from, fewer people means more overlap. Defaults to 500.
+        start_date (tuple, optional): the first day events start on
+        days (int, optional): the number of days events start within. Defaults to 365.
+        seed (int, optional): the random seed, the same arguments and seed always
+        give the same calendar. Defaults to 1.
+
+    Returns:
+        bytes: the calendar
+    """
+    rand = random.Random(seed)
+    first_day = datetime.datetime(*start_date)
+    stamp = (first_day - datetime.timedelta(days=30)).strftime("%Y%m%dT%H%M%SZ")
+    lines: List[str] = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//calendar//synthetic//EN",
+        "X-WR-TIMEZONE:America/Los_Angeles",
+    ]
+    for event in range(events):
+        start = first_day + datetime.timedelta(
+            days=rand.randrange(days), hours=rand.randrange(8, 18)
+        )
+        end = start + datetime.timedelta(minutes=rand.choice([15, 30, 60]))
+        organizer = rand.randrange(people)
+        lines.extend(
+            [
+                "BEGIN:VEVENT",
+                f"UID:synthetic-{seed}-{event}",
+                f"SUMMARY:Meeting {event}",
+                f"DTSTART:{start.strftime('%Y%m%dT%H%M%SZ')}",
+                f"DTEND:{end.strftime('%Y%m%dT%H%M%SZ')}",
+                f"DTSTAMP:{stamp}",
+                # a few cancelled events so the CONFIRMED filter has work
+                "STATUS:CANCELLED" if event % 20 == 19 else "STATUS:CONFIRMED",
+                f"ORGANIZER:mailto:{_address(organizer)}",
+            ]
+        )
+        if rand.random() < recurring:
+            lines.append(f"RRULE:FREQ={rand.choice(_FREQUENCIES)}")
+        for person in rand.sample(range(people), min(attendees, people)):
+            lines.append(f"ATTENDEE:mailto:{_address(person)}")
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(lines) + "\r\n").encode("utf-8")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="generate a synthetic calendar.")
+    arg_parser.add_argument("output_file", type=argparse.FileType("wb"))
+    arg_parser.add_argument("--events", type=int, default=1000)
+    arg_parser.add_argument("--recurring", type=float, default=0.3)
+    arg_parser.add_argument("--attendees", type=int, default=8)
+    arg_parser.add_argument("--people", type=int, default=500)
+    arg_parser.add_argument("--seed", type=int, default=1)
+    ns = arg_parser.parse_args()
+    with ns.output_file:
+        ns.output_file.write(
+            generate_calendar(
+                ns.events, ns.recurring, ns.attendees, ns.people, seed=ns.seed
+            )
+        )
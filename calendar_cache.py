@@ -0,0 +1,217 @@
+"""
+    an on-disk cache of expanded calendar events
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+from typing import BinaryIO, Iterable, Iterator, List
+
+import addresses
+from calendar_event import CalendarEvent
+
+# bump when the cached records change shape so old entries are ignored
+_CACHE_FORMAT = 5
+_CACHE_SUFFIX = ".pickle"
+_HASHED_PACKAGES = ["icalendar", "recurring-ical-events", "x-wr-timezone"]
+_READ_SIZE = 1024 * 1024
+
+
+def _package_versions() -> List[str]:
+    """
+    _package_versions get the versions of the packages that affect parsing and
+    expansion, so upgrading one of them invalidates the cache
+
+    Returns:
+        List[str]: a version string per package, 'unknown' if it isn't installed
+    """
+    # imported here, importlib.metadata is slow to import and only needed
+    # once the cache is used
+    from importlib import metadata  # pylint: disable=C0415
+
+    versions = []
+    for package in _HASHED_PACKAGES:
+        try:
+            versions.append(f"{package}={metadata.version(package)}")
+        except metadata.PackageNotFoundError:
+            versions.append(f"{package}=unknown")
+    return versions
+
+
+class CalendarCache:
+    """
+    a directory of expanded, confirmed CalendarEvent records keyed by the hash
+    of the calendar file, the date window and the library versions. Entries are
+    evicted least recently used first once the directory grows past max_size
+    """
+
+    def __init__(self, cache_dir: str, max_size: int = 256 * 1024 * 1024) -> None:
+        """
+        __init__ initialize the cache, creating the directory if needed
+
+        Args:
+            cache_dir (str): the directory to keep the cache in
+            max_size (int, optional): the most bytes to keep. Defaults to 256MB.
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def __str__(self) -> str:
+        """
+        __str__ return a string summary of the object
+
+        Returns:
+            str: a description of the object
+        """
+        return f"calendar cache: {self.cache_dir}"
+
+    def key_for_file(
+        self,
+        calendar_file: BinaryIO,
+        start_date: tuple,
+        end_date: tuple,
+        order: tuple = (),
+    ) -> str:
+        """
+        key_for_file get the cache key for a calendar file, the file is read
+        and then rewound so it can still be parsed
+
+        Args:
+            calendar_file (BinaryIO): the open calendar file
+            start_date (tuple): the first day of the expanded window
+            end_date (tuple): the last day of the expanded window
+            order (tuple, optional): how the events were expanded, whatever
+            decides the order they are in. Defaults to ().
+
+        Returns:
+            str: the key
+        """
+        digest = hashlib.sha256()
+        digest.update(
+            repr(
+                (
+                    _CACHE_FORMAT,
+                    _package_versions(),
+                    addresses.rules(),
+                    start_date,
+                    end_date,
+                    order,
+                )
+            ).encode()
+        )
+        position = calendar_file.tell()
+        for chunk in iter(lambda: calendar_file.read(_READ_SIZE), b""):
+            digest.update(chunk)
+        calendar_file.seek(position)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        """
+        _path get the file for a key
+
+        Args:
+            key (str): the key from key_for_file
+
+        Returns:
+            str: the path of the cache entry
+        """
+        return os.path.join(self.cache_dir, key + _CACHE_SUFFIX)
+
+    def load(self, key: str) -> Iterator[CalendarEvent] | None:
+        """
+        load get the cached events for a key
+
+        Args:
+            key (str): the key from key_for_file
+
+        Returns:
+            Iterator[CalendarEvent] | None: the events, read one at a time, or
+            None if the key isn't cached
+        """
+        path = self._path(key)
+        try:
+            cache_file = open(path, "rb")  # pylint: disable=R1732
+        except FileNotFoundError:
+            return None
+        # mark as recently used
+        os.utime(path)
+        return self._read(cache_file)
+
+    @staticmethod
+    def _read(cache_file: BinaryIO) -> Iterator[CalendarEvent]:
+        """
+        _read read the events from an open cache entry, closing it at the end
+
+        Args:
+            cache_file (BinaryIO): the open cache entry
+
+        Yields:
+            CalendarEvent: the cached events
+        """
+        with cache_file:
+            while True:
+                # each record was written with a fresh memo, see store, so it's
+                # read with a fresh unpickler
+                try:
+                    yield pickle.load(cache_file)
+                except EOFError:
+                    return
+
+    def store(
+        self, key: str, cal_events: Iterable[CalendarEvent]
+    ) -> Iterator[CalendarEvent]:
+        """
+        store cache events as they pass through. The entry is only written once
+        the events have all been consumed, so a partial run caches nothing
+
+        Args:
+            key (str): the key from key_for_file
+            cal_events (Iterable[CalendarEvent]): the events to cache
+
+        Yields:
+            CalendarEvent: the events, unchanged
+        """
+        handle, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as cache_file:
+                pickler = pickle.Pickler(cache_file, pickle.HIGHEST_PROTOCOL)
+                for cal_event in cal_events:
+                    pickler.dump(cal_event)
+                    # records don't reference each other, don't keep them alive;
+                    # the values occurrences share are shared again as they're
+                    # read, by CalendarEvent.__setstate__
+                    pickler.clear_memo()
+                    yield cal_event
+            os.replace(temp_path, self._path(key))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        evict remove the least recently used entries until the cache fits in
+        max_size
+        """
+        entries = []
+        total_size = 0
+        with os.scandir(self.cache_dir) as dir_entries:
+            for entry in dir_entries:
+                if not entry.name.endswith(_CACHE_SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
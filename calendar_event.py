@@ -1,32 +1,45 @@
 """
     class for an event on the calendar
 """
-from typing import Dict
+from functools import lru_cache
+import sys
+from typing import Any, Dict, Tuple
 
+from addresses import parse_person
 
-def _parse_person(event_person: str) -> str:
+
+@lru_cache(maxsize=4096)
+def _shared_attendees(attendees: Tuple[str, ...]) -> Tuple[str, ...]:
     """
-    _parse_person given a string from an event, clean it up
+    _shared_attendees get a single shared copy of an attendee tuple, so the
+    occurrences of a recurring event don't each keep their own
 
     Args:
-        event_person (str): the organizer or attendee
+        attendees (Tuple[str, ...]): the attendees
 
     Returns:
-        str: a cleaned up string or an empty string if it can't be cleaned up
+        Tuple[str, ...]: an equal tuple, the same object for every equal input
     """
-    if event_person.startswith("mailto:"):
-        email = event_person[7:]
-        if email.endswith("calendar.google.com"):
-            return ""
-        return email
-    return event_person
+    return attendees
 
 
 class CalendarEvent:
     """
-    _summary_
+    an occurrence of an event, slotted since there is one for every occurrence
+    of every recurring event
     """
 
+    __slots__ = (
+        "uid",
+        "summary",
+        "start",
+        "end",
+        "timestamp",
+        "description",
+        "organizer",
+        "attendees",
+    )
+
     def __init__(self, base_event: Dict) -> None:
         """
         __init__ initialize using a dictionary form recurring_ical_events
@@ -35,18 +48,21 @@ class CalendarEvent:
             base_event (Dict): the expected format would be the return from
             recurring_ical_events
         """
-        self.summary = base_event["summary"]
+        self.uid = sys.intern(str(base_event.get("uid", "")))
+        self.summary = sys.intern(str(base_event["summary"]))
         self.start = base_event["dtstart"].dt
         self.end = base_event["dtend"].dt
         self.timestamp = base_event["dtstamp"].dt
-        self.description = base_event.get("description", "")
-        self.organizer = _parse_person(base_event.get("organizer", ""))
-        self.attendees = []
-        if "attendee" in base_event:
-            for attendee in base_event["attendee"]:
-                parsed = _parse_person(attendee)
-                if parsed:
-                    self.attendees.append(parsed)
+        self.description = str(base_event.get("description", ""))
+        self.organizer = parse_person(base_event.get("organizer", ""))
+        attendees = base_event.get("attendee", [])
+        if isinstance(attendees, str):
+            # a single attendee is not wrapped in a list
+            attendees = [attendees]
+        parsed_attendees = (parse_person(attendee) for attendee in attendees)
+        self.attendees: Tuple[str, ...] = _shared_attendees(
+            tuple(parsed for parsed in parsed_attendees if parsed)
+        )
 
     def __str__(self) -> str:
         """
@@ -57,6 +73,34 @@ class CalendarEvent:
         """
         return f"{self.summary}: {self.start} - {self.end}"
 
+    def __getstate__(self) -> tuple:
+        """
+        __getstate__ get the values to pickle, in the order of __slots__
+
+        Returns:
+            tuple: the values
+        """
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state: tuple) -> None:
+        """
+        __setstate__ restore a pickled event. Each event read from the cache
+        has its own copies of the strings and attendees its series shares, so
+        they are interned again the way __init__ and for_occurrence share them
+
+        Args:
+            state (tuple): the values from __getstate__
+        """
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+        self.uid = sys.intern(self.uid)
+        self.summary = sys.intern(self.summary)
+        self.description = sys.intern(self.description)
+        self.organizer = sys.intern(self.organizer)
+        self.attendees = _shared_attendees(
+            tuple(sys.intern(attendee) for attendee in self.attendees)
+        )
+
     def to_dict(self) -> dict:
         """
         to_dict get a dictionary representation of the object
@@ -64,7 +108,7 @@ class CalendarEvent:
         Returns:
             dict: the dictionary
         """
-        return vars(self)
+        return {name: getattr(self, name) for name in self.__slots__}
 
     def dict_for_csv(self) -> dict:
         return_dict = {}
@@ -74,5 +118,83 @@ class CalendarEvent:
         return_dict["timestamp"] = str(self.timestamp)
         return_dict["description"] = str(self.description)
         return_dict["organizer"] = self.organizer
-        return_dict["attendees"] = ','.join(self.attendees)
+        return_dict["attendees"] = ",".join(self.attendees)
+        return_dict["uid"] = self.uid
         return return_dict
+
+    @classmethod
+    def for_occurrence(
+        cls, series_event: "CalendarEvent", base_event: Dict
+    ) -> "CalendarEvent":
+        """
+        for_occurrence create another occurrence of a series without parsing the
+        parts that are the same for every occurrence again
+
+        Args:
+            series_event (CalendarEvent): an earlier occurrence of the series
+            base_event (Dict): the occurrence, from recurring_ical_events
+
+        Returns:
+            CalendarEvent: the occurrence
+        """
+        cal_event = cls.__new__(cls)
+        cal_event.uid = series_event.uid
+        cal_event.summary = series_event.summary
+        cal_event.start = base_event["dtstart"].dt
+        cal_event.end = base_event["dtend"].dt
+        cal_event.timestamp = base_event["dtstamp"].dt
+        cal_event.description = series_event.description
+        cal_event.organizer = series_event.organizer
+        cal_event.attendees = series_event.attendees
+        return cal_event
+
+
+# the properties that are parsed once per series by CalendarEventBuilder
+_SERIES_PROPERTIES = ("summary", "description", "organizer", "attendee")
+
+
+class CalendarEventBuilder:
+    """
+    builds CalendarEvents for the occurrences of a calendar. recurring_ical_events
+    makes each occurrence as a shallow copy of its source VEVENT, so occurrences
+    of a series share their property values. When an occurrence has the very
+    same values as the last one built for its UID they are not parsed again
+    """
+
+    def __init__(self) -> None:
+        """
+        __init__ initialize the builder with no series seen
+        """
+        self._series: Dict[str, Tuple[Tuple[Any, ...], CalendarEvent]] = {}
+
+    def __str__(self) -> str:
+        """
+        __str__ return a string summary of the object
+
+        Returns:
+            str: a description of the object
+        """
+        return f"calendar event builder: {len(self._series)} series"
+
+    def build(self, base_event: Dict) -> CalendarEvent:
+        """
+        build create the CalendarEvent for an occurrence
+
+        Args:
+            base_event (Dict): the occurrence, from recurring_ical_events
+
+        Returns:
+            CalendarEvent: the occurrence
+        """
+        uid = str(base_event.get("uid", ""))
+        # the values themselves are kept so they can't be collected and their
+        # ids reused while the series is remembered
+        values = tuple(base_event.get(name) for name in _SERIES_PROPERTIES)
+        known = self._series.get(uid)
+        if known and all(
+            value is known_value for value, known_value in zip(values, known[0])
+        ):
+            return CalendarEvent.for_occurrence(known[1], base_event)
+        cal_event = CalendarEvent(base_event)
+        self._series[uid] = (values, cal_event)
+        return cal_event
@@ -0,0 +1,154 @@
+"""
+    fetching calendars from http(s) urls, such as a CalDAV collection or a
+    published .ics, concurrently in a pool of threads so a slow server doesn't
+    hold up the others. urllib.request and the pool are only imported once
+    something is downloaded, so importing this module stays cheap
+"""
+import io
+import os
+import queue
+import threading
+from typing import BinaryIO, Iterator, List, Tuple
+import urllib.parse
+
+_CONCURRENCY = 8
+_TIMEOUT = 60
+_USER_AGENT = "parse_calendar"
+
+
+def is_url(source: str) -> bool:
+    """
+    is_url check whether a calendar source is an http(s) url rather than a path
+
+    Args:
+        source (str): the source
+
+    Returns:
+        bool: True for a url
+    """
+    return source.startswith(("http://", "https://"))
+
+
+def source_stem(source: str) -> str:
+    """
+    source_stem get a name for a calendar source without directories or an
+    extension, the host is used for a url without a path
+
+    Args:
+        source (str): a path or url
+
+    Returns:
+        str: the name
+    """
+    if is_url(source):
+        parsed = urllib.parse.urlparse(source)
+        name = os.path.basename(parsed.path.rstrip("/")) or parsed.netloc
+    else:
+        name = os.path.basename(source)
+    return os.path.splitext(name)[0]
+
+
+def fetch_url(url: str, timeout: float = _TIMEOUT) -> bytes:
+    """
+    fetch_url download a calendar
+
+    Args:
+        url (str): the url, for a CalDAV collection the server must support GET
+        on the collection as most do
+        timeout (float, optional): seconds to wait for the server. Defaults to 60.
+
+    Raises:
+        OSError: if the calendar can't be downloaded
+
+    Returns:
+        bytes: the calendar
+    """
+    import urllib.request  # pylint: disable=C0415
+
+    request = urllib.request.Request(
+        url, headers={"Accept": "text/calendar", "User-Agent": _USER_AGENT}
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.read()
+
+
+def open_calendar(source: str, data: bytes | None = None) -> BinaryIO:
+    """
+    open_calendar open a calendar for parsing
+
+    Args:
+        source (str): the path, or the url data was downloaded from
+        data (bytes | None, optional): the downloaded calendar. Defaults to
+        None, which opens the path
+
+    Returns:
+        BinaryIO: the open calendar, named after the source
+    """
+    if data is None:
+        return open(source, "rb")
+    calendar_file = io.BytesIO(data)
+    calendar_file.name = source
+    return calendar_file
+
+
+def fetch_calendars(
+    sources: List[str], concurrency: int = _CONCURRENCY, timeout: float = _TIMEOUT
+) -> Iterator[Tuple[int, bytes | None]]:
+    """
+    fetch_calendars download the urls among sources concurrently, yielding
+    each as it arrives rather than in order. urllib blocks, so the downloads
+    run in a pool of concurrency threads, and no more than concurrency
+    sources are downloading or waiting to be read at once. Local paths aren't
+    read, they're yielded with None for the file to be opened where it's
+    parsed
+
+    Args:
+        sources (List[str]): calendar paths and urls
+        concurrency (int, optional): the most downloads at once. Defaults to 8.
+        timeout (float, optional): seconds to wait for each server. Defaults to 60.
+
+    Raises:
+        Exception: whatever stopped a calendar downloading, usually an OSError
+        but also http.client errors such as InvalidURL
+
+    Yields:
+        Tuple[int, bytes | None]: the index of the source in sources, and the
+        calendar for a url or None for a path
+    """
+    from concurrent.futures import ThreadPoolExecutor  # pylint: disable=C0415
+
+    results: "queue.Queue[Tuple[int, bytes | None, Exception | None]]" = queue.Queue()
+    stop = threading.Event()
+
+    def fetch(index: int, source: str) -> None:
+        data: bytes | None = None
+        error: Exception | None = None
+        try:
+            if is_url(source) and not stop.is_set():
+                data = fetch_url(source, timeout)
+        except Exception as err:  # pylint: disable=W0703
+            # every source has to produce a result, or the reader waits forever
+            error = err
+        results.put((index, data, error))
+
+    pending = iter(enumerate(sources))
+    pool = ThreadPoolExecutor(max(1, concurrency))
+
+    def submit_next() -> int:
+        for index, source in pending:
+            pool.submit(fetch, index, source)
+            return 1
+        return 0
+
+    try:
+        outstanding = sum(submit_next() for _ in range(max(1, concurrency)))
+        while outstanding:
+            index, data, error = results.get()
+            # a source is only started once another has been read
+            outstanding += submit_next() - 1
+            if error:
+                raise error
+            yield index, data
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,306 @@
+"""
+    keep calendar outputs up to date as the calendar files change, instead of
+    processing everything on every run. The contact list, the iCal libraries
+    and every calendar's events stay in memory. The files are polled, a file
+    whose modification time or size changed is scanned with IcsStream and only
+    the event series whose text changed are parsed and expanded again. The
+    outputs and contacts are written once the changes stop for a moment
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from calendar_event import CalendarEvent
+from calendar_sources import is_url
+from event_exporters import EventExporter, exporter_for
+from ics_stream import IcsStream
+from parse_calendar import CalendarProcessor, find_calendar_files, output_file_names
+
+_POLL_INTERVAL = 0.1
+# a file modified more recently than this may still be being written
+_SETTLE_TIME = 0.1
+_DEBOUNCE = 0.2
+
+_logger = logging.getLogger(__name__)
+
+
+class _WatchedCalendar:
+    """
+    what is known about one calendar file from the last time it was read
+    """
+
+    def __init__(self) -> None:
+        """
+        __init__ initialize a calendar that hasn't been read yet
+        """
+        self.signature: Tuple[int, int] = (0, 0)
+        self.timezone_digest = ""
+        # the digest of each series, in the order they are in the file
+        self.digests: Dict[str, str] = {}
+        self.events: Dict[str, List[CalendarEvent]] = {}
+
+    def all_events(self) -> List[CalendarEvent]:
+        """
+        all_events the events of every series, a series at a time in the order
+        they are in the file
+
+        Returns:
+            List[CalendarEvent]: the events
+        """
+        return [
+            cal_event for uid in self.digests for cal_event in self.events.get(uid, [])
+        ]
+
+
+class CalendarWatcher:
+    """
+    watches calendar files and directories, and reprocesses the calendars that
+    change into a combined output file or a file per calendar in a directory
+    """
+
+    def __init__(
+        self,
+        processor: CalendarProcessor,
+        calendar_paths: List[str],
+        output_file: str,
+        output_dir: str | None = None,
+        contacts_file: str | None = None,
+        export_contacts: bool = True,
+        debounce: float = _DEBOUNCE,
+        settle_time: float = _SETTLE_TIME,
+    ) -> None:
+        """
+        __init__ set up the watcher, nothing is read until the first poll
+
+        Args:
+            processor (CalendarProcessor): expands the events and keeps the
+            contact list
+            calendar_paths (List[str]): files, directories and glob patterns,
+            checked again on every poll so new files are picked up
+            output_file (str): the combined file when there's no output_dir
+            output_dir (str | None, optional): write a file per calendar to this
+            directory. Defaults to None.
+            contacts_file (str | None, optional): save the contacts here after
+            every change. Defaults to None, which doesn't save them
+            export_contacts (bool, optional): when the contacts are kept in a
+            database, also write contacts_file. Defaults to True.
+            debounce (float, optional): seconds without changes to wait before
+            writing. Defaults to 0.2.
+            settle_time (float, optional): seconds since a file was last
+            modified before it's read. Defaults to 0.1.
+
+        Raises:
+            ValueError: if calendar_paths has urls, which can't be watched
+        """
+        urls = [path for path in calendar_paths if is_url(path)]
+        if urls:
+            raise ValueError(f"only files and directories can be watched: {urls}")
+        self.processor = processor
+        self.calendar_paths = calendar_paths
+        self.output_file = output_file
+        self.output_dir = output_dir
+        self.contacts_file = contacts_file
+        self.export_contacts = export_contacts
+        self.debounce = debounce
+        self.settle_time = settle_time
+        self.exporter: EventExporter = exporter_for(
+            output_file, processor.export_format
+        )
+        self._calendars: Dict[str, _WatchedCalendar] = {}
+        self._changed: Dict[str, None] = {}
+        # the file written for each calendar in output_dir
+        self._outputs: Dict[str, str] = {}
+        self._last_change = 0.0
+
+    def __str__(self) -> str:
+        """
+        __str__ return a string summary of the object
+
+        Returns:
+            str: a description of the object
+        """
+        return (
+            f"calendar watcher: {len(self._calendars)} calendars, "
+            f"{len(self._changed)} waiting to be written"
+        )
+
+    def poll(self) -> List[str]:
+        """
+        poll check the calendars once and update the ones that changed, the
+        outputs aren't written until flush
+
+        Returns:
+            List[str]: the calendars that changed, or were removed
+        """
+        paths = find_calendar_files(self.calendar_paths)
+        changed = []
+        now = time.time()
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            signature = (stat.st_mtime_ns, stat.st_size)
+            calendar = self._calendars.get(path)
+            if calendar and calendar.signature == signature:
+                continue
+            if now - stat.st_mtime < self.settle_time:
+                # check again on the next poll
+                continue
+            try:
+                if self._update(path, signature):
+                    changed.append(path)
+            except (OSError, ValueError) as error:
+                # it's tried again when the file next changes
+                _logger.warning("%s: can't be read: %s", path, error)
+        for path in set(self._calendars).difference(paths):
+            _logger.info("%s: removed", path)
+            del self._calendars[path]
+            changed.append(path)
+        if changed:
+            self._changed.update(dict.fromkeys(changed))
+            self._last_change = time.monotonic()
+        return changed
+
+    def _update(self, path: str, signature: Tuple[int, int]) -> bool:
+        """
+        _update reprocess the series of a calendar that changed
+
+        Args:
+            path (str): the calendar file
+            signature (Tuple[int, int]): its modification time and size
+
+        Returns:
+            bool: True if any series changed, False if only the file's time did
+        """
+        import x_wr_timezone  # type: ignore # pylint: disable=C0415
+
+        started = time.perf_counter()
+        calendar = self._calendars.get(path)
+        new = calendar is None
+        if calendar is None:
+            # only watched once it's been read
+            calendar = _WatchedCalendar()
+        with open(path, "rb") as calendar_file:
+            stream = IcsStream(calendar_file)
+        try:
+            timezone_digest = stream.timezone_digest()
+            digests = stream.series_digests()
+            if timezone_digest != calendar.timezone_digest:
+                # every event may be at a different time
+                updated = list(digests)
+            else:
+                updated = [
+                    uid
+                    for uid, digest in digests.items()
+                    if calendar.digests.get(uid) != digest
+                ]
+            removed = [uid for uid in calendar.digests if uid not in digests]
+            if not updated and not removed and not new:
+                calendar.signature = signature
+                return False
+            for uid in removed:
+                calendar.events.pop(uid, None)
+            for uid in updated:
+                calendar.events[uid] = []
+            for series in stream.calendars(uids=updated):
+                for cal_event in self.processor.expand_calendar(
+                    x_wr_timezone.to_standard(series)
+                ):
+                    calendar.events.setdefault(cal_event.uid, []).append(cal_event)
+            # set last, if anything fails the series are tried again on the
+            # next poll
+            calendar.signature = signature
+            calendar.timezone_digest = timezone_digest
+            calendar.digests = digests
+            self._calendars[path] = calendar
+        finally:
+            stream.close()
+        _logger.info(
+            "%s: %d series updated, %d removed in %.0f ms",
+            path,
+            len(updated),
+            len(removed),
+            (time.perf_counter() - started) * 1000,
+        )
+        return True
+
+    def _write(self, events: List[CalendarEvent], filename: str) -> None:
+        """
+        _write write events through a temporary file, so a reader never sees a
+        half written file
+
+        Args:
+            events (List[CalendarEvent]): the events
+            filename (str): the file to replace
+        """
+        temp_file = filename + ".tmp"
+        self.exporter.write(events, temp_file)
+        os.replace(temp_file, filename)
+
+    def flush(self) -> None:
+        """
+        flush write the outputs of the calendars that changed, and the contacts
+        """
+        if not self._changed:
+            return
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+            paths = find_calendar_files(self.calendar_paths)
+            names = dict(
+                zip(
+                    paths,
+                    output_file_names(paths, self.output_dir, self.exporter.extension),
+                )
+            )
+            for path in self._changed:
+                if path in self._calendars and path in names:
+                    self._write(self._calendars[path].all_events(), names[path])
+                    self._outputs[path] = names[path]
+                elif path in self._outputs and os.path.exists(self._outputs[path]):
+                    os.remove(self._outputs.pop(path))
+        else:
+            self._write(
+                [
+                    cal_event
+                    for path in sorted(self._calendars)
+                    for cal_event in self._calendars[path].all_events()
+                ],
+                self.output_file,
+            )
+        if self.contacts_file:
+            self.processor.save_contacts(self.contacts_file, self.export_contacts)
+        _logger.info("wrote %d changed calendars", len(self._changed))
+        self._changed = {}
+
+    def run(
+        self,
+        poll_interval: float = _POLL_INTERVAL,
+        stop: threading.Event | None = None,
+    ) -> None:
+        """
+        run poll the calendars until stopped, writing the outputs once there
+        have been no changes for the debounce time. Whatever is waiting is
+        written when it stops
+
+        Args:
+            poll_interval (float, optional): seconds between polls. Defaults to
+            0.1.
+            stop (threading.Event | None, optional): set it to stop. Defaults
+            to None, which runs until interrupted
+        """
+        stop = stop or threading.Event()
+        _logger.info("watching %s", ", ".join(self.calendar_paths))
+        try:
+            while not stop.is_set():
+                self.poll()
+                if (
+                    self._changed
+                    and time.monotonic() - self._last_change >= self.debounce
+                ):
+                    self.flush()
+                stop.wait(poll_interval)
+        finally:
+            self.flush()
@@ -4,6 +4,8 @@
 
 from typing import List
 
+import addresses
+
 """
 outlook_csv_properties = [
     'First Name', 'Middle Name', 'Last Name', 'Title', 'Suffix', 'Initials', 'Web Page',
@@ -31,12 +33,15 @@ class Contact:
     class to represent a person
     """
 
+    __slots__ = ("first_name", "last_name", "email")
+
     def __init__(
         self, first_name: str = "", last_name: str = "", email: str | List[str] = ""
     ) -> None:
         """
         __init__ initialize a contact with names and an e-mail address. If only the
-        email address is provided it is used to infer the first and last names
+        email address is provided it is used to infer the first and last names.
+        Addresses are kept in their canonical form, see addresses.canonical
 
         Args:
             first_name (str, optional): first name. Defaults to ''.
@@ -48,24 +53,18 @@ class Contact:
         """
         if len(first_name) + len(last_name) + len(email) == 0:
             raise ValueError("all initialization parameters are empty")
-        if email:
-            if isinstance(email, str):
-                self.email = [email]
-            else:
-                self.email = email
-        else:
-            self.email = []
+        if isinstance(email, str):
+            email = [email] if email else []
+        # different spellings of an address become one address
+        self.email = list(dict.fromkeys(addresses.canonical(addy) for addy in email))
         if email and (not first_name and not last_name):
-            for addy in self.email:
-                at_pos = addy.find("@")
-                name = addy[:at_pos]
-                period_pos = name.find(".")
-                if period_pos > -1:
-                    self.first_name = name[:period_pos]
-                    self.last_name = name[period_pos + 1 :]
+            # names keep the case of the address as the calendar wrote it
+            for addy in email:
+                self.first_name, self.last_name = addresses.infer_name(
+                    addresses.spelling(addy)
+                )
+                if self.last_name:
                     break
-                self.first_name = name
-                self.last_name = ""
         else:
             self.first_name = first_name
             self.last_name = last_name
@@ -116,9 +115,8 @@ class Contact:
             self.first_name = other.first_name
         if not self.last_name and other.last_name:
             self.last_name = other.last_name
-        self.email.extend(other.email)
-        if len(self.email) > 0:
-            self.email = list(set(self.email))
+        # drop duplicate addresses but keep the order they were seen in
+        self.email = list(dict.fromkeys(self.email + other.email))
 
     def to_dict(self) -> dict:
         """
@@ -127,4 +125,4 @@ class Contact:
         Returns:
             dict: the dictionary
         """
-        return vars(self)
+        return {name: getattr(self, name) for name in self.__slots__}
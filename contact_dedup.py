@@ -0,0 +1,455 @@
+"""
+    finding contacts that are probably the same person even though add didn't
+    match them, such as jane.doe@corp.com, jdoe@corp.com and Jane Doe
+    <jane@personal.com>. Each contact gets blocking keys, values a duplicate
+    would likely share: the sound of the last name with the first initial, the
+    shapes of the address' local part and its words within the domain. Only
+    pairs of contacts that share a block are scored, so the work grows with the
+    size of the blocks rather than with the square of the number of contacts.
+    A block too big to score every pair of, a common name or a company's
+    shared words, is sorted by name and each contact is only scored with the
+    contacts next to it
+"""
+from functools import lru_cache
+import logging
+import re
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Sequence, Set, Tuple
+
+from contact import Contact
+from contact_list import ContactList
+
+_MERGE_THRESHOLD = 0.9
+_REVIEW_THRESHOLD = 0.75
+# a key shared by more contacts than this says little about any pair of them
+_MAX_BLOCK_SIZE = 100
+# in a bigger block, each contact is scored with this many after it by name
+_NEIGHBOURHOOD = 10
+_SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+# how much each part of a name counts towards the name score
+_LAST_NAME_WEIGHT = 0.6
+_FIRST_NAME_WEIGHT = 0.4
+# an address that spells out the other contact's name, such as jdoe for Jane Doe
+_ALIAS_SCORE = 0.85
+# the same local part at different domains
+_SAME_LOCAL_SCORE = 0.8
+_SHARED_DOMAIN_BONUS = 0.1
+# names less alike than this belong to different people
+_SAME_NAME = 0.9
+_WORDS = re.compile(r"[a-z]+")
+
+_logger = logging.getLogger(__name__)
+
+
+class DuplicateMatch(NamedTuple):
+    """
+    two contacts that may be the same person
+    """
+
+    first: Contact
+    second: Contact
+    score: float
+
+
+class DedupResult(NamedTuple):
+    """
+    the outcome of deduplicate
+    """
+
+    merged: int
+    groups: List[List[Contact]]
+    review: List[DuplicateMatch]
+    pairs_scored: int
+
+
+class _Features(NamedTuple):
+    """
+    the parts of a contact that are compared, worked out once per contact
+    """
+
+    first_name: str
+    last_name: str
+    # the local parts of the addresses without separators, digits or +tags
+    locals: Set[str]
+    domains: Set[str]
+    # the local parts the contact's name could be written as
+    name_forms: Set[str]
+    # the blocks the contact goes in
+    keys: Set[Tuple[str, ...]]
+
+
+@lru_cache(maxsize=65536)
+def soundex(name: str) -> str:
+    """
+    soundex the American Soundex code of a name, names that sound alike such
+    as Smith and Smyth get the same code
+
+    Args:
+        name (str): the name
+
+    Returns:
+        str: a letter and three digits, or '' if the name has no letters
+    """
+    letters = [letter for letter in name.lower() if "a" <= letter <= "z"]
+    if not letters:
+        return ""
+    code = letters[0].upper()
+    previous = _SOUNDEX_CODES.get(letters[0], "")
+    for letter in letters[1:]:
+        digit = _SOUNDEX_CODES.get(letter, "")
+        if digit and digit != previous:
+            code += digit
+        # h and w don't separate letters with the same code, vowels do
+        if letter not in "hw":
+            previous = digit
+    return (code + "000")[:4]
+
+
+def _features(contact_item: Contact) -> _Features:
+    """
+    _features get the parts of a contact that are compared and its blocking
+    keys
+
+    Args:
+        contact_item (Contact): the contact
+
+    Returns:
+        _Features: the lowercase names, addresses, name forms and keys
+    """
+    first_name = contact_item.first_name.strip().lower()
+    last_name = contact_item.last_name.strip().lower()
+    local_parts = set()
+    domains = set()
+    keys: Set[Tuple[str, ...]] = set()
+    for email in contact_item.email:
+        local_part, _, domain = email.partition("@")
+        # drop any +tag, jane+lists is jane
+        words = _WORDS.findall(local_part.partition("+")[0])
+        if not words:
+            continue
+        local_parts.add("".join(words))
+        if len(words) > 1:
+            keys.add(("local", words[0][0] + words[-1]))
+        for word in words:
+            if len(word) > 2:
+                keys.add(("word", domain, word))
+        if domain:
+            domains.add(domain)
+    name_forms = set()
+    first_word = "".join(_WORDS.findall(first_name))
+    last_word = "".join(_WORDS.findall(last_name))
+    if first_word and last_word:
+        name_forms.update(
+            {
+                first_word + last_word,
+                first_word[0] + last_word,
+                last_word + first_word,
+                last_word + first_word[0],
+            }
+        )
+    if last_name:
+        keys.add(("name", soundex(last_name), first_name[:1]))
+    keys.update(("local", form) for form in name_forms | local_parts)
+    return _Features(first_name, last_name, local_parts, domains, name_forms, keys)
+
+
+def jaro_winkler(first: str, second: str) -> float:
+    """
+    jaro_winkler the Jaro-Winkler similarity of two strings, made for short
+    strings such as names: it counts the characters the two have in common
+    near the same position and favors strings that start the same
+
+    Args:
+        first (str): a string
+        second (str): another string
+
+    Returns:
+        float: from 0 for nothing in common to 1 for the same string
+    """
+    if first == second:
+        return 1.0
+    if not first or not second:
+        return 0.0
+    window = max(max(len(first), len(second)) // 2 - 1, 0)
+    used = [False] * len(second)
+    first_matches = []
+    for index, letter in enumerate(first):
+        end = min(len(second), index + window + 1)
+        # str.find does the scanning, only a used match needs another look
+        other = second.find(letter, max(0, index - window), end)
+        while other >= 0 and used[other]:
+            other = second.find(letter, other + 1, end)
+        if other >= 0:
+            used[other] = True
+            first_matches.append(letter)
+    matches = len(first_matches)
+    if not matches:
+        return 0.0
+    second_matches = [letter for index, letter in enumerate(second) if used[index]]
+    transpositions = (
+        sum(1 for one, two in zip(first_matches, second_matches) if one != two) // 2
+    )
+    jaro = (
+        matches / len(first)
+        + matches / len(second)
+        + (matches - transpositions) / matches
+    ) / 3
+    prefix = 0
+    for one, two in zip(first[:4], second[:4]):
+        if one != two:
+            break
+        prefix += 1
+    return jaro + prefix * 0.1 * (1 - jaro)
+
+
+@lru_cache(maxsize=65536)
+def _name_similarity(first: str, second: str) -> float:
+    """
+    _name_similarity how alike two names are, names repeat so the answers are
+    cached
+
+    Args:
+        first (str): a name
+        second (str): another name
+
+    Returns:
+        float: 1 for the same name, 0.9 when one starts the other as an initial
+        or a short form does, otherwise their Jaro-Winkler similarity
+    """
+    if first == second:
+        return 1.0
+    if first.startswith(second) or second.startswith(first):
+        return 0.9
+    return jaro_winkler(first, second)
+
+
+def _score(first: _Features, second: _Features) -> float:
+    """
+    _score how likely two contacts are the same person
+
+    Args:
+        first (_Features): the features of one contact
+        second (_Features): the features of the other
+
+    Returns:
+        float: from 0 for not alike, or for two people with full names and
+        different first names such as john.doe and jane.doe, to 1 for
+        certainly the same person
+    """
+    result = 0.0
+    if first.last_name and second.last_name:
+        if first.first_name and second.first_name:
+            # the cheaper test first, most pairs in a block differ here
+            given = _name_similarity(first.first_name, second.first_name)
+            if given < _SAME_NAME:
+                return 0.0
+        else:
+            given = 0.5
+        last = _name_similarity(first.last_name, second.last_name)
+        result = _LAST_NAME_WEIGHT * last + _FIRST_NAME_WEIGHT * given
+    if result < _ALIAS_SCORE and (
+        first.locals & second.name_forms or second.locals & first.name_forms
+    ):
+        result = _ALIAS_SCORE
+    if result < _SAME_LOCAL_SCORE and first.locals & second.locals:
+        result = _SAME_LOCAL_SCORE
+    if result and first.domains & second.domains:
+        result += _SHARED_DOMAIN_BONUS
+    return min(result, 1.0)
+
+
+def _same_names(first: Set[Tuple[str, str]], second: Set[Tuple[str, str]]) -> bool:
+    """
+    _same_names check that two groups of contacts don't name different people
+
+    Args:
+        first (Set[Tuple[str, str]]): the full names in one group
+        second (Set[Tuple[str, str]]): the full names in the other
+
+    Returns:
+        bool: False if both groups have full names and none of them are alike
+    """
+    if not first or not second:
+        return True
+    return any(
+        _name_similarity(first_name, other_first) >= _SAME_NAME
+        and _name_similarity(last_name, other_last) >= _SAME_NAME
+        for first_name, last_name in first
+        for other_first, other_last in second
+    )
+
+
+def _neighbours(
+    members: List[int], features: Sequence[_Features]
+) -> Iterator[Tuple[int, int]]:
+    """
+    _neighbours the pairs to score in a block too big to score every pair of:
+    the contacts are sorted by name then address, and each is paired with the
+    _NEIGHBOURHOOD contacts after it
+
+    Args:
+        members (List[int]): the positions of the contacts in the block
+        features (Sequence[_Features]): the features of every contact
+
+    Yields:
+        Tuple[int, int]: the positions of the two contacts, the lower first
+    """
+    ordered = sorted(
+        members,
+        key=lambda index: (
+            features[index].last_name,
+            features[index].first_name,
+            sorted(features[index].locals),
+            index,
+        ),
+    )
+    for position, first in enumerate(ordered):
+        for second in ordered[position + 1 : position + 1 + _NEIGHBOURHOOD]:
+            yield min(first, second), max(first, second)
+
+
+def find_duplicates(
+    contacts: Sequence[Contact],
+    threshold: float = _REVIEW_THRESHOLD,
+    max_block_size: int = _MAX_BLOCK_SIZE,
+) -> Tuple[List[DuplicateMatch], int]:
+    """
+    find_duplicates score the pairs of contacts that share a block
+
+    Args:
+        contacts (Sequence[Contact]): the contacts
+        threshold (float, optional): the lowest score to return. Defaults to 0.75.
+        max_block_size (int, optional): in blocks with more contacts than this
+        only the contacts near each other by name are scored. Defaults to 100.
+
+    Returns:
+        Tuple[List[DuplicateMatch], int]: the pairs scoring at least threshold,
+        highest first and otherwise in the order of the contacts, and the
+        number of pairs scored
+    """
+    features = [_features(contact_item) for contact_item in contacts]
+    # most keys belong to a single contact, a block's list is only made once
+    # a second contact has the key
+    single: Dict[Tuple[str, ...], int] = {}
+    blocks: Dict[Tuple[str, ...], List[int]] = {}
+    for index, contact_features in enumerate(features):
+        for key in contact_features.keys:
+            members = blocks.get(key)
+            if members is not None:
+                members.append(index)
+            elif key in single:
+                blocks[key] = [single.pop(key), index]
+            else:
+                single[key] = index
+
+    scored: Set[int] = set()
+    matches = []
+    size = len(contacts)
+    for key, members in blocks.items():
+        if len(members) > max_block_size:
+            _logger.info(
+                "block %s has %d contacts, scoring neighbours by name",
+                key,
+                len(members),
+            )
+            pairs: Iterable[Tuple[int, int]] = _neighbours(members, features)
+        else:
+            pairs = (
+                (first, second)
+                for position, first in enumerate(members)
+                for second in members[position + 1 :]
+            )
+        for first, second in pairs:
+            # a pair can share several blocks, only score it once
+            pair = first * size + second
+            if pair in scored:
+                continue
+            scored.add(pair)
+            pair_score = _score(features[first], features[second])
+            if pair_score >= threshold:
+                matches.append((first, second, pair_score))
+    matches.sort(key=lambda match: (-match[2], match[0], match[1]))
+    return [
+        DuplicateMatch(contacts[first], contacts[second], pair_score)
+        for first, second, pair_score in matches
+    ], len(scored)
+
+
+def deduplicate(
+    contact_list: ContactList,
+    threshold: float = _MERGE_THRESHOLD,
+    review_threshold: float = _REVIEW_THRESHOLD,
+    max_block_size: int = _MAX_BLOCK_SIZE,
+) -> DedupResult:
+    """
+    deduplicate merge the contacts in a list that are probably the same
+    person. Pairs scoring at least threshold are merged, with Contact.merge,
+    into the contact that comes first in the list, best matches first. A
+    contact that matches two others brings them together, unless they have
+    full names that don't match: jdoe@corp.com can go with Jane Doe or with
+    John Doe but not both, the pair left out goes to review
+
+    Args:
+        contact_list (ContactList): the contacts, every contact is loaded first
+        threshold (float, optional): the lowest score that is merged.
+        Defaults to 0.9.
+        review_threshold (float, optional): pairs from this score up to
+        threshold are returned for someone to look at. Defaults to 0.75.
+        max_block_size (int, optional): in blocks with more contacts than this
+        only the contacts near each other by name are scored. Defaults to 100.
+
+    Returns:
+        DedupResult: the number of contacts merged away, the groups that were
+        merged, the pairs to review, those left apart that scored at least
+        review_threshold, and the number of pairs scored
+    """
+    contact_list.load_all()
+    contacts = contact_list.contacts
+    matches, pairs_scored = find_duplicates(contacts, review_threshold, max_block_size)
+    positions = {id(contact_item): index for index, contact_item in enumerate(contacts)}
+    parent = list(range(len(contacts)))
+    # the full names in each group, by its root
+    names: Dict[int, Set[Tuple[str, str]]] = {}
+    for index, contact_item in enumerate(contacts):
+        if contact_item.first_name and contact_item.last_name:
+            names[index] = {
+                (contact_item.first_name.lower(), contact_item.last_name.lower())
+            }
+
+    def find(node: int) -> int:
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for match in matches:
+        if match.score < threshold:
+            break
+        first = find(positions[id(match.first)])
+        second = find(positions[id(match.second)])
+        if first == second or not _same_names(
+            names.get(first, set()), names.get(second, set())
+        ):
+            continue
+        # the earlier contact is the one kept
+        root, other = min(first, second), max(first, second)
+        parent[other] = root
+        names.setdefault(root, set()).update(names.pop(other, set()))
+
+    members: Dict[int, List[Contact]] = {}
+    for index, contact_item in enumerate(contacts):
+        members.setdefault(find(index), []).append(contact_item)
+    groups = [group for group in members.values() if len(group) > 1]
+    review = [
+        match
+        for match in matches
+        if find(positions[id(match.first)]) != find(positions[id(match.second)])
+    ]
+    merged = contact_list.merge_groups(groups)
+    return DedupResult(merged, groups, review, pairs_scored)
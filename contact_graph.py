@@ -0,0 +1,514 @@
+"""
+    a graph of who meets with whom, built from expanded calendar events in one
+    pass. People get integer ids in the order they are first seen. While events
+    are added only the distinct groups of people meeting are kept, with how
+    many times and for how many hours they met, so every occurrence of a
+    recurring meeting costs nothing extra. The first query turns the groups
+    into a sparse adjacency (compressed rows of numpy arrays) weighted by
+    meeting count and hours
+"""
+import argparse
+import datetime
+import heapq
+import json
+import os
+from typing import Dict, Iterable, List, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+import numpy as np
+
+from calendar_event import CalendarEvent
+
+# meetings bigger than this, such as all-hands, say little about who works
+# with whom and would add an edge for every pair of the people in them
+_MAX_MEETING_SIZE = 50
+_MAX_ITERATIONS = 30
+_WEIGHTS = ["meetings", "hours"]
+_GRAPHML_NAMESPACE = "http://graphml.graphdrawing.org/xmlns"
+
+
+class ContactGraph:
+    """
+    people as nodes and the meetings they share as undirected edges, each edge
+    with the number of meetings and the hours they were in together. The
+    organizer of a meeting counts as one of its people, all day events are
+    left out since they don't take up meeting time
+    """
+
+    def __init__(
+        self,
+        events: Iterable[CalendarEvent] = (),
+        max_meeting_size: int = _MAX_MEETING_SIZE,
+    ) -> None:
+        """
+        __init__ build the graph from events
+
+        Args:
+            events (Iterable[CalendarEvent], optional): the events, read once.
+            Defaults to none.
+            max_meeting_size (int, optional): meetings with more people don't
+            add edges, the people are still added. Defaults to 50.
+        """
+        self.people: List[str] = []
+        self.max_meeting_size = max_meeting_size
+        self.large_meetings = 0
+        self._ids: Dict[str, int] = {}
+        # the sorted ids of each group of people meeting: meetings and hours
+        self._groups: Dict[Tuple[int, ...], List[float]] = {}
+        # the adjacency, built from _groups when it's first needed
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._indices = np.zeros(0, dtype=np.int32)
+        self._meetings = np.zeros(0, dtype=np.int32)
+        self._hours = np.zeros(0, dtype=np.float32)
+        self._built = True
+        for cal_event in events:
+            self.add(cal_event)
+
+    def __str__(self) -> str:
+        """
+        __str__ return a string summary of the object
+
+        Returns:
+            str: a description of the object
+        """
+        return f"contact graph: {len(self.people)} people, {self.edge_count} edges"
+
+    def __len__(self) -> int:
+        """
+        __len__ the number of people in the graph
+
+        Returns:
+            int: the number of people
+        """
+        return len(self.people)
+
+    def _id(self, person: str) -> int:
+        """
+        _id get a person's id, adding them if they are new
+
+        Args:
+            person (str): the address
+
+        Returns:
+            int: the id
+        """
+        person_id = self._ids.get(person)
+        if person_id is None:
+            person_id = self._ids[person] = len(self.people)
+            self.people.append(person)
+            self._built = False
+        return person_id
+
+    def add(self, cal_event: CalendarEvent) -> None:
+        """
+        add add the people meeting in an event, it can be passed to
+        CalendarProcessor.process as on_event to build the graph as the events
+        are processed
+
+        Args:
+            cal_event (CalendarEvent): the event
+        """
+        if not isinstance(cal_event.start, datetime.datetime):
+            return
+        people = {self._id(cal_event.organizer)} if cal_event.organizer else set()
+        people.update(self._id(person) for person in cal_event.attendees)
+        if len(people) < 2:
+            return
+        if len(people) > self.max_meeting_size:
+            self.large_meetings += 1
+            return
+        hours = (cal_event.end - cal_event.start).total_seconds() / 3600
+        key = tuple(sorted(people))
+        group = self._groups.get(key)
+        if group is None:
+            self._groups[key] = [1, hours]
+        else:
+            group[0] += 1
+            group[1] += hours
+        self._built = False
+
+    def _build(self) -> None:
+        """
+        _build turn the groups into the adjacency. Groups of the same size are
+        expanded into their pairs together, and the pairs summed by edge. Each
+        edge is kept in the rows of both its people, every row sorted by id
+        """
+        if self._built:
+            return
+        count = len(self.people)
+        self._built = True
+        if not self._groups:
+            self._indptr = np.zeros(count + 1, dtype=np.int64)
+            return
+        by_size: Dict[int, List[Tuple[int, ...]]] = {}
+        for group in self._groups:
+            by_size.setdefault(len(group), []).append(group)
+        pair_keys = []
+        pair_meetings = []
+        pair_hours = []
+        for size, groups in by_size.items():
+            members = np.array(groups, dtype=np.int64)
+            weights = np.array([self._groups[group] for group in groups])
+            first, second = np.triu_indices(size, 1)
+            pair_keys.append((members[:, first] * count + members[:, second]).ravel())
+            pair_meetings.append(np.repeat(weights[:, 0], len(first)))
+            pair_hours.append(np.repeat(weights[:, 1], len(first)))
+        keys, inverse = np.unique(np.concatenate(pair_keys), return_inverse=True)
+        meetings = np.bincount(inverse, weights=np.concatenate(pair_meetings))
+        hours = np.bincount(inverse, weights=np.concatenate(pair_hours))
+        rows = np.concatenate((keys // count, keys % count))
+        columns = np.concatenate((keys % count, keys // count))
+        order = np.lexsort((columns, rows))
+        self._indptr = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=count), out=self._indptr[1:])
+        self._indices = columns[order].astype(np.int32)
+        self._meetings = np.tile(meetings, 2)[order].astype(np.int32)
+        self._hours = np.tile(hours, 2)[order].astype(np.float32)
+
+    @property
+    def edge_count(self) -> int:
+        """
+        edge_count the number of pairs of people who met
+
+        Returns:
+            int: the number of edges
+        """
+        self._build()
+        return len(self._indices) // 2
+
+    def _person_id(self, person: str) -> int:
+        """
+        _person_id get the id of a person in the graph
+
+        Args:
+            person (str): the address
+
+        Raises:
+            KeyError: if the person isn't in the graph
+
+        Returns:
+            int: the id
+        """
+        if person not in self._ids:
+            raise KeyError(f"{person} is not in the contact graph")
+        return self._ids[person]
+
+    def _row(self, person_id: int) -> slice:
+        """
+        _row get where a person's edges are in the adjacency
+
+        Args:
+            person_id (int): the person
+
+        Returns:
+            slice: the positions of their edges
+        """
+        self._build()
+        return slice(self._indptr[person_id], self._indptr[person_id + 1])
+
+    def _weights(self, weight: str) -> np.ndarray:
+        """
+        _weights get an edge weight for every edge in the adjacency
+
+        Args:
+            weight (str): 'meetings' or 'hours'
+
+        Raises:
+            ValueError: for an unknown weight
+
+        Returns:
+            np.ndarray: the weights
+        """
+        if weight not in _WEIGHTS:
+            raise ValueError(f"weight must be one of {_WEIGHTS}, not {weight}")
+        self._build()
+        return self._meetings if weight == "meetings" else self._hours
+
+    def collaborators(
+        self, person: str, top: int = 10, weight: str = "hours"
+    ) -> List[Tuple[str, int, float]]:
+        """
+        collaborators the people someone meets with the most
+
+        Args:
+            person (str): the address
+            top (int, optional): how many people. Defaults to 10.
+            weight (str, optional): rank by 'hours' or 'meetings'. Defaults to
+            'hours'.
+
+        Raises:
+            KeyError: if the person isn't in the graph
+
+        Returns:
+            List[Tuple[str, int, float]]: each collaborator's address, the
+            meetings and the hours they share, most first
+        """
+        row = self._row(self._person_id(person))
+        weights = self._weights(weight)[row]
+        best = np.argsort(-weights, kind="stable")[:top]
+        neighbors = self._indices[row]
+        return [
+            (
+                self.people[neighbors[index]],
+                int(self._meetings[row][index]),
+                round(float(self._hours[row][index]), 2),
+            )
+            for index in best
+        ]
+
+    def clustering(self, person: str) -> float:
+        """
+        clustering the share of the pairs of someone's collaborators who also
+        meet each other, the local clustering coefficient
+
+        Args:
+            person (str): the address
+
+        Raises:
+            KeyError: if the person isn't in the graph
+
+        Returns:
+            float: from 0 to 1, 0 for someone with fewer than two collaborators
+        """
+        row = self._row(self._person_id(person))
+        neighbors = self._indices[row]
+        if len(neighbors) < 2:
+            return 0.0
+        their_neighbors = np.concatenate(
+            [self._indices[self._row(neighbor)] for neighbor in neighbors]
+        )
+        # every link between two collaborators is seen from both ends
+        links = np.count_nonzero(np.isin(their_neighbors, neighbors)) / 2
+        return links / (len(neighbors) * (len(neighbors) - 1) / 2)
+
+    def communities(self, weight: str = "hours", min_size: int = 2) -> List[List[str]]:
+        """
+        communities group people who mostly meet each other, by label
+        propagation: everyone starts in their own group and repeatedly joins
+        the group they share the most weight with. Half the people are moved
+        at a time, alternating even and odd ids, so two people can't keep
+        swapping groups, and ties go to the lowest group so the result is
+        always the same
+
+        Args:
+            weight (str, optional): 'hours' or 'meetings'. Defaults to 'hours'.
+            min_size (int, optional): leave out smaller groups. Defaults to 2.
+
+        Returns:
+            List[List[str]]: the addresses in each group, biggest group first
+        """
+        weights = self._weights(weight).astype(np.float64)
+        count = len(self.people)
+        sources = np.repeat(np.arange(count), np.diff(self._indptr))
+        labels = np.arange(count)
+        unchanged = 0
+        for iteration in range(_MAX_ITERATIONS if len(sources) else 0):
+            keys, inverse = np.unique(
+                sources * count + labels[self._indices], return_inverse=True
+            )
+            scores = np.bincount(inverse, weights=weights)
+            people = keys // count
+            order = np.lexsort((keys % count, -scores, people))
+            best = order[np.r_[True, people[order][1:] != people[order][:-1]]]
+            moving = people[best] % 2 == iteration % 2
+            new_labels = labels.copy()
+            new_labels[people[best][moving]] = keys[best][moving] % count
+            unchanged = unchanged + 1 if np.array_equal(new_labels, labels) else 0
+            labels = new_labels
+            if unchanged == 2:
+                break
+        groups: Dict[int, List[str]] = {}
+        for person_id, label in enumerate(labels):
+            groups.setdefault(int(label), []).append(self.people[person_id])
+        return sorted(
+            (group for group in groups.values() if len(group) >= min_size),
+            key=len,
+            reverse=True,
+        )
+
+    def shortest_path(
+        self, first: str, second: str, weighted: bool = False
+    ) -> List[str] | None:
+        """
+        shortest_path the chain of people connecting two people, such as who
+        could introduce them
+
+        Args:
+            first (str): the address to start from
+            second (str): the address to reach
+            weighted (bool, optional): prefer strong ties, each step costs one
+            over the meetings the two people share. Defaults to False, which
+            finds the fewest steps
+
+        Raises:
+            KeyError: if either person isn't in the graph
+
+        Returns:
+            List[str] | None: the addresses from first to second, or None if
+            they aren't connected
+        """
+        source = self._person_id(first)
+        target = self._person_id(second)
+        self._build()
+        if not weighted:
+            return self._fewest_steps(source, target)
+        costs = 1 / self._meetings
+        distance = {source: 0.0}
+        previous: Dict[int, int] = {}
+        queue = [(0.0, source)]
+        while queue:
+            cost, person_id = heapq.heappop(queue)
+            if person_id == target:
+                path = [target]
+                while path[-1] != source:
+                    path.append(previous[path[-1]])
+                return [self.people[step] for step in reversed(path)]
+            if cost > distance[person_id]:
+                continue
+            row = self._row(person_id)
+            for neighbor, step_cost in zip(
+                self._indices[row].tolist(), costs[row].tolist()
+            ):
+                neighbor_cost = cost + step_cost
+                if neighbor_cost < distance.get(neighbor, float("inf")):
+                    distance[neighbor] = neighbor_cost
+                    previous[neighbor] = person_id
+                    heapq.heappush(queue, (neighbor_cost, neighbor))
+        return None
+
+    def _fewest_steps(self, source: int, target: int) -> List[str] | None:
+        """
+        _fewest_steps breadth first search a layer at a time, the neighbors of
+        the whole layer are found with array operations. Of the people in a
+        layer who could lead to the next, the lowest id is picked, so the path
+        is always the same
+
+        Args:
+            source (int): the id to start from
+            target (int): the id to reach
+
+        Returns:
+            List[str] | None: the addresses from source to target, or None if
+            they aren't connected
+        """
+        parents = np.full(len(self.people), -1, dtype=np.int64)
+        parents[source] = source
+        layer = np.array([source], dtype=np.int64)
+        while len(layer) and parents[target] < 0:
+            starts = self._indptr[layer]
+            lengths = self._indptr[layer + 1] - starts
+            # the positions of every edge of the layer, row after row
+            offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+            neighbors = self._indices[offsets + np.arange(len(offsets))]
+            came_from = np.repeat(layer, lengths)
+            new = parents[neighbors] < 0
+            layer, first_seen = np.unique(neighbors[new], return_index=True)
+            parents[layer] = came_from[new][first_seen]
+        if parents[target] < 0:
+            return None
+        path = [target]
+        while path[-1] != source:
+            path.append(int(parents[path[-1]]))
+        return [self.people[step] for step in reversed(path)]
+
+    def write_graphml(self, filename: str, min_meetings: int = 1) -> None:
+        """
+        write_graphml save the graph as GraphML, which Gephi, networkx and
+        most graph tools read. The file is written to a temporary file first
+        and then renamed, so an interrupted save leaves the previous file intact
+
+        Args:
+            filename (str): the file to save to
+            min_meetings (int, optional): leave out the edges between people
+            with fewer meetings together. Defaults to 1.
+        """
+        self._build()
+        temp_file = filename + ".tmp"
+        try:
+            with open(temp_file, "w", encoding="utf-8") as file:
+                file.write(
+                    '<?xml version="1.0" encoding="UTF-8"?>\n'
+                    f"<graphml xmlns={quoteattr(_GRAPHML_NAMESPACE)}>\n"
+                    '  <key id="email" for="node" attr.name="email" '
+                    'attr.type="string"/>\n'
+                    '  <key id="meetings" for="edge" attr.name="meetings" '
+                    'attr.type="int"/>\n'
+                    '  <key id="hours" for="edge" attr.name="hours" '
+                    'attr.type="double"/>\n'
+                    '  <graph id="co-attendance" edgedefault="undirected">\n'
+                )
+                file.writelines(
+                    f'    <node id="n{person_id}"><data key="email">'
+                    f"{escape(person)}</data></node>\n"
+                    for person_id, person in enumerate(self.people)
+                )
+                sources = np.repeat(np.arange(len(self.people)), np.diff(self._indptr))
+                # each edge once, from its lower id
+                keep = (sources < self._indices) & (self._meetings >= min_meetings)
+                file.writelines(
+                    f'    <edge source="n{source}" target="n{target}">'
+                    f'<data key="meetings">{meetings}</data>'
+                    f'<data key="hours">{hours:.2f}</data></edge>\n'
+                    for source, target, meetings, hours in zip(
+                        sources[keep].tolist(),
+                        self._indices[keep].tolist(),
+                        self._meetings[keep].tolist(),
+                        self._hours[keep].tolist(),
+                    )
+                )
+                file.write("  </graph>\n</graphml>\n")
+            os.replace(temp_file, filename)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+
+if __name__ == "__main__":
+    import parse_calendar  # pylint: disable=C0412
+
+    arg_parser = argparse.ArgumentParser(description="who meets with whom.")
+    arg_parser.add_argument("calendar_file", type=argparse.FileType("rb"))
+    arg_parser.add_argument("--start", type=parse_calendar.parse_date, required=True)
+    arg_parser.add_argument("--end", type=parse_calendar.parse_date, required=True)
+    arg_parser.add_argument("--max-meeting-size", type=int, default=_MAX_MEETING_SIZE)
+    arg_parser.add_argument("--weight", choices=_WEIGHTS, default="hours")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    collaborators_parser = commands.add_parser(
+        "collaborators", help="who a person meets with most"
+    )
+    collaborators_parser.add_argument("person")
+    collaborators_parser.add_argument("--top", type=int, default=10)
+    clustering_parser = commands.add_parser(
+        "clustering", help="how many of a person's collaborators meet each other"
+    )
+    clustering_parser.add_argument("person")
+    communities_parser = commands.add_parser(
+        "communities", help="groups of people who mostly meet each other"
+    )
+    communities_parser.add_argument("--min-size", type=int, default=2)
+    path_parser = commands.add_parser("path", help="who connects two people")
+    path_parser.add_argument("first")
+    path_parser.add_argument("second")
+    path_parser.add_argument("--weighted", action="store_true")
+    graphml_parser = commands.add_parser("graphml", help="save the graph as GraphML")
+    graphml_parser.add_argument("output_file")
+    graphml_parser.add_argument("--min-meetings", type=int, default=1)
+    ns = arg_parser.parse_args()
+
+    with ns.calendar_file:
+        graph = ContactGraph(
+            parse_calendar.calendar_events(ns.calendar_file, ns.start, ns.end),
+            ns.max_meeting_size,
+        )
+    if ns.command == "collaborators":
+        output: object = graph.collaborators(ns.person, ns.top, ns.weight)
+    elif ns.command == "clustering":
+        output = graph.clustering(ns.person)
+    elif ns.command == "communities":
+        output = graph.communities(ns.weight, ns.min_size)
+    elif ns.command == "path":
+        output = graph.shortest_path(ns.first, ns.second, ns.weighted)
+    else:
+        graph.write_graphml(ns.output_file, ns.min_meetings)
+        output = str(graph)
+    print(json.dumps(output, indent=2))
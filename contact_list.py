@@ -1,17 +1,35 @@
 """
     a list of contacts
 """
-from copy import deepcopy
 import csv
 import os
-from typing import List
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
 
+import addresses
 from contact import Contact
 
+# rows are handed to the csv writer this many at a time
+_SAVE_BATCH_SIZE = 10000
+
+
+class AddManyResult(NamedTuple):
+    """
+    the outcome of ContactList.add_many
+    """
+
+    added: int
+    merged: int
+    conflicts: List[Contact]
+
 
 class ContactList:
     """
     a list of contacts that supports finding, and matching
+
+    an index from e-mail address to contact and from (first_name, last_name) to
+    contacts is kept alongside the list so lookups don't have to scan it. The
+    indexes are maintained by add, merge and load_from_file; if you modify
+    contacts directly call reindex afterwards
     """
 
     def __init__(self) -> None:
@@ -19,6 +37,8 @@ class ContactList:
         __init__ initialize the object, set contacts to an empty list
         """
         self.contacts: List[Contact] = []
+        self._email_index: Dict[str, Contact] = {}
+        self._name_index: Dict[Tuple[str, str], List[Contact]] = {}
 
     def __str__(self) -> str:
         """
@@ -29,36 +49,219 @@ class ContactList:
         """
         return f"contact list: {len(self.contacts)} items"
 
-    def add(self, new_contact: Contact) -> None:
+    def add(self, new_contact: Contact) -> bool:
         """
         add add a contact to the list, if the contact is already in the list, merge it
 
         Args:
             new_contact (Contact): the contact object to add
 
+        Returns:
+            bool: True if the contact was new, False if it was merged
+
         Raises:
             KeyError: if the new_contact contains multiple e-mail addresses and they
             map to different contacts
         """
-        if len(new_contact.email) > 1:
-            contact_match = None
-            for email in new_contact.email:
-                test_contact = self.find_by_email(email)
-                if not contact_match:
-                    contact_match = test_contact
-                elif test_contact != contact_match:
-                    raise KeyError(
-                        "more than one contact mapping to the addresses in this contact"
-                    )
-
-        match_contact = self.find_by_email(new_contact.email[0])
+        match_contact = None
+        for email in new_contact.email:
+            test_contact = self.find_by_email(email)
+            if not test_contact:
+                continue
+            if not match_contact:
+                match_contact = test_contact
+            elif test_contact != match_contact:
+                raise KeyError(
+                    "more than one contact mapping to the addresses in this contact"
+                )
+
+        if not match_contact:
+            match_contact = self._find_equal(new_contact)
         if match_contact:
-            match_contact.merge(new_contact)
-        elif new_contact in self.contacts:
-            index = self.contacts.index(new_contact)
-            self.contacts[index].merge(new_contact)
-        else:
-            self.contacts.append(new_contact)
+            self._merge_into(match_contact, new_contact)
+            self._changed(match_contact)
+            return False
+        self.contacts.append(new_contact)
+        self._index(new_contact)
+        self._changed(new_contact)
+        return True
+
+    def add_many(self, new_contacts: Iterable[Contact]) -> AddManyResult:
+        """
+        add_many add a batch of contacts in one pass. The batch is grouped with
+        a union-find: contacts sharing an e-mail address, or equal to each
+        other or to a contact in the list by name when they share no address,
+        end up in the same group, and each group is merged into its contact in
+        the list or added as one new contact. Unlike add, contacts in the batch
+        that link two new contacts together are merged rather than refused; a
+        contact with addresses belonging to different contacts already in the
+        list is skipped and reported instead of raising KeyError
+
+        Args:
+            new_contacts (Iterable[Contact]): the contacts to add
+
+        Returns:
+            AddManyResult: how many new contacts were added, how many contacts in
+            the batch were merged into another, and the skipped contacts
+        """
+        parent: List[int] = []
+        # the contact each group is merged into as the batch is read, a contact
+        # already in the list or the first new contact of the group
+        targets: List[Contact] = []
+        in_list: List[bool] = []
+        # whether anything was merged into the group, or it's new, so it needs
+        # saving
+        changed: List[bool] = []
+        list_nodes: Dict[int, int] = {}
+        email_nodes: Dict[str, int] = {}
+        name_nodes: Dict[Tuple[str, str], int] = {}
+        conflicts: List[Contact] = []
+        count = 0
+
+        def find(node: int) -> int:
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        def new_node(target: Contact, is_in_list: bool) -> int:
+            parent.append(len(parent))
+            targets.append(target)
+            in_list.append(is_in_list)
+            changed.append(not is_in_list)
+            return len(parent) - 1
+
+        def list_node(contact_item: Contact) -> int:
+            node = list_nodes.get(id(contact_item))
+            if node is None:
+                node = new_node(contact_item, True)
+                list_nodes[id(contact_item)] = node
+            return node
+
+        def merge_group(root: int, other: Contact) -> None:
+            changed[root] = True
+            if in_list[root]:
+                self._merge_into(targets[root], other)
+            else:
+                targets[root].merge(other)
+
+        for new_contact in new_contacts:
+            count += 1
+            roots: List[int] = []
+            # whether every address is already known to belong to a group
+            known = True
+            for email in new_contact.email:
+                node = email_nodes.get(email)
+                if node is None:
+                    match_contact = self.find_by_email(email)
+                    if not match_contact:
+                        known = False
+                        continue
+                    node = list_node(match_contact)
+                    email_nodes[email] = node
+                node = find(node)
+                if node not in roots:
+                    roots.append(node)
+            if not roots:
+                match_contact = self._find_equal(new_contact)
+                key = (new_contact.first_name, new_contact.last_name)
+                if match_contact:
+                    roots.append(find(list_node(match_contact)))
+                elif key in name_nodes:
+                    roots.append(find(name_nodes[key]))
+
+            if len(roots) == 1:
+                root = roots[0]
+                target = targets[root]
+                if (
+                    known
+                    and (target.first_name or not new_contact.first_name)
+                    and (target.last_name or not new_contact.last_name)
+                ):
+                    # the group already has everything this contact has
+                    continue
+                merge_group(root, new_contact)
+            elif roots:
+                if sum(1 for root in roots if in_list[root]) > 1:
+                    conflicts.append(new_contact)
+                    continue
+                # a contact in the list absorbs the group, otherwise the group
+                # first seen does so the order of the new contacts is kept
+                root = min(roots, key=lambda node: (not in_list[node], node))
+                for other in roots:
+                    if other != root:
+                        parent[other] = root
+                        merge_group(root, targets[other])
+                merge_group(root, new_contact)
+            else:
+                root = new_node(new_contact, False)
+            for email in new_contact.email:
+                email_nodes.setdefault(email, root)
+            if new_contact.first_name and new_contact.last_name:
+                name_nodes.setdefault(
+                    (new_contact.first_name, new_contact.last_name), root
+                )
+
+        added = 0
+        for node, target in enumerate(targets):
+            if parent[node] != node:
+                continue
+            if not in_list[node]:
+                self.contacts.append(target)
+                self._index(target)
+                added += 1
+            if changed[node]:
+                self._changed(target)
+        return AddManyResult(added, count - added - len(conflicts), conflicts)
+
+    def merge(self, other: "ContactList") -> None:
+        """
+        merge add every contact from another list to this one, merging duplicates
+        with the same rules as add
+
+        Args:
+            other (ContactList): the list to merge into this one
+        """
+        for contact_item in other.contacts:
+            self.add(contact_item)
+
+    def merge_groups(self, groups: Iterable[List[Contact]]) -> int:
+        """
+        merge_groups merge contacts in the list that were found to be the same
+        person some other way than add, such as by contact_dedup. Each group is
+        merged into its first contact and the rest are removed from the list
+
+        Args:
+            groups (Iterable[List[Contact]]): lists of contacts in this list
+
+        Returns:
+            int: the number of contacts removed
+        """
+        removed: Dict[int, Contact] = {}
+        for group in groups:
+            keep = group[0]
+            for other in group[1:]:
+                if other is keep or id(other) in removed:
+                    continue
+                keep.merge(other)
+                removed[id(other)] = other
+            self._changed(keep)
+        if removed:
+            self.contacts = [
+                contact_item
+                for contact_item in self.contacts
+                if id(contact_item) not in removed
+            ]
+            for contact_item in removed.values():
+                self._removed(contact_item)
+            self.reindex()
+        return len(removed)
+
+    def load_all(self) -> None:
+        """
+        load_all make sure every contact is in contacts, for subclasses that
+        only load contacts as they're looked up
+        """
 
     def find_by_email(self, email: str) -> Contact | None:
         """
@@ -70,11 +273,105 @@ class ContactList:
         Returns:
             Contact|None: the Contact if there is one, otherwise None
         """
-        for contact in self.contacts:
-            if email in contact.email:
-                return contact
+        return self._email_index.get(addresses.canonical(email))
+
+    def find_by_name(self, first_name: str, last_name: str) -> List[Contact]:
+        """
+        find_by_name get the contacts with exactly the given first and last name
+
+        Args:
+            first_name (str): the first name to search for
+            last_name (str): the last name to search for
+
+        Returns:
+            List[Contact]: the matching contacts, in the order they were added
+        """
+        return list(self._name_index.get((first_name, last_name), []))
+
+    def reindex(self) -> None:
+        """
+        reindex rebuild the lookup indexes from the contacts list, needed only if
+        the list or its contacts were modified without going through this class
+        """
+        self._email_index = {}
+        self._name_index = {}
+        for contact_item in self.contacts:
+            self._index(contact_item)
+
+    def _find_equal(self, new_contact: Contact) -> Contact | None:
+        """
+        _find_equal find the first contact in the list equal to new_contact, only
+        contacts with the same name can be equal so only those are compared
+
+        Args:
+            new_contact (Contact): the contact to match
+
+        Returns:
+            Contact|None: the first equal Contact if there is one, otherwise None
+        """
+        key = (new_contact.first_name, new_contact.last_name)
+        for contact_item in self._name_index.get(key, []):
+            if new_contact == contact_item:
+                return contact_item
         return None
 
+    def _changed(self, contact_item: Contact) -> None:
+        """
+        _changed called when add creates or modifies a contact, for subclasses
+        that need to know what to save
+
+        Args:
+            contact_item (Contact): the new or modified contact
+        """
+
+    def _removed(self, contact_item: Contact) -> None:
+        """
+        _removed called when merge_groups removes a contact, for subclasses
+        that need to know what to delete
+
+        Args:
+            contact_item (Contact): the removed contact
+        """
+
+    def _index(self, contact_item: Contact) -> None:
+        """
+        _index add a contact to the lookup indexes, an e-mail address already
+        mapped to an earlier contact keeps its mapping
+
+        Args:
+            contact_item (Contact): the contact to index
+        """
+        for email in contact_item.email:
+            self._email_index.setdefault(email, contact_item)
+        key = (contact_item.first_name, contact_item.last_name)
+        self._name_index.setdefault(key, []).append(contact_item)
+
+    def _merge_into(self, existing: Contact, new_contact: Contact) -> None:
+        """
+        _merge_into merge new_contact into a contact in the list and bring the
+        indexes up to date with any new addresses or filled in names
+
+        Args:
+            existing (Contact): the contact already in the list
+            new_contact (Contact): the contact to merge into it
+        """
+        old_key = (existing.first_name, existing.last_name)
+        existing.merge(new_contact)
+        for email in existing.email:
+            self._email_index.setdefault(email, existing)
+        new_key = (existing.first_name, existing.last_name)
+        if new_key != old_key:
+            bucket = [
+                item
+                for item in self._name_index.get(old_key, [])
+                if item is not existing
+            ]
+            if bucket:
+                self._name_index[old_key] = bucket
+            else:
+                self._name_index.pop(old_key, None)
+            self._name_index.setdefault(new_key, []).append(existing)
+
     def load_from_file(self, filename: str = "contacts.csv") -> None:
         """
         load_from_file _summary_
@@ -85,6 +382,24 @@ class ContactList:
         Raises:
             FileNotFoundError: if the file does not exist
         """
+        for new_contact in self._read_csv(filename):
+            self.contacts.append(new_contact)
+            self._index(new_contact)
+
+    @staticmethod
+    def _read_csv(filename: str) -> Iterator[Contact]:
+        """
+        _read_csv read contacts from a csv file written by save_to_file
+
+        Args:
+            filename (str): the file to read
+
+        Raises:
+            FileNotFoundError: if the file does not exist
+
+        Yields:
+            Contact: the contacts in the file
+        """
         if not os.path.exists(filename):
             raise FileNotFoundError(f"file does not exist{filename}")
         with open(filename, "r", encoding="utf-8") as file:
@@ -94,33 +409,55 @@ class ContactList:
                 for key in row.keys():
                     if key.startswith("email") and len(row[key]) > 0:
                         emails.append(row[key])
-                self.contacts.append(
-                    Contact(row["first_name"], row["last_name"], emails)
-                )
+                yield Contact(row["first_name"], row["last_name"], emails)
 
     def save_to_file(self, filename: str = "contacts.csv") -> None:
         """
-        save_to_file save the contents of the list to a csv file
+        save_to_file save the contents of the list to a csv file. The file is
+        written to a temporary file first and then renamed, so an interrupted
+        save leaves the previous file intact
 
         Args:
             filename (str, optional): the file to save to. Defaults to 'contacts.csv'.
         """
         # find the highest number of e-mail addresses
-        email_count = 0
-        for contact_item in self.contacts:
-            if len(contact_item.email) > email_count:
-                email_count = len(contact_item.email)
+        email_count = max(
+            (len(contact_item.email) for contact_item in self.contacts), default=0
+        )
+        self._write_csv(filename, self.contacts, email_count)
+
+    @staticmethod
+    def _write_csv(
+        filename: str, contacts: Iterable[Contact], email_count: int
+    ) -> None:
+        """
+        _write_csv write contacts to a csv file through a temporary file
+
+        Args:
+            filename (str): the file to save to
+            contacts (Iterable[Contact]): the contacts
+            email_count (int): the highest number of e-mail addresses a contact has
+        """
         field_names = ["first_name", "last_name"]
         for i in range(0, email_count):
             field_names.append(f"email_{i+1}")
-        with open(filename, "w", encoding="utf-8") as file:
-            csvwriter = csv.DictWriter(file, fieldnames=field_names, dialect="excel")
-            csvwriter.writeheader()
-            for contact_item in self.contacts:
-                row_dict = deepcopy(contact_item.to_dict())
-                i = 1
-                for email_addr in row_dict["email"]:
-                    row_dict[f"email_{i}"] = email_addr
-                    i = i + 1
-                del row_dict["email"]
-                csvwriter.writerow(row_dict)
+        temp_file = filename + ".tmp"
+        try:
+            with open(temp_file, "w", encoding="utf-8") as file:
+                csvwriter = csv.writer(file, dialect="excel")
+                csvwriter.writerow(field_names)
+                batch = []
+                for contact_item in contacts:
+                    row = [contact_item.first_name, contact_item.last_name]
+                    row.extend(contact_item.email)
+                    # pad like DictWriter does for missing fields
+                    row.extend([""] * (email_count - len(contact_item.email)))
+                    batch.append(row)
+                    if len(batch) >= _SAVE_BATCH_SIZE:
+                        csvwriter.writerows(batch)
+                        batch = []
+                csvwriter.writerows(batch)
+            os.replace(temp_file, filename)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
@@ -0,0 +1,370 @@
+"""
+    a list of contacts kept in a SQLite database
+"""
+import sqlite3
+from typing import Dict, Iterator, List, Set, Tuple
+
+import addresses
+from contact import Contact
+from contact_list import ContactList
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    id INTEGER PRIMARY KEY,
+    first_name TEXT NOT NULL,
+    last_name TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS contacts_name ON contacts (first_name, last_name);
+CREATE TABLE IF NOT EXISTS emails (
+    email TEXT PRIMARY KEY,
+    contact_id INTEGER NOT NULL REFERENCES contacts (id),
+    position INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS emails_contact ON emails (contact_id, position);
+"""
+# let sqlite read the database through a memory map rather than reads
+_MMAP_SIZE = 256 * 1024 * 1024
+
+
+class StoredContactList(ContactList):
+    """
+    a ContactList backed by a SQLite database. Nothing is loaded up front:
+    looking up an address or a name loads the matching contacts from the
+    database into contacts, so contacts only holds the ones used so far. save
+    writes back only the contacts that add created or modified. Like a
+    ContactList it can be used from any thread but only by one at a time, as
+    CalendarProcessor does under its lock, and a pickled copy opens the
+    database again
+    """
+
+    def __init__(self, filename: str) -> None:
+        """
+        __init__ open the database, creating it if needed
+
+        Args:
+            filename (str): the database file
+        """
+        super().__init__()
+        self.filename = filename
+        self._connection = self._connect()
+        self._row_ids: Dict[int, int] = {}
+        self._loaded_rows: Set[int] = set()
+        self._dirty: Dict[int, Contact] = {}
+        self._deleted: List[int] = []
+        self._looked_up_emails: Set[str] = set()
+        self._looked_up_names: Set[Tuple[str, str]] = set()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        _connect open the database, creating the tables if needed
+
+        Returns:
+            sqlite3.Connection: the connection, usable from any thread
+        """
+        connection = sqlite3.connect(self.filename, check_same_thread=False)
+        connection.execute(f"PRAGMA mmap_size = {_MMAP_SIZE}")
+        connection.executescript(_SCHEMA)
+        return connection
+
+    def __getstate__(self) -> dict:
+        """
+        __getstate__ the state to pickle, without the connection which can't
+        be. The contacts' rows and changes are kept by contact rather than by
+        id, which is different in the copy
+
+        Returns:
+            dict: the list's attributes
+        """
+        state = self.__dict__.copy()
+        del state["_connection"]
+        contacts_by_id = {
+            id(contact_item): contact_item for contact_item in self.contacts
+        }
+        state["_row_ids"] = [
+            (contacts_by_id[contact_id], row_id)
+            for contact_id, row_id in self._row_ids.items()
+            if contact_id in contacts_by_id
+        ]
+        state["_dirty"] = list(self._dirty.values())
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """
+        __setstate__ restore a pickled list and open its database again
+
+        Args:
+            state (dict): the attributes from __getstate__
+        """
+        self.__dict__.update(state)
+        self._row_ids = {
+            id(contact_item): row_id for contact_item, row_id in state["_row_ids"]
+        }
+        self._dirty = {
+            id(contact_item): contact_item for contact_item in state["_dirty"]
+        }
+        self._connection = self._connect()
+
+    def __str__(self) -> str:
+        """
+        __str__ return a string summary of the object
+
+        Returns:
+            str: a description of the object
+        """
+        return f"contact list: {len(self)} items"
+
+    def __len__(self) -> int:
+        """
+        __len__ the number of contacts, counting changes that aren't saved yet
+
+        Returns:
+            int: the number of contacts
+        """
+        (stored,) = self._connection.execute("SELECT COUNT(*) FROM contacts").fetchone()
+        unsaved = sum(
+            1 for contact_id in self._dirty if contact_id not in self._row_ids
+        )
+        return stored + unsaved - len(self._deleted)
+
+    def close(self) -> None:
+        """
+        close close the database, unsaved changes are lost
+        """
+        self._connection.close()
+
+    def find_by_email(self, email: str) -> Contact | None:
+        """
+        find_by_email see if there is a contact for a given e-mail address,
+        loading it from the database if it hasn't been yet
+
+        Args:
+            email (str): the e-mail to search for
+
+        Returns:
+            Contact|None: the Contact if there is one, otherwise None
+        """
+        email = addresses.canonical(email)
+        found = super().find_by_email(email)
+        if found or email in self._looked_up_emails:
+            return found
+        self._looked_up_emails.add(email)
+        row = self._connection.execute(
+            "SELECT contact_id FROM emails WHERE email = ?", (email,)
+        ).fetchone()
+        if row:
+            self._load(row[0])
+        return super().find_by_email(email)
+
+    def find_by_name(self, first_name: str, last_name: str) -> List[Contact]:
+        """
+        find_by_name get the contacts with exactly the given first and last name,
+        loading them from the database if they haven't been yet
+
+        Args:
+            first_name (str): the first name to search for
+            last_name (str): the last name to search for
+
+        Returns:
+            List[Contact]: the matching contacts
+        """
+        self._load_name(first_name, last_name)
+        return super().find_by_name(first_name, last_name)
+
+    def _find_equal(self, new_contact: Contact) -> Contact | None:
+        """
+        _find_equal find the first contact equal to new_contact, loading the
+        contacts with the same name from the database first
+
+        Args:
+            new_contact (Contact): the contact to match
+
+        Returns:
+            Contact|None: the first equal Contact if there is one, otherwise None
+        """
+        self._load_name(new_contact.first_name, new_contact.last_name)
+        return super()._find_equal(new_contact)
+
+    def _changed(self, contact_item: Contact) -> None:
+        """
+        _changed remember that a contact needs saving
+
+        Args:
+            contact_item (Contact): the new or modified contact
+        """
+        self._dirty[id(contact_item)] = contact_item
+
+    def _removed(self, contact_item: Contact) -> None:
+        """
+        _removed remember that a stored contact needs deleting
+
+        Args:
+            contact_item (Contact): the removed contact
+        """
+        self._dirty.pop(id(contact_item), None)
+        row_id = self._row_ids.pop(id(contact_item), None)
+        if row_id is not None:
+            self._deleted.append(row_id)
+
+    def load_all(self) -> None:
+        """
+        load_all load every stored contact into contacts
+        """
+        rows = self._connection.execute("SELECT id FROM contacts").fetchall()
+        for (row_id,) in rows:
+            self._load(row_id)
+
+    def _load_name(self, first_name: str, last_name: str) -> None:
+        """
+        _load_name load the contacts with a name from the database, once
+
+        Args:
+            first_name (str): the first name
+            last_name (str): the last name
+        """
+        key = (first_name, last_name)
+        if key in self._looked_up_names:
+            return
+        self._looked_up_names.add(key)
+        rows = self._connection.execute(
+            "SELECT id FROM contacts WHERE first_name = ? AND last_name = ?", key
+        ).fetchall()
+        for (row_id,) in rows:
+            self._load(row_id)
+
+    def _load(self, row_id: int) -> None:
+        """
+        _load load a contact from the database into the list, unless it already is
+
+        Args:
+            row_id (int): the contact's id in the database
+        """
+        if row_id in self._loaded_rows:
+            return
+        first_name, last_name = self._connection.execute(
+            "SELECT first_name, last_name FROM contacts WHERE id = ?", (row_id,)
+        ).fetchone()
+        emails = [
+            email
+            for (email,) in self._connection.execute(
+                "SELECT email FROM emails WHERE contact_id = ? ORDER BY position",
+                (row_id,),
+            )
+        ]
+        stored_contact = Contact(first_name, last_name, emails)
+        self.contacts.append(stored_contact)
+        self._index(stored_contact)
+        self._row_ids[id(stored_contact)] = row_id
+        self._loaded_rows.add(row_id)
+
+    def save(self) -> None:
+        """
+        save write the contacts that were added, modified or removed to the
+        database, in a single transaction
+        """
+        with self._connection:
+            # removed first, so their addresses are free for the contacts they
+            # were merged into
+            for row_id in self._deleted:
+                self._connection.execute(
+                    "DELETE FROM emails WHERE contact_id = ?", (row_id,)
+                )
+                self._connection.execute("DELETE FROM contacts WHERE id = ?", (row_id,))
+            for contact_id, contact_item in self._dirty.items():
+                row_id = self._row_ids.get(contact_id)
+                if row_id is None:
+                    row_id = self._connection.execute(
+                        "INSERT INTO contacts (first_name, last_name) VALUES (?, ?)",
+                        (contact_item.first_name, contact_item.last_name),
+                    ).lastrowid
+                    self._row_ids[contact_id] = row_id
+                    self._loaded_rows.add(row_id)
+                else:
+                    self._connection.execute(
+                        "UPDATE contacts SET first_name = ?, last_name = ? WHERE id = ?",
+                        (contact_item.first_name, contact_item.last_name, row_id),
+                    )
+                    self._connection.execute(
+                        "DELETE FROM emails WHERE contact_id = ?", (row_id,)
+                    )
+                # an address already stored for another contact keeps its
+                # mapping, like the e-mail index in ContactList
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO emails (email, contact_id, position) "
+                    "VALUES (?, ?, ?)",
+                    [
+                        (email, row_id, position)
+                        for position, email in enumerate(contact_item.email)
+                    ],
+                )
+        self._dirty = {}
+        self._deleted = []
+
+    def load_from_file(self, filename: str = "contacts.csv") -> None:
+        """
+        load_from_file import a csv file written by ContactList.save_to_file into
+        the database, the rows are added as they are without merging, like
+        ContactList.load_from_file
+
+        Args:
+            filename (str, optional): the file to import. Defaults to 'contacts.csv'.
+
+        Raises:
+            FileNotFoundError: if the file does not exist
+        """
+        self.save()
+        with self._connection:
+            for new_contact in self._read_csv(filename):
+                row_id = self._connection.execute(
+                    "INSERT INTO contacts (first_name, last_name) VALUES (?, ?)",
+                    (new_contact.first_name, new_contact.last_name),
+                ).lastrowid
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO emails (email, contact_id, position) "
+                    "VALUES (?, ?, ?)",
+                    [
+                        (email, row_id, position)
+                        for position, email in enumerate(new_contact.email)
+                    ],
+                )
+        # earlier lookups that found nothing may find something now
+        self._looked_up_emails = set()
+        self._looked_up_names = set()
+
+    def save_to_file(self, filename: str = "contacts.csv") -> None:
+        """
+        save_to_file save any changes and export every contact in the database
+        to a csv file in the same format as ContactList.save_to_file
+
+        Args:
+            filename (str, optional): the file to save to. Defaults to 'contacts.csv'.
+        """
+        self.save()
+        (email_count,) = self._connection.execute(
+            "SELECT COALESCE(MAX(email_count), 0) FROM "
+            "(SELECT COUNT(*) AS email_count FROM emails GROUP BY contact_id)"
+        ).fetchone()
+        self._write_csv(filename, self._iterate_stored(), email_count)
+
+    def _iterate_stored(self) -> Iterator[Contact]:
+        """
+        _iterate_stored read every contact in the database in the order they
+        were added, without loading them into the list
+
+        Yields:
+            Contact: the contacts
+        """
+        rows = self._connection.execute(
+            "SELECT contacts.id, first_name, last_name, email FROM contacts "
+            "LEFT JOIN emails ON emails.contact_id = contacts.id "
+            "ORDER BY contacts.id, position"
+        )
+        current: Tuple[int, str, str, List[str]] | None = None
+        for row_id, first_name, last_name, email in rows:
+            if not current or current[0] != row_id:
+                if current:
+                    yield Contact(current[1], current[2], current[3])
+                current = (row_id, first_name, last_name, [])
+            if email is not None:
+                current[3].append(email)
+        if current:
+            yield Contact(current[1], current[2], current[3])
@@ -0,0 +1,343 @@
+"""
+    writing calendar events to files, as csv, JSON lines or parquet
+"""
+import abc
+import csv
+import datetime
+import json
+import os
+import shutil
+from typing import Any, Dict, Iterable, Iterator, List, Type
+
+from calendar_event import CalendarEvent
+
+CSV_FIELDS = [
+    "summary",
+    "start",
+    "end",
+    "timestamp",
+    "description",
+    "organizer",
+    "attendees",
+    "uid",
+]
+# rows are handed to the writer this many at a time
+_BATCH_SIZE = 10000
+
+
+def _batches(
+    events: Iterable[CalendarEvent], size: int
+) -> Iterator[List[CalendarEvent]]:
+    """
+    _batches split events into lists of at most size events
+
+    Args:
+        events (Iterable[CalendarEvent]): the events
+        size (int): the largest batch
+
+    Yields:
+        List[CalendarEvent]: the batches, in order
+    """
+    batch: List[CalendarEvent] = []
+    for cal_event in events:
+        batch.append(cal_event)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class EventExporter(abc.ABC):
+    """
+    writes events to a file in one format, a batch at a time so the events
+    never all need to be in memory
+    """
+
+    name = ""
+    extension = ""
+
+    def __init__(self, batch_size: int = _BATCH_SIZE) -> None:
+        """
+        __init__ initialize the exporter
+
+        Args:
+            batch_size (int, optional): the number of events to write at once.
+            Defaults to 10000.
+        """
+        self.batch_size = batch_size
+
+    def __str__(self) -> str:
+        """
+        __str__ return a string summary of the object
+
+        Returns:
+            str: a description of the object
+        """
+        return f"{self.name} exporter"
+
+    @abc.abstractmethod
+    def write(self, events: Iterable[CalendarEvent], filename: str) -> None:
+        """
+        write write events to a file, replacing it
+
+        Args:
+            events (Iterable[CalendarEvent]): the events
+            filename (str): the file to write
+        """
+
+    def combine(self, input_files: List[str], output_file: str) -> None:
+        """
+        combine join files written by write into one, in order
+
+        Args:
+            input_files (List[str]): the files to combine
+            output_file (str): the combined file
+        """
+        with open(output_file, "wb") as output:
+            for input_file in input_files:
+                with open(input_file, "rb") as input_events:
+                    shutil.copyfileobj(input_events, output)
+
+
+class CsvExporter(EventExporter):
+    """
+    the csv format parse_calendar has always written, every value as a string
+    and the attendees joined with commas
+    """
+
+    name = "csv"
+    extension = ".csv"
+
+    def write(self, events: Iterable[CalendarEvent], filename: str) -> None:
+        """
+        write write events to a csv file, replacing it
+
+        Args:
+            events (Iterable[CalendarEvent]): the events
+            filename (str): the file to write
+        """
+        with open(filename, "w", encoding="utf-8") as file:
+            csvwriter = csv.DictWriter(file, fieldnames=CSV_FIELDS, dialect="excel")
+            csvwriter.writeheader()
+            for batch in _batches(events, self.batch_size):
+                csvwriter.writerows(cal_event.dict_for_csv() for cal_event in batch)
+
+    def combine(self, input_files: List[str], output_file: str) -> None:
+        """
+        combine join csv files into one, keeping only the first header
+
+        Args:
+            input_files (List[str]): the files to combine
+            output_file (str): the combined file
+        """
+        with open(output_file, "wb") as output:
+            for index, input_file in enumerate(input_files):
+                with open(input_file, "rb") as input_csv:
+                    header = input_csv.readline()
+                    if index == 0:
+                        output.write(header)
+                    shutil.copyfileobj(input_csv, output)
+
+
+class JsonLinesExporter(EventExporter):
+    """
+    one JSON object per event, with ISO 8601 dates and times and the attendees
+    as a list
+    """
+
+    name = "jsonl"
+    extension = ".jsonl"
+
+    @staticmethod
+    def _record(cal_event: CalendarEvent) -> Dict[str, Any]:
+        """
+        _record get the JSON object for an event
+
+        Args:
+            cal_event (CalendarEvent): the event
+
+        Returns:
+            Dict[str, Any]: the object
+        """
+        return {
+            "uid": cal_event.uid,
+            "summary": cal_event.summary,
+            "start": cal_event.start.isoformat(),
+            "end": cal_event.end.isoformat(),
+            "timestamp": cal_event.timestamp.isoformat(),
+            "description": cal_event.description,
+            "organizer": cal_event.organizer,
+            "attendees": list(cal_event.attendees),
+        }
+
+    def write(self, events: Iterable[CalendarEvent], filename: str) -> None:
+        """
+        write write events to a JSON lines file, replacing it
+
+        Args:
+            events (Iterable[CalendarEvent]): the events
+            filename (str): the file to write
+        """
+        with open(filename, "w", encoding="utf-8") as file:
+            for batch in _batches(events, self.batch_size):
+                file.write(
+                    "".join(
+                        json.dumps(self._record(cal_event)) + "\n"
+                        for cal_event in batch
+                    )
+                )
+
+
+def _utc(value: datetime.date) -> datetime.datetime:
+    """
+    _utc get a date or time as an aware datetime in UTC, a date is midnight
+    and a time without a timezone is taken to be in UTC
+
+    Args:
+        value (datetime.date): the date or datetime
+
+    Returns:
+        datetime.datetime: the time in UTC
+    """
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime(value.year, value.month, value.day)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+    return value.astimezone(datetime.timezone.utc)
+
+
+class ParquetExporter(EventExporter):
+    """
+    a typed columnar file, the times are timestamps in UTC with all_day set for
+    events that have dates rather than times, and the attendees a list column.
+    Each batch is a row group. Needs pyarrow
+    """
+
+    name = "parquet"
+    extension = ".parquet"
+
+    def __init__(self, batch_size: int = _BATCH_SIZE) -> None:
+        """
+        __init__ initialize the exporter
+
+        Args:
+            batch_size (int, optional): the number of events in each row group.
+            Defaults to 10000.
+
+        Raises:
+            ImportError: if pyarrow isn't installed
+        """
+        super().__init__(batch_size)
+        # imported here, pyarrow is optional and slow to import
+        try:
+            import pyarrow  # type: ignore # pylint: disable=C0415
+            import pyarrow.parquet  # type: ignore # pylint: disable=C0415
+        except ImportError as err:
+            raise ImportError(
+                "parquet export needs pyarrow, pip install pyarrow"
+            ) from err
+        self.pyarrow = pyarrow
+        timestamp = pyarrow.timestamp("us", tz="UTC")
+        self.schema = pyarrow.schema(
+            [
+                ("uid", pyarrow.string()),
+                ("summary", pyarrow.string()),
+                ("start", timestamp),
+                ("end", timestamp),
+                ("all_day", pyarrow.bool_()),
+                ("timestamp", timestamp),
+                ("description", pyarrow.string()),
+                ("organizer", pyarrow.string()),
+                ("attendees", pyarrow.list_(pyarrow.string())),
+            ]
+        )
+
+    def _table(self, batch: List[CalendarEvent]) -> Any:
+        """
+        _table get a batch of events as an arrow table
+
+        Args:
+            batch (List[CalendarEvent]): the events
+
+        Returns:
+            pyarrow.Table: the table
+        """
+        columns = {
+            "uid": [cal_event.uid for cal_event in batch],
+            "summary": [cal_event.summary for cal_event in batch],
+            "start": [_utc(cal_event.start) for cal_event in batch],
+            "end": [_utc(cal_event.end) for cal_event in batch],
+            "all_day": [
+                not isinstance(cal_event.start, datetime.datetime)
+                for cal_event in batch
+            ],
+            "timestamp": [_utc(cal_event.timestamp) for cal_event in batch],
+            "description": [cal_event.description for cal_event in batch],
+            "organizer": [cal_event.organizer for cal_event in batch],
+            "attendees": [list(cal_event.attendees) for cal_event in batch],
+        }
+        return self.pyarrow.table(columns, schema=self.schema)
+
+    def write(self, events: Iterable[CalendarEvent], filename: str) -> None:
+        """
+        write write events to a parquet file, replacing it
+
+        Args:
+            events (Iterable[CalendarEvent]): the events
+            filename (str): the file to write
+        """
+        with self.pyarrow.parquet.ParquetWriter(filename, self.schema) as writer:
+            for batch in _batches(events, self.batch_size):
+                writer.write_table(self._table(batch))
+
+    def combine(self, input_files: List[str], output_file: str) -> None:
+        """
+        combine join parquet files into one, keeping their row groups
+
+        Args:
+            input_files (List[str]): the files to combine
+            output_file (str): the combined file
+        """
+        with self.pyarrow.parquet.ParquetWriter(output_file, self.schema) as writer:
+            for input_file in input_files:
+                parquet_file = self.pyarrow.parquet.ParquetFile(input_file)
+                for index in range(parquet_file.num_row_groups):
+                    writer.write_table(parquet_file.read_row_group(index))
+
+
+EXPORTERS: Dict[str, Type[EventExporter]] = {
+    exporter.name: exporter
+    for exporter in [CsvExporter, JsonLinesExporter, ParquetExporter]
+}
+
+
+def exporter_for(filename: str, export_format: str | None = None) -> EventExporter:
+    """
+    exporter_for get the exporter for a format, or for a file's extension
+
+    Args:
+        filename (str): the file to be written
+        export_format (str | None, optional): one of EXPORTERS. Defaults to
+        None, which picks the format from the extension, csv if it's unknown
+
+    Raises:
+        ValueError: if export_format isn't a known format
+        ImportError: if the format needs a package that isn't installed
+
+    Returns:
+        EventExporter: the exporter
+    """
+    if export_format is None:
+        extension = os.path.splitext(filename)[1].lower()
+        export_format = next(
+            (
+                name
+                for name, exporter in EXPORTERS.items()
+                if exporter.extension == extension
+            ),
+            "csv",
+        )
+    if export_format not in EXPORTERS:
+        raise ValueError(f"unknown export format: {export_format}")
+    return EXPORTERS[export_format]()
@@ -0,0 +1,558 @@
+"""
+    an index of expanded calendar events by time, overall and per person, for
+    overlap, conflict and free/busy queries without scanning every event
+"""
+from bisect import bisect_left, bisect_right
+import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Set, Tuple
+
+import addresses
+from calendar_event import CalendarEvent
+
+# events are kept in sorted blocks of about this many
+_BLOCK_SIZE = 256
+# the latest end of an empty block
+_NO_END = -(2**63)
+
+Interval = Tuple[datetime.datetime, datetime.datetime]
+Row = Tuple[int, int, CalendarEvent]
+
+
+def _seconds(value: datetime.date) -> int:
+    """
+    _seconds get a date or time as seconds since the epoch, a date is midnight
+    UTC and a time without a timezone is taken to be in UTC
+
+    Args:
+        value (datetime.date): the date or time
+
+    Returns:
+        int: the seconds
+    """
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime(value.year, value.month, value.day)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return int(value.timestamp())
+
+
+def _time(seconds: int) -> datetime.datetime:
+    """
+    _time get seconds since the epoch as a time in UTC
+
+    Args:
+        seconds (int): the seconds
+
+    Returns:
+        datetime.datetime: the time
+    """
+    return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc)
+
+
+def _people_of(cal_event: CalendarEvent) -> Set[str]:
+    """
+    _people_of the organizer and attendees of an event
+
+    Args:
+        cal_event (CalendarEvent): the event
+
+    Returns:
+        Set[str]: the addresses
+    """
+    people = set(cal_event.attendees)
+    if cal_event.organizer:
+        people.add(cal_event.organizer)
+    return people
+
+
+class _Intervals:
+    """
+    events sorted by start, in blocks of about _BLOCK_SIZE, with a segment
+    tree of the latest end in each block. A query visits only the blocks with
+    an event starting before the window ends and ending after it starts, and
+    every block but the last of those has an event in the window, so finding
+    k events takes O((k + 1) * (_BLOCK_SIZE + log n)) however long the events
+    are. Adding an event is O(_BLOCK_SIZE + log n), plus an O(n / _BLOCK_SIZE)
+    rebuild of the tree when its block splits, every _BLOCK_SIZE adds or more
+    """
+
+    __slots__ = ("starts", "ends", "events", "firsts", "tree", "capacity", "size")
+
+    def __init__(self) -> None:
+        """
+        __init__ initialize with no events
+        """
+        # the starts, ends and events of each block, each block sorted by start
+        self.starts: List[List[int]] = []
+        self.ends: List[List[int]] = []
+        self.events: List[List[CalendarEvent]] = []
+        # the first start of each block
+        self.firsts: List[int] = []
+        # the latest end in each block, tree[capacity + block], and in each
+        # node the latest of its two children
+        self.tree: List[int] = [_NO_END, _NO_END]
+        self.capacity = 1
+        self.size = 0
+
+    def __len__(self) -> int:
+        """
+        __len__ the number of events
+
+        Returns:
+            int: the number of events
+        """
+        return self.size
+
+    def _build_tree(self, latest_ends: List[int]) -> None:
+        """
+        _build_tree rebuild the segment tree
+
+        Args:
+            latest_ends (List[int]): the latest end in each block
+        """
+        capacity = 1
+        while capacity < len(latest_ends):
+            capacity *= 2
+        tree = [_NO_END] * (2 * capacity)
+        tree[capacity : capacity + len(latest_ends)] = latest_ends
+        for node in range(capacity - 1, 0, -1):
+            tree[node] = max(tree[2 * node], tree[2 * node + 1])
+        self.tree = tree
+        self.capacity = capacity
+
+    def add(self, start: int, end: int, cal_event: CalendarEvent) -> None:
+        """
+        add add an event, keeping the blocks sorted. Events with the same start
+        stay in the order they were added
+
+        Args:
+            start (int): the start in seconds since the epoch
+            end (int): the end in seconds since the epoch
+            cal_event (CalendarEvent): the event
+        """
+        if not self.starts:
+            self.extend([(start, end, cal_event)])
+            return
+        block = max(0, bisect_right(self.firsts, start) - 1)
+        starts = self.starts[block]
+        index = bisect_right(starts, start)
+        starts.insert(index, start)
+        self.ends[block].insert(index, end)
+        self.events[block].insert(index, cal_event)
+        self.firsts[block] = starts[0]
+        self.size += 1
+        if len(starts) > 2 * _BLOCK_SIZE:
+            half = len(starts) // 2
+            for column in (self.starts, self.ends, self.events):
+                column.insert(block + 1, column[block][half:])
+                del column[block][half:]
+            self.firsts.insert(block + 1, self.starts[block + 1][0])
+            latest_ends = self.tree[
+                self.capacity : self.capacity + len(self.firsts) - 1
+            ]
+            latest_ends[block : block + 1] = [
+                max(self.ends[block]),
+                max(self.ends[block + 1]),
+            ]
+            self._build_tree(latest_ends)
+            return
+        node = self.capacity + block
+        while node and self.tree[node] < end:
+            self.tree[node] = end
+            node //= 2
+
+    def extend(self, rows: Iterable[Row]) -> None:
+        """
+        extend add many events with a single sort, rather than inserting each.
+        Events with the same start stay in the order added, as they do with add
+
+        Args:
+            rows (Iterable[Row]): the start, end and event of each
+        """
+        rows = self.all() + list(rows)
+        rows.sort(key=lambda row: row[0])
+        blocks = [
+            rows[offset : offset + _BLOCK_SIZE]
+            for offset in range(0, len(rows), _BLOCK_SIZE)
+        ]
+        self.starts = [[row[0] for row in block] for block in blocks]
+        self.ends = [[row[1] for row in block] for block in blocks]
+        self.events = [[row[2] for row in block] for block in blocks]
+        self.firsts = [starts[0] for starts in self.starts]
+        self.size = len(rows)
+        self._build_tree([max(ends) for ends in self.ends])
+
+    def _blocks_overlapping(self, start: int, end: int) -> List[int]:
+        """
+        _blocks_overlapping find the blocks that may have events overlapping a
+        window, those with an event starting before its end and one ending
+        after its start
+
+        Args:
+            start (int): the start of the window
+            end (int): the end of the window
+
+        Returns:
+            List[int]: the blocks, in order
+        """
+        last = bisect_left(self.firsts, end)
+        tree = self.tree
+        found = []
+        # the nodes to visit, with the range of blocks each covers
+        nodes = [(1, 0, self.capacity)]
+        while nodes:
+            node, low, high = nodes.pop()
+            if low >= last or tree[node] <= start:
+                continue
+            if high - low == 1:
+                found.append(low)
+                continue
+            middle = (low + high) // 2
+            nodes.append((2 * node + 1, middle, high))
+            nodes.append((2 * node, low, middle))
+        return found
+
+    def overlapping(self, start: int, end: int) -> Iterator[Row]:
+        """
+        overlapping find the events that overlap a window, touching it at either
+        end doesn't count
+
+        Args:
+            start (int): the start of the window
+            end (int): the end of the window
+
+        Yields:
+            Row: the start, end and event, in order of start
+        """
+        for block in self._blocks_overlapping(start, end):
+            starts = self.starts[block]
+            ends = self.ends[block]
+            for index in range(bisect_left(starts, end)):
+                if ends[index] > start:
+                    yield starts[index], ends[index], self.events[block][index]
+
+    def all(self) -> List[Row]:
+        """
+        all every event, in order of start
+
+        Returns:
+            List[Row]: the start, end and event
+        """
+        return [
+            row
+            for block in range(len(self.starts))
+            for row in zip(self.starts[block], self.ends[block], self.events[block])
+        ]
+
+
+class EventIndex:
+    """
+    events indexed by time, and by the people organizing or attending them.
+    Finding the events in a window takes time in proportion to the events
+    found, see _Intervals, however long or dense they are
+    """
+
+    def __init__(self, events: Iterable[CalendarEvent] = ()) -> None:
+        """
+        __init__ build the index
+
+        Args:
+            events (Iterable[CalendarEvent], optional): the events to start
+            with. Defaults to none.
+        """
+        self._all = _Intervals()
+        self._people: Dict[str, _Intervals] = {}
+        # loaded with a sort per person, inserting each event would be slower
+        # for events that aren't in order
+        rows: List[Row] = []
+        people_rows: Dict[str, List[Row]] = {}
+        for cal_event in events:
+            row = (_seconds(cal_event.start), _seconds(cal_event.end), cal_event)
+            rows.append(row)
+            for person in _people_of(cal_event):
+                people_rows.setdefault(person, []).append(row)
+        self._all.extend(rows)
+        for person, person_rows in people_rows.items():
+            self._people[person] = _Intervals()
+            self._people[person].extend(person_rows)
+
+    def __str__(self) -> str:
+        """
+        __str__ return a string summary of the object
+
+        Returns:
+            str: a description of the object
+        """
+        return f"event index: {len(self)} events, {len(self._people)} people"
+
+    def __len__(self) -> int:
+        """
+        __len__ the number of events
+
+        Returns:
+            int: the number of events
+        """
+        return len(self._all)
+
+    def add(self, cal_event: CalendarEvent) -> None:
+        """
+        add add an event to the index
+
+        Args:
+            cal_event (CalendarEvent): the event
+        """
+        start = _seconds(cal_event.start)
+        end = _seconds(cal_event.end)
+        self._all.add(start, end, cal_event)
+        for person in _people_of(cal_event):
+            self._people.setdefault(person, _Intervals()).add(start, end, cal_event)
+
+    def people(self) -> List[str]:
+        """
+        people everyone in the index
+
+        Returns:
+            List[str]: the addresses, in the order they were first seen
+        """
+        return list(self._people)
+
+    def overlapping(
+        self,
+        start: datetime.date,
+        end: datetime.date,
+        person: str | None = None,
+    ) -> List[CalendarEvent]:
+        """
+        overlapping find the events that overlap a window
+
+        Args:
+            start (datetime.date): the start of the window
+            end (datetime.date): the end of the window
+            person (str | None, optional): only this person's events. Defaults
+            to None, for everyone's.
+
+        Returns:
+            List[CalendarEvent]: the events, in order of start
+        """
+        intervals = (
+            self._all
+            if person is None
+            else self._people.get(addresses.canonical(person))
+        )
+        if not intervals:
+            return []
+        return [
+            cal_event
+            for _, _, cal_event in intervals.overlapping(_seconds(start), _seconds(end))
+        ]
+
+    def who_is_busy(self, start: datetime.date, end: datetime.date) -> Set[str]:
+        """
+        who_is_busy the people in a meeting at some point in a window
+
+        Args:
+            start (datetime.date): the start of the window
+            end (datetime.date): the end of the window
+
+        Returns:
+            Set[str]: the addresses
+        """
+        busy: Set[str] = set()
+        for cal_event in self.overlapping(start, end):
+            busy.update(cal_event.attendees)
+            if cal_event.organizer:
+                busy.add(cal_event.organizer)
+        return busy
+
+    def busy(
+        self, person: str, start: datetime.date, end: datetime.date
+    ) -> List[Interval]:
+        """
+        busy the times a person is in meetings during a window, overlapping and
+        adjacent meetings are joined
+
+        Args:
+            person (str): the address
+            start (datetime.date): the start of the window
+            end (datetime.date): the end of the window
+
+        Returns:
+            List[Interval]: the busy times in UTC, clipped to the window
+        """
+        intervals = self._people.get(addresses.canonical(person))
+        if not intervals:
+            return []
+        window_start = _seconds(start)
+        window_end = _seconds(end)
+        found = sorted(
+            (max(event_start, window_start), min(event_end, window_end))
+            for event_start, event_end, _ in intervals.overlapping(
+                window_start, window_end
+            )
+        )
+        merged: List[List[int]] = []
+        for event_start, event_end in found:
+            if merged and event_start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], event_end)
+            else:
+                merged.append([event_start, event_end])
+        return [(_time(busy_start), _time(busy_end)) for busy_start, busy_end in merged]
+
+    def free(
+        self, person: str, start: datetime.date, end: datetime.date
+    ) -> List[Interval]:
+        """
+        free the times a person has no meetings during a window
+
+        Args:
+            person (str): the address
+            start (datetime.date): the start of the window
+            end (datetime.date): the end of the window
+
+        Returns:
+            List[Interval]: the free times in UTC
+        """
+        free_times = []
+        free_start = _time(_seconds(start))
+        for busy_start, busy_end in self.busy(person, start, end):
+            if busy_start > free_start:
+                free_times.append((free_start, busy_start))
+            free_start = busy_end
+        window_end = _time(_seconds(end))
+        if free_start < window_end:
+            free_times.append((free_start, window_end))
+        return free_times
+
+    def conflicts_with(self, cal_event: CalendarEvent) -> List[CalendarEvent]:
+        """
+        conflicts_with the other events that overlap an event and share one of
+        its people
+
+        Args:
+            cal_event (CalendarEvent): the event, which needn't be in the index
+
+        Returns:
+            List[CalendarEvent]: the conflicting events, in order of start
+        """
+        people = _people_of(cal_event)
+        found: Dict[int, Tuple[int, CalendarEvent]] = {}
+        start = _seconds(cal_event.start)
+        end = _seconds(cal_event.end)
+        for person in people:
+            intervals = self._people.get(person)
+            if not intervals:
+                continue
+            for other_start, _, other in intervals.overlapping(start, end):
+                if other is not cal_event:
+                    found[id(other)] = (other_start, other)
+        return [other for _, other in sorted(found.values(), key=lambda item: item[0])]
+
+    def conflicts(self, person: str) -> List[Tuple[CalendarEvent, CalendarEvent]]:
+        """
+        conflicts the pairs of a person's events that overlap each other
+
+        Args:
+            person (str): the address
+
+        Returns:
+            List[Tuple[CalendarEvent, CalendarEvent]]: the pairs, the earlier
+            starting event first
+        """
+        intervals = self._people.get(addresses.canonical(person))
+        if not intervals:
+            return []
+        pairs = []
+        # events still running, as a sweep passes each start in order
+        running: List[Tuple[int, CalendarEvent]] = []
+        for start, end, cal_event in intervals.all():
+            running = [item for item in running if item[0] > start]
+            pairs.extend((other, cal_event) for _, other in running)
+            running.append((end, cal_event))
+        return pairs
+
+
+def _interval_json(interval: Interval) -> List[str]:
+    """
+    _interval_json get a time interval in a form json can write
+
+    Args:
+        interval (Interval): the interval
+
+    Returns:
+        List[str]: the start and end in ISO 8601
+    """
+    return [interval[0].isoformat(), interval[1].isoformat()]
+
+
+def _event_json(cal_event: CalendarEvent) -> Dict[str, str]:
+    """
+    _event_json get the parts of an event worth printing
+
+    Args:
+        cal_event (CalendarEvent): the event
+
+    Returns:
+        Dict[str, str]: the uid, summary, start and end
+    """
+    return {
+        "uid": cal_event.uid,
+        "summary": cal_event.summary,
+        "start": cal_event.start.isoformat(),
+        "end": cal_event.end.isoformat(),
+    }
+
+
+QUERIES = ["overlaps", "busy", "free", "conflicts"]
+
+
+def query(
+    index: EventIndex,
+    command: str,
+    start: datetime.date,
+    end: datetime.date,
+    person: str | None = None,
+) -> Any:
+    """
+    query answer one of the QUERIES in a form json can write, for
+    parse_calendar's --query
+
+    Args:
+        index (EventIndex): the events
+        command (str): overlaps, the events in the window; busy, who is in a
+        meeting in the window; free, a person's free and busy times; or
+        conflicts, a person's overlapping events
+        start (datetime.date): the start of the window
+        end (datetime.date): the end of the window
+        person (str | None, optional): the person, needed for free and
+        conflicts. Defaults to None, for everyone's events with overlaps.
+
+    Raises:
+        ValueError: for an unknown command, or no person for one that needs it
+
+    Returns:
+        Any: the answer
+    """
+    if command not in QUERIES:
+        raise ValueError(f"unknown query: {command}")
+    if command == "overlaps":
+        return [
+            _event_json(cal_event)
+            for cal_event in index.overlapping(start, end, person=person)
+        ]
+    if command == "busy":
+        return sorted(index.who_is_busy(start, end))
+    if not person:
+        raise ValueError(f"the {command} query needs a person")
+    if command == "free":
+        return {
+            "busy": [
+                _interval_json(interval) for interval in index.busy(person, start, end)
+            ],
+            "free": [
+                _interval_json(interval) for interval in index.free(person, start, end)
+            ],
+        }
+    return [
+        [_event_json(first), _event_json(second)]
+        for first, second in index.conflicts(person)
+    ]
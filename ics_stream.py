@@ -0,0 +1,328 @@
+"""
+    read very large .ics exports without parsing the whole file at once. The
+    file is memory mapped and scanned for its VEVENT and VTIMEZONE blocks, only
+    their offsets are kept. The calendar's properties and timezones are parsed
+    once and the events a few series at a time, so memory is bounded by a batch
+    of events rather than by the size of the export
+"""
+import hashlib
+import io
+import mmap
+import re
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    BinaryIO,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    TextIO,
+    Tuple,
+)
+
+if TYPE_CHECKING:
+    from icalendar import Calendar  # type: ignore
+
+_BATCH_SIZE = 100
+# the blocks we split on, component names are case-insensitive but every
+# exporter writes them in upper case
+_COMPONENTS = [b"VTIMEZONE", b"VEVENT"]
+_NEWLINE = ord("\n")
+_FOLD = re.compile(rb"\r?\n[ \t]")
+_ESCAPE = re.compile(rb"\\([\\;,nN])")
+_X_WR_TIMEZONE = re.compile(rb"^X-WR-TIMEZONE[;:].*$", re.M)
+_END_CALENDAR = b"END:VCALENDAR\r\n"
+
+
+class IcsStream:
+    """
+    the events of an .ics file, a run of whole event series at a time. Every
+    component of a series, the master and its modified occurrences, is always
+    handed out together wherever they are in the file
+    """
+
+    def __init__(self, calendar_file: BinaryIO | TextIO) -> None:
+        """
+        __init__ map a calendar file and find its components, a file that can't
+        be mapped, such as a download, is read into memory instead
+
+        Args:
+            calendar_file (BinaryIO | TextIO): the open calendar file, it is
+            closed once mapped
+        """
+        self.name = getattr(calendar_file, "name", "")
+        self._buffer: Any
+        try:
+            self._buffer = mmap.mmap(calendar_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (io.UnsupportedOperation, ValueError):
+            # not a real file, or an empty one
+            data = calendar_file.read()
+            self._buffer = data.encode("utf-8") if isinstance(data, str) else data
+        calendar_file.close()
+        self._header_end = 0
+        self._timezones: List[Tuple[int, int]] = []
+        # the start and end offsets of each series' blocks, one after the other
+        self._series: Dict[str, List[int]] = {}
+        self._scan()
+        self._template: "Calendar | None" = None
+
+    def __str__(self) -> str:
+        """
+        __str__ return a string summary of the object
+
+        Returns:
+            str: a description of the object
+        """
+        return (
+            f"ics stream: {self.name}, {len(self._series)} series, "
+            f"{len(self._timezones)} timezones"
+        )
+
+    def close(self) -> None:
+        """
+        close unmap the file
+        """
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+    def __len__(self) -> int:
+        """
+        __len__ the number of event series in the file
+
+        Returns:
+            int: the number of series
+        """
+        return len(self._series)
+
+    def _scan(self) -> None:
+        """
+        _scan find the end of the calendar's properties and the offsets of the
+        timezone and event blocks
+        """
+        calendar_start = self._find_line(b"BEGIN:VCALENDAR", 0)
+        self._header_end = max(0, self._find_line(b"BEGIN:", calendar_start + 1))
+        if not self._header_end:
+            return
+        for name in _COMPONENTS:
+            start = self._find_line(b"BEGIN:" + name, self._header_end)
+            while start >= 0:
+                end = self._find_line(b"END:" + name, start)
+                if end < 0:
+                    # a file cut short
+                    break
+                end += len(b"END:" + name)
+                if name == b"VEVENT":
+                    self._series.setdefault(self._uid(start, end), []).extend(
+                        (start, end)
+                    )
+                else:
+                    self._timezones.append((start, end))
+                start = self._find_line(b"BEGIN:" + name, end)
+
+    def _find_line(self, text: bytes, start: int, end: int | None = None) -> int:
+        """
+        _find_line find the next line that starts with some text. This searches
+        for the text and checks it's at the start of a line, which is much
+        faster than a regular expression trying every line
+
+        Args:
+            text (bytes): the start of the line
+            start (int): the offset to search from
+            end (int | None, optional): the offset to search to. Defaults to
+            None, for the end of the file
+
+        Returns:
+            int: the offset of the line, or -1 if there isn't one
+        """
+        buffer = self._buffer
+        end = len(buffer) if end is None else end
+        found = buffer.find(text, start, end)
+        while found > 0 and buffer[found - 1] != _NEWLINE:
+            found = buffer.find(text, found + 1, end)
+        return found
+
+    def _uid(self, start: int, end: int) -> str:
+        """
+        _uid read the UID of an event block without parsing the event
+
+        Args:
+            start (int): the offset of the block
+            end (int): the offset of the end of the block
+
+        Returns:
+            str: the UID, or '' if the event has none
+        """
+        buffer = self._buffer
+        line = self._find_line(b"UID", start, end)
+        while line >= 0 and buffer[line + 3 : line + 4] not in (b":", b";"):
+            line = self._find_line(b"UID", line + 1, end)
+        if line < 0:
+            return ""
+        value_start = buffer.find(b":", line, end) + 1
+        value_end = buffer.find(b"\n", value_start, end)
+        # and any folded lines continuing it
+        while buffer[value_end + 1 : value_end + 2] in (b" ", b"\t"):
+            value_end = buffer.find(b"\n", value_end + 1, end)
+        uid = _FOLD.sub(b"", buffer[value_start:value_end]).rstrip(b"\r")
+        # unescaped like icalendar does, so it matches the parsed event's UID
+        return _ESCAPE.sub(
+            lambda escape: b"\n" if escape.group(1) in b"nN" else escape.group(1), uid
+        ).decode("utf-8")
+
+    def _blocks(self, uids: List[str]) -> bytes:
+        """
+        _blocks get the event blocks of some series
+
+        Args:
+            uids (List[str]): the series
+
+        Returns:
+            bytes: their blocks, one per line
+        """
+        buffer = self._buffer
+        blocks = []
+        for uid in uids:
+            offsets = self._series[uid]
+            for index in range(0, len(offsets), 2):
+                blocks.append(buffer[offsets[index] : offsets[index + 1]])
+        return b"\r\n".join(blocks) + b"\r\n"
+
+    def _header(self) -> bytes:
+        """
+        _header get the calendar's properties and timezones, without its events
+
+        Returns:
+            bytes: an ical file for the calendar with no events
+        """
+        buffer = self._buffer
+        if not self._header_end:
+            # no components, the calendar is only its properties
+            return bytes(buffer)
+        timezones = b"".join(
+            buffer[start:end] + b"\r\n" for start, end in self._timezones
+        )
+        return buffer[: self._header_end] + timezones + _END_CALENDAR
+
+    def template(self) -> "Calendar":
+        """
+        template the calendar's properties and timezones, parsed the first time
+        they are asked for
+
+        Returns:
+            Calendar: a calendar with no events
+        """
+        if self._template is None:
+            from icalendar import Calendar  # type: ignore # pylint: disable=C0415
+
+            self._template = Calendar.from_ical(self._header())
+        return self._template
+
+    def timezone_digest(self) -> str:
+        """
+        timezone_digest a digest of what the expansion of every event depends
+        on, the calendar's X-WR-TIMEZONE and its timezones
+
+        Returns:
+            str: the digest
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        for match in _X_WR_TIMEZONE.finditer(self._buffer, 0, self._header_end):
+            digest.update(match.group(0))
+        for start, end in self._timezones:
+            digest.update(self._buffer[start:end])
+        return digest.hexdigest()
+
+    def series_digests(self) -> Dict[str, str]:
+        """
+        series_digests a digest of the blocks of each event series, to find the
+        series that changed without parsing them
+
+        Returns:
+            Dict[str, str]: the digest for each UID, in the order they first
+            appear
+        """
+        return {
+            uid: hashlib.blake2b(self._blocks([uid]), digest_size=16).hexdigest()
+            for uid in self._series
+        }
+
+    def _batches(
+        self, batch_size: int, uids: Iterable[str] | None = None
+    ) -> Iterator[List[str]]:
+        """
+        _batches split the series into runs, in the order they first appear,
+        each with at least batch_size components apart from the last
+
+        Args:
+            batch_size (int): the number of components in a batch
+            uids (Iterable[str] | None, optional): only these series. Defaults
+            to None, for all of them
+
+        Yields:
+            List[str]: the UIDs of a run of series
+        """
+        batch: List[str] = []
+        size = 0
+        for uid in self._series if uids is None else uids:
+            offsets = self._series[uid]
+            batch.append(uid)
+            size += len(offsets) // 2
+            if size >= batch_size:
+                yield batch
+                batch = []
+                size = 0
+        if batch:
+            yield batch
+
+    def calendars(
+        self, batch_size: int = _BATCH_SIZE, uids: Iterable[str] | None = None
+    ) -> Iterator["Calendar"]:
+        """
+        calendars parse the events a run of whole series at a time, each run
+        with the calendar's properties and timezones. Only the events are
+        parsed again for each run
+
+        Args:
+            batch_size (int, optional): about how many components to parse at
+            once. Defaults to 100.
+            uids (Iterable[str] | None, optional): only parse these series.
+            Defaults to None, for all of them
+
+        Yields:
+            Calendar: a calendar with the next run of series
+        """
+        from icalendar import Calendar, Event  # type: ignore # pylint: disable=C0415
+
+        template = self.template()
+        for batch in self._batches(batch_size, uids):
+            calendar = Calendar()
+            calendar.update(template)
+            calendar.subcomponents.extend(template.subcomponents)
+            calendar.subcomponents.extend(
+                Event.from_ical(self._blocks(batch), multiple=True)
+            )
+            yield calendar
+
+    def shards(self, shards: int) -> List[Tuple[List[str], bytes]]:
+        """
+        shards split the file into smaller calendars of whole series without
+        parsing it, like parse_calendar.shard_calendar
+
+        Args:
+            shards (int): the most shards to split it into
+
+        Returns:
+            List[Tuple[List[str], bytes]]: the UIDs of the series in each shard,
+            in order, and the shard as an ical file
+        """
+        component_count = sum(len(offsets) // 2 for offsets in self._series.values())
+        header = self._header()
+        # a calendar with no components is returned as it was read, which may
+        # not end with _END_CALENDAR
+        if header.endswith(_END_CALENDAR):
+            header = header[: -len(_END_CALENDAR)]
+        return [
+            (uids, header + self._blocks(uids) + _END_CALENDAR)
+            for uids in self._batches(max(1, -(-component_count // max(1, shards))))
+        ]
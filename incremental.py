@@ -0,0 +1,178 @@
+"""
+    track which events in a calendar changed since the last run
+"""
+import json
+import os
+from typing import TYPE_CHECKING, Dict, Set, Tuple
+
+if TYPE_CHECKING:
+    from icalendar import Calendar  # type: ignore
+
+_STATE_SUFFIX = ".state.json"
+
+
+def state_file_for(output_file: str) -> str:
+    """
+    state_file_for get the state file that goes with a calendar csv file
+
+    Args:
+        output_file (str): the csv file the events are written to
+
+    Returns:
+        str: the path of the state file
+    """
+    return output_file + _STATE_SUFFIX
+
+
+def event_stamps(calendar: "Calendar") -> Tuple[Dict[str, str], str]:
+    """
+    event_stamps get a stamp for every event series in a calendar that changes
+    whenever the series or one of its modified occurrences is edited. The stamp
+    uses LAST-MODIFIED where the exporter sets it and DTSTAMP otherwise, along
+    with SEQUENCE
+
+    Args:
+        calendar (Calendar): the parsed calendar
+
+    Returns:
+        Tuple[Dict[str, str], str]: the stamp for each UID and the latest
+        modification time in the calendar
+    """
+    component_stamps: Dict[str, list] = {}
+    max_stamp = ""
+    for component in calendar.walk("VEVENT"):
+        uid = str(component.get("uid", ""))
+        modified = component.get("last-modified", component.get("dtstamp"))
+        modified_str = modified.dt.isoformat() if modified else ""
+        max_stamp = max(max_stamp, modified_str)
+        recurrence_id = component.get("recurrence-id")
+        recurrence_str = recurrence_id.dt.isoformat() if recurrence_id else ""
+        component_stamps.setdefault(uid, []).append(
+            f"{recurrence_str}@{modified_str}#{component.get('sequence', 0)}"
+        )
+    stamps = {uid: "|".join(sorted(items)) for uid, items in component_stamps.items()}
+    return stamps, max_stamp
+
+
+def filter_calendar(calendar: "Calendar", uids: Set[str]) -> "Calendar":
+    """
+    filter_calendar get a copy of a calendar with only the events in some
+    series, all other components (such as timezones) are kept
+
+    Args:
+        calendar (Calendar): the calendar to filter
+        uids (Set[str]): the UIDs of the events to keep
+
+    Returns:
+        Calendar: the filtered calendar
+    """
+    filtered = type(calendar)()
+    for key, value in calendar.items():
+        filtered[key] = value
+    for component in calendar.subcomponents:
+        if component.name != "VEVENT" or str(component.get("uid", "")) in uids:
+            filtered.add_component(component)
+    return filtered
+
+
+class IncrementalState:
+    """
+    the watermark for a calendar: the stamp of each event series and the
+    latest stamp seen, plus the date window they were expanded over
+    """
+
+    def __init__(self, state_file: str) -> None:
+        """
+        __init__ initialize the state, loading it from state_file if it exists
+
+        Args:
+            state_file (str): the file the state is kept in
+        """
+        self.state_file = state_file
+        self.stamps: Dict[str, str] = {}
+        self.max_stamp = ""
+        self.window: list = []
+        if os.path.exists(state_file):
+            with open(state_file, "r", encoding="utf-8") as file:
+                state = json.load(file)
+            self.stamps = state.get("stamps", {})
+            self.max_stamp = state.get("max_stamp", "")
+            self.window = state.get("window", [])
+
+    def __str__(self) -> str:
+        """
+        __str__ return a string summary of the object
+
+        Returns:
+            str: a description of the object
+        """
+        return f"incremental state: {len(self.stamps)} series up to {self.max_stamp}"
+
+    def changes(
+        self, stamps: Dict[str, str], start_date: tuple, end_date: tuple
+    ) -> Tuple[Set[str], Set[str]]:
+        """
+        changes compare the current stamps against the state. If the date window
+        differs from the last run every series counts as changed
+
+        Args:
+            stamps (Dict[str, str]): the current stamps from event_stamps
+            start_date (tuple): the first day of the window
+            end_date (tuple): the last day of the window
+
+        Returns:
+            Tuple[Set[str], Set[str]]: the UIDs that are new or modified and the
+            UIDs that have been removed
+        """
+        if self.window != [list(start_date), list(end_date)]:
+            return set(stamps), set(self.stamps) - set(stamps)
+        changed = {
+            uid for uid, stamp in stamps.items() if self.stamps.get(uid) != stamp
+        }
+        removed = set(self.stamps) - set(stamps)
+        return changed, removed
+
+    def update(
+        self,
+        stamps: Dict[str, str],
+        max_stamp: str,
+        start_date: tuple,
+        end_date: tuple,
+    ) -> None:
+        """
+        update replace the state with the current stamps
+
+        Args:
+            stamps (Dict[str, str]): the current stamps from event_stamps
+            max_stamp (str): the latest modification time from event_stamps
+            start_date (tuple): the first day of the window
+            end_date (tuple): the last day of the window
+        """
+        self.stamps = dict(stamps)
+        self.max_stamp = max_stamp
+        self.window = [list(start_date), list(end_date)]
+
+    def reset(self) -> None:
+        """
+        reset forget the previous run so everything is processed again
+        """
+        self.stamps = {}
+        self.max_stamp = ""
+        self.window = []
+
+    def save(self) -> None:
+        """
+        save write the state, through a temporary file so an interrupted save
+        leaves the previous state intact
+        """
+        temp_file = self.state_file + ".tmp"
+        with open(temp_file, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "max_stamp": self.max_stamp,
+                    "window": self.window,
+                    "stamps": self.stamps,
+                },
+                file,
+            )
+        os.replace(temp_file, self.state_file)
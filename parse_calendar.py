@@ -1,20 +1,59 @@
 """parse a ical calendar file and produce a list of events and a people
+
+CalendarProcessor is the library interface, the command line is a wrapper
+around it. The iCal libraries, the process pool and the contacts database are
+imported where they're first used, so --help and the contact commands start
+quickly
 """
 
 import argparse
 import configparser
+from contextlib import AbstractContextManager, nullcontext
 import csv
+import datetime
+import glob
 import logging
 import os
-from typing import Dict, Any, TextIO, List
-
-from icalendar import Calendar  # type: ignore
-import recurring_ical_events  # type: ignore
-import x_wr_timezone  # type: ignore
+import re
+import shutil
+import tempfile
+import threading
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Set,
+    TextIO,
+    Tuple,
+)
 
-from calendar_event import CalendarEvent
+import addresses
+from calendar_cache import CalendarCache
+from calendar_sources import (
+    fetch_calendars,
+    fetch_url,
+    is_url,
+    open_calendar,
+    source_stem,
+)
+from calendar_event import CalendarEvent, CalendarEventBuilder
 from contact import Contact
 from contact_list import ContactList
+from event_exporters import CSV_FIELDS, EXPORTERS, exporter_for
+from event_index import QUERIES, EventIndex, query
+from ics_stream import IcsStream
+from incremental import IncrementalState, event_stamps, filter_calendar, state_file_for
+from pipeline_metrics import PipelineMetrics
+
+if TYPE_CHECKING:
+    from icalendar import Calendar  # type: ignore
+
+    import contact_dedup
 
 _DEFAULT_DATA_DIR = "data"
 _CONFIG_FILE = "parse_calendar.ini"
@@ -22,14 +61,21 @@ _LOG_FILE = "parse_calendar.log"
 _CONSOLE_LEVEL = logging.INFO
 _FILE_LEVEL = logging.INFO
 _CONTACTS_FILE = _DEFAULT_DATA_DIR + "/" + "contacts.csv"
+_CALENDAR_FILE = "cal.csv"
+_CACHE_MAX_SIZE_MB = 256
+_START_DATE = (2023, 1, 1)
+_END_DATE = (2023, 1, 31)
+_EXPAND_CHUNKS = ["month", "week", "none"]
+_EXPAND_CHUNK = "month"
+_FETCH_CONCURRENCY = 8
+_DEDUP_THRESHOLD = 0.9
+_SHARDS_PER_WORKER = 4
+_CALENDAR_FIELDS = CSV_FIELDS
 
 _logger = logging.getLogger(
     __name__ if __name__ != "__main__" else "parse_calendar"
 )  # pylint: disable=C0103
 
-_contact_list = ContactList()
-_calendar_event_list = []
-
 
 def load_config_file(base_config: dict) -> configparser.ConfigParser:
     """Load the configuration file and initialize any variables
@@ -65,10 +111,96 @@ def load_config_file(base_config: dict) -> configparser.ConfigParser:
         base_config["contacts_file"] = contacts_config.get(
             "contacts_file", base_config["contacts_file"]
         )
+        base_config["contacts_store"] = contacts_config.get(
+            "contacts_store", base_config["contacts_store"]
+        )
+
+    if "calendar" in parser:
+        calendar_config = parser["calendar"]
+        if "start_date" in calendar_config:
+            base_config["start_date"] = parse_date(calendar_config["start_date"])
+        if "end_date" in calendar_config:
+            base_config["end_date"] = parse_date(calendar_config["end_date"])
+        base_config["expand_chunk"] = calendar_config.get(
+            "expand_chunk", base_config["expand_chunk"]
+        )
+        base_config["output_file"] = calendar_config.get(
+            "output_file", base_config["output_file"]
+        )
+
+    if "addresses" in parser:
+        addresses_config = parser["addresses"]
+        if "ignored_domains" in addresses_config:
+            base_config["ignored_domains"] = _config_list(
+                addresses_config["ignored_domains"]
+            )
+        if "ignored_patterns" in addresses_config:
+            base_config["ignored_patterns"] = _config_list(
+                addresses_config["ignored_patterns"]
+            )
+
+    if "cache" in parser:
+        cache_config = parser["cache"]
+        base_config["cache_dir"] = cache_config.get(
+            "cache_dir", base_config["cache_dir"]
+        )
+        base_config["cache_max_size_mb"] = int(
+            cache_config.get("cache_max_size_mb", str(base_config["cache_max_size_mb"]))
+        )
 
     return parser
 
 
+def _config_list(value: str) -> List[str]:
+    """
+    _config_list split a config value with one item per line
+
+    Args:
+        value (str): the value
+
+    Returns:
+        List[str]: the items, without blank lines
+    """
+    return [item.strip() for item in value.splitlines() if item.strip()]
+
+
+def parse_date(date_string: str) -> tuple:
+    """
+    parse_date parse a YYYY-MM-DD date from the config file or command line
+
+    Args:
+        date_string (str): the date
+
+    Raises:
+        ValueError: if the date isn't in YYYY-MM-DD format
+
+    Returns:
+        tuple: the date as (year, month, day)
+    """
+    date = datetime.date.fromisoformat(date_string.strip())
+    return (date.year, date.month, date.day)
+
+
+def parse_time(time_string: str) -> datetime.datetime:
+    """
+    parse_time parse an ISO 8601 time from the command line, a time without a
+    timezone is taken to be in UTC
+
+    Args:
+        time_string (str): the time
+
+    Raises:
+        ValueError: if the time isn't in ISO 8601 format
+
+    Returns:
+        datetime.datetime: the time
+    """
+    time_value = datetime.datetime.fromisoformat(time_string.strip())
+    if time_value.tzinfo is None:
+        time_value = time_value.replace(tzinfo=datetime.timezone.utc)
+    return time_value
+
+
 def update_config_file(parser: configparser.ConfigParser) -> None:
     """Save the configuration file. A later version of this should take in any
     non global variables as a parameter
@@ -110,66 +242,1399 @@ def initialize_logging(
         _logger.addHandler(file_handler)
 
 
-def initialize_contact_list(contact_file_path: str) -> None:
+def print_contacts(contact_list: ContactList, emails: Iterable[str]) -> None:
     """
-    initialize_contact_list initialize the contact list with existing contacts
+    print_contacts print the contact for each e-mail address, or that there
+    isn't one
 
     Args:
-        contact_file_path (str): filepath to the contacts file
+        contact_list (ContactList): the contacts
+        emails (Iterable[str]): the addresses to look up
     """
-    if os.path.exists(contact_file_path):
-        _contact_list.load_from_file(contact_file_path)
-    else:
-        _logger.debug("contact file does not exist: %s", contact_file_path)
+    for email in emails:
+        contact = contact_list.find_by_email(email)
+        print(f"{email}: {contact if contact else 'no contact'}")
 
 
-def save_contact_list(contact_file_path: str) -> None:
+def _stage(metrics: PipelineMetrics | None, name: str) -> AbstractContextManager[None]:
     """
-    save_contact_list save the contacts to a file to reference for next runs
+    _stage time a block as a stage if metrics are being recorded
 
     Args:
-        contact_file_path (str): path to the destination file
+        metrics (PipelineMetrics | None): the metrics, or None
+        name (str): the stage
+
+    Returns:
+        AbstractContextManager[None]: the context to run the stage in
     """
-    if not os.path.exists(contact_file_path):
-        dir_name = os.path.dirname(contact_file_path)
-        os.makedirs(dir_name, exist_ok=True)
-    _logger.debug("saving contacts list: %s", contact_file_path)
-    _contact_list.save_to_file(contact_file_path)
+    return metrics.stage(name) if metrics else nullcontext()
 
 
-def save_calendar_list(calendar_item_list:List[CalendarEvent]) -> None:
-    cal_dict_list = []
-    for cal_event in calendar_item_list:
-        cal_dict_list.append(cal_event.dict_for_csv())
-    with open("cal.csv", "w", encoding="utf-8") as file:
-        csvwriter = csv.DictWriter(file, fieldnames=cal_dict_list[0].keys(), dialect="excel")
-        csvwriter.writeheader()
-        csvwriter.writerows(cal_dict_list)
+def _timed(
+    metrics: PipelineMetrics | None, name: str, iterable: Iterable[Any]
+) -> Iterable[Any]:
+    """
+    _timed time a generator stage if metrics are being recorded
+
+    Args:
+        metrics (PipelineMetrics | None): the metrics, or None
+        name (str): the stage
+        iterable (Iterable[Any]): the stage's output
 
+    Returns:
+        Iterable[Any]: the stage's output, unchanged
+    """
+    return metrics.timed(name, iterable) if metrics else iterable
 
-def main(calendar_file: TextIO) -> None:
-    """main application logic"""
-    start_date = (2023, 1, 1)
-    end_date = (2023, 1, 31)
 
-    calendar = Calendar.from_ical(calendar_file.read())
+def parse_calendar(calendar_file: TextIO, normalize: bool = True) -> "Calendar":
+    """
+    parse_calendar parse an ical file and normalize it to standard timezones
+
+    Args:
+        calendar_file (TextIO): the open calendar file, it is closed once read
+        normalize (bool, optional): convert X-WR-TIMEZONE calendars to standard
+        timezones. Defaults to True, False leaves it to the shards, see
+        sharded_calendar_events
+
+    Returns:
+        Calendar: the parsed calendar
+    """
+    from icalendar import Calendar  # type: ignore # pylint: disable=C0415
+    import x_wr_timezone  # type: ignore # pylint: disable=C0415
+
     _logger.info("parsing %s", calendar_file.name)
+    calendar = Calendar.from_ical(calendar_file.read())
     calendar_file.close()
-    new_calendar = x_wr_timezone.to_standard(calendar)
-    events = recurring_ical_events.of(new_calendar).between(start_date, end_date)
+    return x_wr_timezone.to_standard(calendar) if normalize else calendar
+
+
+def _expansion_chunks(
+    start_date: tuple, end_date: tuple, expand_chunk: str
+) -> Iterator[Tuple[datetime.datetime, datetime.datetime]]:
+    """
+    _expansion_chunks split a window into consecutive spans a month or a week
+    long, the first and last spans are cut to the window
+
+    Args:
+        start_date (tuple): the first day of the window (year, month, day)
+        end_date (tuple): the day the window ends (year, month, day), exclusive
+        expand_chunk (str): 'month', 'week' or 'none' for a single span
+
+    Yields:
+        Tuple[datetime.datetime, datetime.datetime]: the start and end of a span
+    """
+    chunk_start = datetime.datetime(*start_date)
+    window_end = datetime.datetime(*end_date)
+    while chunk_start < window_end:
+        if expand_chunk == "month":
+            chunk_end = datetime.datetime(
+                chunk_start.year + chunk_start.month // 12,
+                chunk_start.month % 12 + 1,
+                1,
+            )
+        elif expand_chunk == "week":
+            chunk_end = chunk_start + datetime.timedelta(days=7)
+        else:
+            chunk_end = window_end
+        chunk_end = min(chunk_end, window_end)
+        yield chunk_start, chunk_end
+        chunk_start = chunk_end
+
+
+def expand_events(
+    calendar: "Calendar",
+    start_date: tuple,
+    end_date: tuple,
+    expand_chunk: str = _EXPAND_CHUNK,
+) -> Iterator[Dict]:
+    """
+    expand_events yield every event occurrence between two dates, with recurring
+    events expanded into their individual occurrences. The window is expanded a
+    chunk at a time so a long window never has all its occurrences in memory, an
+    occurrence spanning two chunks is only yielded from the one it starts in
+
+    Args:
+        calendar (Calendar): the parsed calendar
+        start_date (tuple): the first day of the window (year, month, day)
+        end_date (tuple): the day the window ends (year, month, day), exclusive
+        expand_chunk (str, optional): expand a 'month' or a 'week' at a time, or
+        'none' for the whole window at once. Defaults to 'month'.
+
+    Yields:
+        Dict: an event in the format returned by recurring_ical_events
+    """
+    import recurring_ical_events  # type: ignore # pylint: disable=C0415
+
+    unfoldable_calendar = recurring_ical_events.of(calendar)
+    first_chunk = True
+    for chunk_start, chunk_end in _expansion_chunks(start_date, end_date, expand_chunk):
+        for event in unfoldable_calendar.between(chunk_start, chunk_end):
+            if not first_chunk:
+                event_start, boundary = recurring_ical_events.make_comparable(
+                    (event["dtstart"].dt, chunk_start)
+                )
+                if event_start < boundary:
+                    # already yielded from the previous chunk
+                    continue
+            yield event
+        first_chunk = False
+
+
+def confirmed_events(
+    events: Iterable[Dict], metrics: PipelineMetrics | None = None
+) -> Iterator[Dict]:
+    """
+    confirmed_events filter out events that are not CONFIRMED
+
+    Args:
+        events (Iterable[Dict]): events from expand_events
+        metrics (PipelineMetrics | None, optional): if set, count the events
+        seen and skipped
 
+    Yields:
+        Dict: the confirmed events
+    """
     for event in events:
-        if event["status"] != "CONFIRMED":
-            continue
+        if event.get("status") == "CONFIRMED":
+            yield event
+        elif metrics:
+            metrics.count("events_skipped_not_confirmed")
+        if metrics:
+            metrics.count("events_seen")
+
 
-        cal_event = CalendarEvent(event)
+def build_calendar_events(events: Iterable[Dict]) -> Iterator[CalendarEvent]:
+    """
+    build_calendar_events convert events to CalendarEvent objects, the parts
+    shared by the occurrences of a recurring event are only parsed once
+
+    Args:
+        events (Iterable[Dict]): events from expand_events
+
+    Yields:
+        CalendarEvent: the converted event
+    """
+    builder = CalendarEventBuilder()
+    log_events = _logger.isEnabledFor(logging.DEBUG)
+    for event in events:
+        cal_event = builder.build(event)
+        if log_events:
+            _logger.debug("added event: %s", cal_event.dict_for_csv())
+        yield cal_event
+
+
+def collect_contacts(
+    cal_events: Iterable[CalendarEvent],
+    contact_list: ContactList,
+    metrics: PipelineMetrics | None = None,
+    lock: AbstractContextManager | None = None,
+) -> Iterator[CalendarEvent]:
+    """
+    collect_contacts add the attendees and organizer of each event to a contact
+    list, passing the events through unchanged. The addresses are collected as
+    the events pass and added with a single ContactList.add_many once the
+    events run out; each address is only added once, adding the same address
+    again wouldn't change the list, and the people in a series are only looked
+    at once
+
+    Args:
+        cal_events (Iterable[CalendarEvent]): the events
+        contact_list (ContactList): the list to add people to
+        metrics (PipelineMetrics | None, optional): if set, count the contacts
+        added and the addresses merged into contacts already in the list
+        lock (AbstractContextManager | None, optional): held while the contacts
+        are added, for a contact list shared between threads. Defaults to None.
+
+    Yields:
+        CalendarEvent: the event
+    """
+    added: Dict[str, Tuple[Tuple[str, ...], str]] = {}
+    # an ordered set, the contacts are added in the order they were first seen
+    addresses: Dict[str, None] = {}
+    for cal_event in cal_events:
+        people = added.get(cal_event.uid)
+        if (
+            people
+            and people[0] is cal_event.attendees
+            and people[1] == cal_event.organizer
+        ):
+            yield cal_event
+            continue
         for attendee in cal_event.attendees:
-            _contact_list.add(Contact(email=attendee))
+            addresses[attendee] = None
         if cal_event.organizer:
-            _contact_list.add(Contact(email=cal_event.organizer))
-        _calendar_event_list.append(cal_event)
-        _logger.debug("added event: %s", cal_event.dict_for_csv())
-    save_calendar_list(_calendar_event_list)
+            addresses[cal_event.organizer] = None
+        added[cal_event.uid] = (cal_event.attendees, cal_event.organizer)
+        yield cal_event
+
+    with lock or nullcontext():
+        result = contact_list.add_many(Contact(email=address) for address in addresses)
+    for conflict in result.conflicts:
+        _logger.warning("contact conflicts with existing contacts: %s", conflict)
+    if metrics:
+        metrics.count("contacts_added", result.added)
+        metrics.count("contacts_merged", result.merged)
+
+
+def save_calendar_list(
+    calendar_item_list: Iterable[CalendarEvent],
+    filename: str = _CALENDAR_FILE,
+    export_format: str | None = None,
+) -> None:
+    """
+    save_calendar_list write events to a file a batch at a time as they
+    arrive, so the events never all need to be in memory
+
+    Args:
+        calendar_item_list (Iterable[CalendarEvent]): the events to save
+        filename (str, optional): the file to save to. Defaults to 'cal.csv'.
+        export_format (str | None, optional): one of event_exporters.EXPORTERS.
+        Defaults to None, which picks the format from the file's extension
+    """
+    exporter_for(filename, export_format).write(calendar_item_list, filename)
+
+
+def calendar_events(
+    calendar_file: TextIO,
+    start_date: tuple,
+    end_date: tuple,
+    expand_chunk: str = _EXPAND_CHUNK,
+    metrics: PipelineMetrics | None = None,
+    expand_workers: int = 0,
+    stream: bool = False,
+) -> Iterator[CalendarEvent]:
+    """
+    calendar_events parse a calendar and yield its confirmed events, nothing is
+    parsed until the first event is requested
+
+    Args:
+        calendar_file (TextIO): the open calendar file
+        start_date (tuple): the first day of events to include
+        end_date (tuple): the day the window ends, exclusive
+        expand_chunk (str, optional): how much of the window to expand at once
+        metrics (PipelineMetrics | None, optional): if set, record the stages
+        expand_workers (int, optional): with more than one, expand the event
+        series in that many processes, see sharded_calendar_events. Defaults
+        to 0.
+        stream (bool, optional): read the file a few event series at a time,
+        see streamed_calendar_events. Defaults to False.
+
+    Yields:
+        CalendarEvent: the confirmed events in the window
+    """
+    if stream:
+        yield from streamed_calendar_events(
+            calendar_file, start_date, end_date, expand_chunk, metrics, expand_workers
+        )
+        return
+    with _stage(metrics, "parse"):
+        calendar = parse_calendar(calendar_file, normalize=expand_workers <= 1)
+    yield from _expanded_calendar_events(
+        calendar, start_date, end_date, expand_chunk, metrics, expand_workers
+    )
+
+
+def _start_key(cal_event: CalendarEvent) -> datetime.datetime:
+    """
+    _start_key an event's start that can be compared with any other's, all-day
+    events start at midnight and floating times are taken as UTC
+
+    Args:
+        cal_event (CalendarEvent): the event
+
+    Returns:
+        datetime.datetime: the start as an aware datetime
+    """
+    start = cal_event.start
+    if not isinstance(start, datetime.datetime):
+        start = datetime.datetime(start.year, start.month, start.day)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=datetime.timezone.utc)
+    return start
+
+
+def shard_calendar(calendar: "Calendar", shards: int) -> List[Tuple[List[str], bytes]]:
+    """
+    shard_calendar split a calendar into smaller calendars that can be expanded
+    on their own. Every component of an event series, the master and its
+    modified occurrences, is kept in the same shard, each shard has a run of
+    series in the order they first appear, and the calendar's properties and
+    timezones. The shards get about the same number of components
+
+    Args:
+        calendar (Calendar): the parsed calendar
+        shards (int): the most shards to split it into
+
+    Returns:
+        List[Tuple[List[str], bytes]]: the UIDs of the series in each shard, in
+        order, and the shard as an ical file
+    """
+    from icalendar import Calendar  # type: ignore # pylint: disable=C0415
+
+    series: Dict[str, List[Any]] = {}
+    timezones = []
+    for component in calendar.subcomponents:
+        if component.name == "VEVENT":
+            series.setdefault(str(component.get("uid", "")), []).append(component)
+        elif component.name == "VTIMEZONE":
+            timezones.append(component)
+    component_count = sum(len(components) for components in series.values())
+    shard_size = max(1, -(-component_count // max(1, shards)))
+
+    def shard_data(shard_series: List[str]) -> bytes:
+        shard = Calendar()
+        shard.update(calendar)
+        shard.subcomponents.extend(timezones)
+        for uid in shard_series:
+            shard.subcomponents.extend(series[uid])
+        return shard.to_ical()
+
+    result = []
+    shard_series: List[str] = []
+    size = 0
+    for uid, components in series.items():
+        shard_series.append(uid)
+        size += len(components)
+        if size >= shard_size:
+            result.append((shard_series, shard_data(shard_series)))
+            shard_series = []
+            size = 0
+    if shard_series:
+        result.append((shard_series, shard_data(shard_series)))
+    return result
+
+
+class _ShardJob(NamedTuple):
+    """
+    the arguments for one _expand_shard worker
+    """
+
+    uids: List[str]
+    calendar_data: bytes
+    start_date: tuple
+    end_date: tuple
+    expand_chunk: str
+    profile: bool
+    address_rules: Tuple[Tuple[str, ...], Tuple[str, ...]]
+
+
+def _expand_shard(
+    job: _ShardJob,
+) -> Tuple[List[CalendarEvent], PipelineMetrics | None]:
+    """
+    _expand_shard worker for sharded_calendar_events, normalizes the timezones
+    of one shard and expands it
+
+    Args:
+        job (_ShardJob): the shard and how to expand it
+
+    Returns:
+        Tuple[List[CalendarEvent], PipelineMetrics | None]: the confirmed
+        events in start order, events starting together in the order of
+        job.uids, and the metrics if job.profile is set
+    """
+    from icalendar import Calendar  # type: ignore # pylint: disable=C0415
+    import x_wr_timezone  # type: ignore # pylint: disable=C0415
+
+    addresses.configure(*job.address_rules)
+    metrics = PipelineMetrics() if job.profile else None
+    with _stage(metrics, "parse_shard"):
+        calendar = x_wr_timezone.to_standard(Calendar.from_ical(job.calendar_data))
+    cal_events = list(
+        _expanded_calendar_events(
+            calendar, job.start_date, job.end_date, job.expand_chunk, metrics
+        )
+    )
+    with _stage(metrics, "sort_shard"):
+        rank = {uid: index for index, uid in enumerate(job.uids)}
+        # a stable sort, so a series' occurrences stay in expansion order
+        cal_events.sort(
+            key=lambda cal_event: (_start_key(cal_event), rank.get(cal_event.uid, 0))
+        )
+    if metrics:
+        metrics.record_peak_memory()
+    return cal_events, metrics
+
+
+def sharded_calendar_events(
+    calendar: "Calendar",
+    start_date: tuple,
+    end_date: tuple,
+    expand_chunk: str,
+    workers: int,
+    metrics: PipelineMetrics | None = None,
+) -> Iterator[CalendarEvent]:
+    """
+    sharded_calendar_events expand a calendar's event series in a pool of
+    processes, so a big calendar uses every cpu. The calendar is split by UID
+    with shard_calendar, each worker normalizes the timezones of its shards and
+    expands them, and the sorted shards are merged into start order. Events
+    starting at the same time are in the order their series first appear in
+    the calendar, so the output doesn't depend on the number of workers or on
+    scheduling. Unlike expand_events every event is in memory at once
+
+    Args:
+        calendar (Calendar): the parsed calendar, X-WR-TIMEZONE calendars can
+        be left for the workers to normalize
+        start_date (tuple): the first day of events to include
+        end_date (tuple): the day the window ends, exclusive
+        expand_chunk (str): how much of the window each worker expands at once
+        workers (int): the number of processes
+        metrics (PipelineMetrics | None, optional): if set, record the stages,
+        and the workers' stages
+
+    Yields:
+        CalendarEvent: the confirmed events in the window, in start order
+    """
+    with _stage(metrics, "shard"):
+        # a few shards per worker, so one slow shard doesn't leave the rest idle
+        shards = shard_calendar(calendar, workers * _SHARDS_PER_WORKER)
+    yield from _expand_shards(
+        shards, start_date, end_date, expand_chunk, workers, metrics
+    )
+
+
+def _expand_shards(
+    shards: List[Tuple[List[str], bytes]],
+    start_date: tuple,
+    end_date: tuple,
+    expand_chunk: str,
+    workers: int,
+    metrics: PipelineMetrics | None,
+) -> Iterator[CalendarEvent]:
+    """
+    _expand_shards expand shards in a pool of processes and merge their events
+    into start order
+
+    Args:
+        shards (List[Tuple[List[str], bytes]]): the shards, from shard_calendar
+        or IcsStream.shards
+        start_date (tuple): the first day of events to include
+        end_date (tuple): the day the window ends, exclusive
+        expand_chunk (str): how much of the window each worker expands at once
+        workers (int): the number of processes
+        metrics (PipelineMetrics | None): if set, record the stages
+
+    Yields:
+        CalendarEvent: the confirmed events in the window, in start order
+    """
+    from concurrent.futures import ProcessPoolExecutor  # pylint: disable=C0415
+    import heapq  # pylint: disable=C0415
+
+    jobs = [
+        _ShardJob(
+            uids,
+            data,
+            start_date,
+            end_date,
+            expand_chunk,
+            metrics is not None,
+            addresses.rules(),
+        )
+        for uids, data in shards
+    ]
+    _logger.info("expanding %d shards in %d processes", len(jobs), workers)
+    with _stage(metrics, "expand_shards"):
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_expand_shard, jobs))
+    if metrics:
+        metrics.count("shards", len(jobs))
+        for _, shard_metrics in results:
+            if shard_metrics:
+                metrics.merge(shard_metrics)
+    # heapq.merge is stable, events starting together come from the earlier
+    # shard first, and the shards hold the series in order
+    yield from heapq.merge(
+        *(shard_events for shard_events, _ in results), key=_start_key
+    )
+
+
+def streamed_calendar_events(
+    calendar_file: TextIO,
+    start_date: tuple,
+    end_date: tuple,
+    expand_chunk: str = _EXPAND_CHUNK,
+    metrics: PipelineMetrics | None = None,
+    expand_workers: int = 0,
+) -> Iterator[CalendarEvent]:
+    """
+    streamed_calendar_events yield the confirmed events of a calendar that is
+    too big to parse at once. The file is mapped and split on its VEVENT
+    blocks, see ics_stream, and the events are parsed, normalized and expanded
+    a run of whole series at a time. With expand_workers the runs are the
+    shards handed to the workers, and the file is never parsed in this process
+
+    Args:
+        calendar_file (TextIO): the open calendar file, it is closed once mapped
+        start_date (tuple): the first day of events to include
+        end_date (tuple): the day the window ends, exclusive
+        expand_chunk (str, optional): how much of the window to expand at once
+        metrics (PipelineMetrics | None, optional): if set, record the stages
+        expand_workers (int, optional): with more than one, expand the event
+        series in that many processes. Defaults to 0.
+
+    Yields:
+        CalendarEvent: the confirmed events in the window, a run of series at
+        a time, or in start order with expand_workers
+    """
+    import x_wr_timezone  # type: ignore # pylint: disable=C0415
+
+    _logger.info("streaming %s", calendar_file.name)
+    with _stage(metrics, "scan"):
+        stream = IcsStream(calendar_file)
+    try:
+        if expand_workers > 1:
+            with _stage(metrics, "shard"):
+                shards = stream.shards(expand_workers * _SHARDS_PER_WORKER)
+            yield from _timed(
+                metrics,
+                "merge_shards",
+                _expand_shards(
+                    shards, start_date, end_date, expand_chunk, expand_workers, metrics
+                ),
+            )
+            return
+        calendars = (
+            x_wr_timezone.to_standard(calendar) for calendar in stream.calendars()
+        )
+        for calendar in _timed(metrics, "parse", calendars):
+            yield from _expanded_calendar_events(
+                calendar, start_date, end_date, expand_chunk, metrics
+            )
+    finally:
+        stream.close()
+
+
+def _expanded_calendar_events(
+    calendar: "Calendar",
+    start_date: tuple,
+    end_date: tuple,
+    expand_chunk: str,
+    metrics: PipelineMetrics | None,
+    expand_workers: int = 0,
+) -> Iterable[CalendarEvent]:
+    """
+    _expanded_calendar_events chain the expand, filter and build stages
+
+    Args:
+        calendar (Calendar): the parsed calendar
+        start_date (tuple): the first day of events to include
+        end_date (tuple): the day the window ends, exclusive
+        expand_chunk (str): how much of the window to expand at once
+        metrics (PipelineMetrics | None): if set, record the stages
+        expand_workers (int, optional): with more than one, expand the event
+        series in that many processes. Defaults to 0.
+
+    Returns:
+        Iterable[CalendarEvent]: the confirmed events in the window
+    """
+    if expand_workers > 1:
+        return _timed(
+            metrics,
+            "merge_shards",
+            sharded_calendar_events(
+                calendar, start_date, end_date, expand_chunk, expand_workers, metrics
+            ),
+        )
+    events = _timed(
+        metrics, "expand", expand_events(calendar, start_date, end_date, expand_chunk)
+    )
+    confirmed = _timed(metrics, "filter", confirmed_events(events, metrics))
+    return _timed(metrics, "build_events", build_calendar_events(confirmed))
+
+
+def update_calendar_list(
+    calendar_item_list: Iterable[CalendarEvent],
+    replaced_uids: Set[str],
+    filename: str = _CALENDAR_FILE,
+) -> None:
+    """
+    update_calendar_list update a csv file written by save_calendar_list with
+    the current columns in place: rows for the replaced UIDs are dropped, the
+    other rows are kept and the new events are added at the end. The file is
+    rewritten through a temporary file so an interrupted update leaves it intact
+
+    Args:
+        calendar_item_list (Iterable[CalendarEvent]): the new events
+        replaced_uids (Set[str]): the series whose existing rows are dropped
+        filename (str, optional): the file to update. Defaults to 'cal.csv'.
+    """
+    temp_file = filename + ".tmp"
+    with open(temp_file, "w", encoding="utf-8") as file:
+        csvwriter = csv.DictWriter(file, fieldnames=_CALENDAR_FIELDS, dialect="excel")
+        csvwriter.writeheader()
+        if os.path.exists(filename):
+            with open(filename, "r", encoding="utf-8", newline="") as old_file:
+                for row in csv.DictReader(old_file, dialect="excel"):
+                    if row["uid"] not in replaced_uids:
+                        csvwriter.writerow(row)
+        for cal_event in calendar_item_list:
+            csvwriter.writerow(cal_event.dict_for_csv())
+    os.replace(temp_file, filename)
+
+
+def _has_current_fields(filename: str) -> bool:
+    """
+    _has_current_fields check that a csv file exists and was written with the
+    current columns, so it can be updated in place
+
+    Args:
+        filename (str): the csv file
+
+    Returns:
+        bool: True if the file can be updated
+    """
+    if not os.path.exists(filename):
+        return False
+    with open(filename, "r", encoding="utf-8", newline="") as file:
+        return next(csv.reader(file, dialect="excel"), []) == _CALENDAR_FIELDS
+
+
+class CalendarProcessor:
+    """
+    runs calendars through the pipeline into its own contact list, with no
+    state shared with other processors. A processor can be shared by threads,
+    the people each calendar adds are added to the contact list under a lock,
+    but metrics should only be set on a processor one thread uses at a time.
+    Everything that touches the contact list takes the lock, so this holds
+    for a StoredContactList from load_contacts too. A processor can also be
+    pickled to send it to a process pool, the contacts found there go into the
+    copy's contact_list and have to be sent back, as process_files does; a
+    copy of a stored list opens the database again and sees what was saved
+    """
+
+    def __init__(
+        self,
+        contact_list: ContactList | None = None,
+        start_date: tuple = _START_DATE,
+        end_date: tuple = _END_DATE,
+        expand_chunk: str = _EXPAND_CHUNK,
+        cache: CalendarCache | None = None,
+        export_format: str | None = None,
+        metrics: PipelineMetrics | None = None,
+        expand_workers: int = 0,
+        stream: bool = False,
+    ) -> None:
+        """
+        __init__ initialize the processor
+
+        Args:
+            contact_list (ContactList | None, optional): the list to add people
+            to. Defaults to None, which starts an empty one
+            start_date (tuple, optional): the first day of events to include
+            end_date (tuple, optional): the day the window ends, exclusive
+            expand_chunk (str, optional): how much of the window to expand at once
+            cache (CalendarCache | None, optional): if set, use the cached events
+            for an unchanged calendar instead of parsing it, and cache them if not
+            export_format (str | None, optional): the format to write, see
+            save_calendar_list. Defaults to None.
+            metrics (PipelineMetrics | None, optional): if set, record the stages
+            expand_workers (int, optional): with more than one, expand each
+            calendar's event series in that many processes, see
+            sharded_calendar_events. process_files already runs a process per
+            calendar and doesn't use it. Defaults to 0.
+            stream (bool, optional): read calendars a few event series at a
+            time instead of parsing them whole, see streamed_calendar_events.
+            Incremental processing still parses the whole calendar. Defaults
+            to False.
+        """
+        self.contact_list = contact_list if contact_list is not None else ContactList()
+        self.start_date = start_date
+        self.end_date = end_date
+        self.expand_chunk = expand_chunk
+        self.cache = cache
+        self.export_format = export_format
+        self.metrics = metrics
+        self.expand_workers = expand_workers
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def __str__(self) -> str:
+        """
+        __str__ return a string summary of the object
+
+        Returns:
+            str: a description of the object
+        """
+        with self._lock:
+            return (
+                f"calendar processor: {self.start_date} to {self.end_date}, "
+                f"{self.contact_list}"
+            )
+
+    def __getstate__(self) -> dict:
+        """
+        __getstate__ the state to pickle, without the lock which can't be
+
+        Returns:
+            dict: the processor's attributes
+        """
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """
+        __setstate__ restore a pickled processor with a new lock
+
+        Args:
+            state (dict): the attributes from __getstate__
+        """
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def load_contacts(
+        self, contact_file_path: str, contact_store_path: str | None = None
+    ) -> None:
+        """
+        load_contacts start the contact list with existing contacts, replacing
+        the list the processor had
+
+        Args:
+            contact_file_path (str): filepath to the contacts file
+            contact_store_path (str | None, optional): keep the contacts in this
+            database instead, the contacts file is imported into it if the
+            database is empty. Defaults to None.
+        """
+        if contact_store_path:
+            from contact_store import StoredContactList  # pylint: disable=C0415
+
+            dir_name = os.path.dirname(contact_store_path)
+            if dir_name:
+                os.makedirs(dir_name, exist_ok=True)
+            self.contact_list = StoredContactList(contact_store_path)
+            if len(self.contact_list) > 0:
+                return
+            _logger.debug("contact store is empty: %s", contact_store_path)
+        else:
+            self.contact_list = ContactList()
+        if os.path.exists(contact_file_path):
+            self.contact_list.load_from_file(contact_file_path)
+        else:
+            _logger.debug("contact file does not exist: %s", contact_file_path)
+
+    def save_contacts(self, contact_file_path: str, export: bool = True) -> None:
+        """
+        save_contacts save the contacts to a file to reference for next runs
+
+        Args:
+            contact_file_path (str): path to the destination file
+            export (bool, optional): when the contacts are kept in a database,
+            also write them to the contacts file. Defaults to True.
+        """
+        from contact_store import StoredContactList  # pylint: disable=C0415
+
+        with self._lock:
+            if isinstance(self.contact_list, StoredContactList):
+                _logger.debug("saving contacts store: %s", self.contact_list.filename)
+                self.contact_list.save()
+                if not export:
+                    return
+            if not os.path.exists(contact_file_path):
+                dir_name = os.path.dirname(contact_file_path)
+                os.makedirs(dir_name, exist_ok=True)
+            _logger.debug("saving contacts list: %s", contact_file_path)
+            self.contact_list.save_to_file(contact_file_path)
+
+    def deduplicate_contacts(
+        self, threshold: float = _DEDUP_THRESHOLD
+    ) -> "contact_dedup.DedupResult":
+        """
+        deduplicate_contacts merge the contacts that are probably the same
+        person, see contact_dedup.deduplicate
+
+        Args:
+            threshold (float, optional): the lowest score that is merged.
+            Defaults to 0.9.
+
+        Returns:
+            contact_dedup.DedupResult: what was merged and the pairs to review
+        """
+        import contact_dedup  # pylint: disable=C0415
+
+        with self._lock:
+            result = contact_dedup.deduplicate(self.contact_list, threshold)
+        _logger.info(
+            "merged %d duplicate contacts, %d pairs to review out of %d scored",
+            result.merged,
+            len(result.review),
+            result.pairs_scored,
+        )
+        for match in result.review:
+            _logger.debug(
+                "possible duplicate (%.2f): %s and %s",
+                match.score,
+                match.first,
+                match.second,
+            )
+        return result
+
+    def _calendar_events(self, calendar_file: TextIO) -> Iterable[CalendarEvent]:
+        """
+        _calendar_events the confirmed events of a calendar, from the cache if
+        it has them
+
+        Args:
+            calendar_file (TextIO): the open calendar file
+
+        Returns:
+            Iterable[CalendarEvent]: the confirmed events in the window
+        """
+        metrics = self.metrics
+        events = calendar_events(
+            calendar_file,
+            self.start_date,
+            self.end_date,
+            self.expand_chunk,
+            metrics,
+            self.expand_workers,
+            self.stream,
+        )
+        if not self.cache:
+            return events
+        # events expanded in series are in a different order to the start
+        # order of expand_workers, so they're cached apart
+        if self.expand_workers > 1:
+            order: tuple = ("start",)
+        else:
+            order = ("series", self.expand_chunk, self.stream)
+        with _stage(metrics, "cache_lookup"):
+            key = self.cache.key_for_file(
+                calendar_file, self.start_date, self.end_date, order
+            )
+            cached_events = self.cache.load(key)
+        if cached_events is None:
+            return _timed(metrics, "cache_write", self.cache.store(key, events))
+        _logger.info("using cached events for %s", calendar_file.name)
+        calendar_file.close()
+        return _timed(metrics, "cache_read", cached_events)
+
+    def expand_calendar(self, calendar: "Calendar") -> Iterator[CalendarEvent]:
+        """
+        expand_calendar stream the confirmed events of a calendar that's
+        already parsed and normalized, such as one from IcsStream.calendars,
+        the people in them are added to the contact list once the events run out
+
+        Args:
+            calendar (Calendar): the calendar
+
+        Yields:
+            CalendarEvent: the confirmed events in the window
+        """
+        yield from self._collect(
+            _expanded_calendar_events(
+                calendar,
+                self.start_date,
+                self.end_date,
+                self.expand_chunk,
+                self.metrics,
+            )
+        )
+
+    def _collect(self, cal_events: Iterable[CalendarEvent]) -> Iterable[CalendarEvent]:
+        """
+        _collect run the contacts stage at the end of the pipeline
+
+        Args:
+            cal_events (Iterable[CalendarEvent]): the events
+
+        Returns:
+            Iterable[CalendarEvent]: the events, unchanged
+        """
+        return _timed(
+            self.metrics,
+            "collect_contacts",
+            collect_contacts(cal_events, self.contact_list, self.metrics, self._lock),
+        )
+
+    def events(self, calendar_file: TextIO) -> Iterator[CalendarEvent]:
+        """
+        events stream the confirmed events of a calendar, the people in them
+        are added to the contact list once the events run out. Nothing is
+        parsed until the first event is requested
+
+        Args:
+            calendar_file (TextIO): the open calendar file
+
+        Yields:
+            CalendarEvent: the confirmed events in the window
+        """
+        yield from self._collect(self._calendar_events(calendar_file))
+
+    def process(
+        self,
+        calendar_file: TextIO,
+        output_file: str | None = None,
+        on_event: Callable[[CalendarEvent], None] | None = None,
+    ) -> int:
+        """
+        process run one calendar through the pipeline, writing its events to a
+        file and/or passing each to a callback as it's built, and adding the
+        people in them to the contact list
+
+        Args:
+            calendar_file (TextIO): the open calendar file
+            output_file (str | None, optional): the file to write. Defaults to
+            None, which doesn't write one
+            on_event (Callable[[CalendarEvent], None] | None, optional): called
+            with each event. Defaults to None.
+
+        Returns:
+            int: the number of events
+        """
+        count = 0
+
+        def counted(cal_events: Iterable[CalendarEvent]) -> Iterator[CalendarEvent]:
+            nonlocal count
+            for cal_event in cal_events:
+                count += 1
+                if on_event:
+                    on_event(cal_event)
+                yield cal_event
+
+        collected = counted(self.events(calendar_file))
+        with _stage(self.metrics, "write_output"):
+            if output_file:
+                save_calendar_list(collected, output_file, self.export_format)
+            else:
+                for _ in collected:
+                    pass
+        return count
+
+    def process_incremental(
+        self, calendar_file: TextIO, output_file: str = _CALENDAR_FILE
+    ) -> None:
+        """
+        process_incremental like process, but only the event series that are
+        new or modified since the last run are expanded, and the csv file is
+        updated in place. What was processed is kept in a state file next to
+        the csv file
+
+        Args:
+            calendar_file (TextIO): the open calendar file
+            output_file (str, optional): the csv file to update. Defaults to
+            'cal.csv'.
+        """
+        metrics = self.metrics
+        state = IncrementalState(state_file_for(output_file))
+        rebuild = not _has_current_fields(output_file)
+        if rebuild:
+            state.reset()
+        with _stage(metrics, "parse"):
+            calendar = parse_calendar(calendar_file)
+        with _stage(metrics, "find_changes"):
+            stamps, max_stamp = event_stamps(calendar)
+            changed, removed = state.changes(stamps, self.start_date, self.end_date)
+            changed_calendar = filter_calendar(calendar, changed)
+        _logger.info(
+            "%s: %d series new or modified, %d removed since %s",
+            calendar_file.name,
+            len(changed),
+            len(removed),
+            state.max_stamp or "the first run",
+        )
+        if metrics:
+            metrics.count("series_changed", len(changed))
+            metrics.count("series_removed", len(removed))
+        if rebuild or changed or removed:
+            collected = self._collect(
+                _expanded_calendar_events(
+                    changed_calendar,
+                    self.start_date,
+                    self.end_date,
+                    self.expand_chunk,
+                    metrics,
+                    self.expand_workers,
+                )
+            )
+            with _stage(metrics, "write_output"):
+                if rebuild:
+                    save_calendar_list(collected, output_file)
+                else:
+                    update_calendar_list(collected, changed | removed, output_file)
+        state.update(stamps, max_stamp, self.start_date, self.end_date)
+        state.save()
+
+    def _job(
+        self,
+        calendar_path: str,
+        output_file: str,
+        incremental: bool,
+        export_format: str,
+    ) -> "_CalendarJob":
+        """
+        _job describe one calendar for a _process_calendar_path worker
+
+        Args:
+            calendar_path (str): the calendar file or url
+            output_file (str): the file for the worker to write
+            incremental (bool): update output_file with only the changes
+            export_format (str): the format to write
+
+        Returns:
+            _CalendarJob: the worker's arguments
+        """
+        return _CalendarJob(
+            calendar_path,
+            output_file,
+            self.start_date,
+            self.end_date,
+            self.cache.cache_dir if self.cache else None,
+            self.cache.max_size if self.cache else 0,
+            incremental,
+            self.expand_chunk,
+            self.metrics is not None,
+            addresses.rules(),
+            export_format,
+            self.stream,
+        )
+
+    def _merge_results(
+        self, results: Iterable[Tuple[ContactList, PipelineMetrics | None]]
+    ) -> None:
+        """
+        _merge_results merge the contacts, and metrics, from the workers
+
+        Args:
+            results (Iterable[Tuple[ContactList, PipelineMetrics | None]]): the
+            results of _process_calendar_path, in order
+        """
+        for worker_contacts, worker_metrics in results:
+            if self.metrics and worker_metrics:
+                self.metrics.merge(worker_metrics)
+            with _stage(self.metrics, "merge_contacts"), self._lock:
+                self.contact_list.merge(worker_contacts)
+
+    def process_files(
+        self,
+        calendar_paths: List[str],
+        output_dir: str | None = None,
+        workers: int | None = None,
+        incremental: bool = False,
+        fetch_concurrency: int = _FETCH_CONCURRENCY,
+        output_file: str = _CALENDAR_FILE,
+    ) -> None:
+        """
+        process_files process many calendars in a pool of processes. Each
+        worker collects its own contacts, these are merged into the contact
+        list in the order of calendar_paths so the result doesn't depend on
+        scheduling. Urls are downloaded concurrently and each calendar is
+        handed to a worker as soon as it arrives, with only a few more
+        calendars queued than there are workers
+
+        Args:
+            calendar_paths (List[str]): the calendar files and urls
+            output_dir (str | None, optional): write a file per calendar to this
+            directory. Defaults to None, which writes one combined output_file
+            workers (int | None, optional): the number of processes. Defaults to
+            None, which uses one per cpu
+            incremental (bool, optional): update each csv in output_dir with only
+            the changes since the last run, see process_incremental
+            fetch_concurrency (int, optional): the most urls downloaded at once.
+            Defaults to 8.
+            output_file (str, optional): the combined file when there's no
+            output_dir. Defaults to 'cal.csv'.
+
+        Raises:
+            ValueError: if incremental is set without an output_dir, or with a
+            format other than csv
+            ImportError: if the format needs a package that isn't installed
+            OSError: if a url can't be downloaded
+        """
+        if incremental and not output_dir:
+            raise ValueError(
+                "incremental processing of many calendars needs an output_dir"
+            )
+        from concurrent.futures import (  # pylint: disable=C0415
+            FIRST_COMPLETED,
+            Future,
+            ProcessPoolExecutor,
+            wait,
+        )
+
+        exporter = exporter_for(output_file, self.export_format)
+        if incremental and exporter.name != "csv":
+            raise ValueError("incremental processing can only update csv files")
+        temp_dir = None
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+            output_files = output_file_names(
+                calendar_paths, output_dir, exporter.extension
+            )
+        else:
+            temp_dir = tempfile.mkdtemp(prefix="parse_calendar")
+            output_files = output_file_names(
+                calendar_paths, temp_dir, exporter.extension
+            )
+        jobs = [
+            self._job(calendar_path, calendar_output, incremental, exporter.name)
+            for calendar_path, calendar_output in zip(calendar_paths, output_files)
+        ]
+        fetched = fetch_calendars(calendar_paths, fetch_concurrency)
+        try:
+            if workers == 1 or len(jobs) == 1:
+                results = {}
+                for index, data in fetched:
+                    results[index] = _process_calendar_path(
+                        jobs[index]._replace(calendar_data=data)
+                    )
+                self._merge_results(results[index] for index in range(len(jobs)))
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    futures: Dict[int, Future] = {}
+                    # stop reading downloads while the workers are this far behind
+                    max_pending = 2 * (workers or os.cpu_count() or 1)
+                    for index, data in fetched:
+                        pending = [
+                            future for future in futures.values() if not future.done()
+                        ]
+                        if len(pending) >= max_pending:
+                            wait(pending, return_when=FIRST_COMPLETED)
+                        futures[index] = executor.submit(
+                            _process_calendar_path,
+                            jobs[index]._replace(calendar_data=data),
+                        )
+                    self._merge_results(
+                        futures[index].result() for index in range(len(jobs))
+                    )
+            if temp_dir:
+                with _stage(self.metrics, "combine_output"):
+                    exporter.combine(output_files, output_file)
+        finally:
+            fetched.close()
+            if temp_dir:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def process_calendar_incremental(
+    calendar_file: TextIO,
+    contact_list: ContactList,
+    output_file: str = _CALENDAR_FILE,
+    start_date: tuple = _START_DATE,
+    end_date: tuple = _END_DATE,
+    expand_chunk: str = _EXPAND_CHUNK,
+    metrics: PipelineMetrics | None = None,
+) -> None:
+    """
+    process_calendar_incremental run one calendar through
+    CalendarProcessor.process_incremental
+
+    Args:
+        calendar_file (TextIO): the open calendar file
+        contact_list (ContactList): the list to add people to
+        output_file (str, optional): the csv file to update. Defaults to 'cal.csv'.
+        start_date (tuple, optional): the first day of events to include
+        end_date (tuple, optional): the day the window ends, exclusive
+        expand_chunk (str, optional): how much of the window to expand at once
+        metrics (PipelineMetrics | None, optional): if set, record the stages
+    """
+    CalendarProcessor(
+        contact_list, start_date, end_date, expand_chunk, metrics=metrics
+    ).process_incremental(calendar_file, output_file)
+
+
+def process_calendar(
+    calendar_file: TextIO,
+    contact_list: ContactList,
+    output_file: str = _CALENDAR_FILE,
+    start_date: tuple = _START_DATE,
+    end_date: tuple = _END_DATE,
+    cache: CalendarCache | None = None,
+    expand_chunk: str = _EXPAND_CHUNK,
+    metrics: PipelineMetrics | None = None,
+    export_format: str | None = None,
+) -> None:
+    """
+    process_calendar run one calendar through CalendarProcessor.process,
+    writing its events to a file and adding the people in them to a contact
+    list
+
+    Args:
+        calendar_file (TextIO): the open calendar file
+        contact_list (ContactList): the list to add people to
+        output_file (str, optional): the file to write. Defaults to 'cal.csv'.
+        start_date (tuple, optional): the first day of events to include
+        end_date (tuple, optional): the day the window ends, exclusive
+        cache (CalendarCache | None, optional): if set, use the cached events
+        for an unchanged calendar instead of parsing it, and cache them if not
+        expand_chunk (str, optional): how much of the window to expand at once
+        metrics (PipelineMetrics | None, optional): if set, record the stages
+        export_format (str | None, optional): the format to write, see
+        save_calendar_list. Defaults to None.
+    """
+    CalendarProcessor(
+        contact_list, start_date, end_date, expand_chunk, cache, export_format, metrics
+    ).process(calendar_file, output_file)
+
+
+class _CalendarJob(NamedTuple):
+    """
+    the arguments for one _process_calendar_path worker
+    """
+
+    calendar_path: str
+    output_file: str
+    start_date: tuple
+    end_date: tuple
+    cache_dir: str | None
+    cache_size: int
+    incremental: bool
+    expand_chunk: str
+    profile: bool
+    address_rules: Tuple[Tuple[str, ...], Tuple[str, ...]]
+    export_format: str
+    stream: bool
+    # the downloaded calendar when calendar_path is a url
+    calendar_data: bytes | None = None
+
+
+def _process_calendar_path(
+    job: _CalendarJob,
+) -> Tuple[ContactList, PipelineMetrics | None]:
+    """
+    _process_calendar_path worker for CalendarProcessor.process_files, processes
+    one calendar file into its own contact list
+
+    Args:
+        job (_CalendarJob): the calendar to process and how
+
+    Returns:
+        Tuple[ContactList, PipelineMetrics | None]: the people found in the
+        calendar, and the metrics if job.profile is set
+    """
+    addresses.configure(*job.address_rules)
+    processor = CalendarProcessor(
+        ContactList(),
+        job.start_date,
+        job.end_date,
+        job.expand_chunk,
+        CalendarCache(job.cache_dir, job.cache_size) if job.cache_dir else None,
+        job.export_format,
+        PipelineMetrics() if job.profile else None,
+        stream=job.stream,
+    )
+    with open_calendar(job.calendar_path, job.calendar_data) as calendar_file:
+        if job.incremental:
+            processor.process_incremental(calendar_file, job.output_file)
+        else:
+            processor.process(calendar_file, job.output_file)
+    metrics = processor.metrics
+    if metrics:
+        metrics.record_peak_memory()
+    return processor.contact_list, metrics
+
+
+def find_calendar_files(paths: List[str]) -> List[str]:
+    """
+    find_calendar_files expand directories and glob patterns to calendar files
+
+    Args:
+        paths (List[str]): files, directories (all .ics files in them are used),
+        glob patterns or http(s) urls, which are kept as they are
+
+    Returns:
+        List[str]: the calendar files, sorted within each directory or pattern
+        and without duplicates
+    """
+    calendar_paths: Dict[str, None] = {}
+    for path in paths:
+        if is_url(path):
+            matches = [path]
+        elif os.path.isdir(path):
+            matches = sorted(glob.glob(os.path.join(path, "*.ics")))
+        elif glob.has_magic(path):
+            matches = sorted(glob.glob(path))
+        else:
+            matches = [path]
+        for match in matches:
+            calendar_paths.setdefault(match, None)
+    return list(calendar_paths)
+
+
+def output_file_names(
+    calendar_paths: List[str], output_dir: str, extension: str = ".csv"
+) -> List[str]:
+    """
+    output_file_names get a distinct file name for each calendar, named after
+    the calendar file
+
+    Args:
+        calendar_paths (List[str]): the calendar files
+        output_dir (str): the directory for the files
+        extension (str, optional): the extension for the files. Defaults to '.csv'.
+
+    Returns:
+        List[str]: a path for each calendar, in the same order
+    """
+    used: Dict[str, int] = {}
+    output_files = []
+    for calendar_path in calendar_paths:
+        stem = source_stem(calendar_path)
+        count = used.get(stem, 0)
+        used[stem] = count + 1
+        name = f"{stem}_{count}{extension}" if count else f"{stem}{extension}"
+        output_files.append(os.path.join(output_dir, name))
+    return output_files
+
+
+def process_calendar_files(
+    calendar_paths: List[str],
+    contact_list: ContactList,
+    output_dir: str | None = None,
+    workers: int | None = None,
+    start_date: tuple = _START_DATE,
+    end_date: tuple = _END_DATE,
+    cache: CalendarCache | None = None,
+    incremental: bool = False,
+    expand_chunk: str = _EXPAND_CHUNK,
+    metrics: PipelineMetrics | None = None,
+    fetch_concurrency: int = _FETCH_CONCURRENCY,
+    output_file: str = _CALENDAR_FILE,
+    export_format: str | None = None,
+) -> None:
+    """
+    process_calendar_files process many calendars through
+    CalendarProcessor.process_files
+
+    Args:
+        calendar_paths (List[str]): the calendar files and urls
+        contact_list (ContactList): the list to merge the people found into
+        output_dir (str | None, optional): write a file per calendar to this
+        directory. Defaults to None, which writes one combined output_file
+        workers (int | None, optional): the number of processes. Defaults to
+        None, which uses one per cpu
+        start_date (tuple, optional): the first day of events to include
+        end_date (tuple, optional): the day the window ends, exclusive
+        cache (CalendarCache | None, optional): the cache for the workers to use
+        incremental (bool, optional): update each csv in output_dir with only
+        the changes since the last run
+        expand_chunk (str, optional): how much of the window to expand at once
+        metrics (PipelineMetrics | None, optional): if set, record the stages,
+        including the ones run by the workers
+        fetch_concurrency (int, optional): the most urls downloaded at once.
+        Defaults to 8.
+        output_file (str, optional): the combined file when there's no
+        output_dir. Defaults to 'cal.csv'.
+        export_format (str | None, optional): the format to write. Defaults to
+        None, which picks the format from output_file's extension
+
+    Raises:
+        ValueError: if incremental is set without an output_dir, or with a
+        format other than csv
+        ImportError: if the format needs a package that isn't installed
+        OSError: if a url can't be downloaded
+    """
+    CalendarProcessor(
+        contact_list, start_date, end_date, expand_chunk, cache, export_format, metrics
+    ).process_files(
+        calendar_paths,
+        output_dir,
+        workers,
+        incremental,
+        fetch_concurrency,
+        output_file,
+    )
 
 
 # when run as a script, do initialization
@@ -179,6 +1644,15 @@ if __name__ == "__main__":
         "console_log_level": _CONSOLE_LEVEL,
         "logfile_log_level": _FILE_LEVEL,
         "contacts_file": _CONTACTS_FILE,
+        "contacts_store": None,
+        "ignored_domains": None,
+        "ignored_patterns": None,
+        "cache_dir": None,
+        "cache_max_size_mb": _CACHE_MAX_SIZE_MB,
+        "start_date": _START_DATE,
+        "end_date": _END_DATE,
+        "expand_chunk": _EXPAND_CHUNK,
+        "output_file": _CALENDAR_FILE,
     }
     config_parser = load_config_file(config)
 
@@ -188,17 +1662,360 @@ if __name__ == "__main__":
     arg_parser.add_argument(
         "--verbose_log", "-V", action="store_true", dest="verbose_log"
     )
-    arg_parser.add_argument("calendar_file", type=argparse.FileType("rb"))
+    arg_parser.add_argument(
+        "calendar_files",
+        nargs="*",
+        metavar="calendar_file",
+        help="an .ics file, a directory of .ics files, a glob pattern or an "
+        "http(s) url such as a CalDAV calendar. Leave out to only run the "
+        "contact commands",
+    )
+    arg_parser.add_argument(
+        "--output",
+        dest="output_file",
+        help="write the events to this file instead of cal.csv, the format is "
+        "taken from the extension: .csv, .jsonl or .parquet",
+    )
+    arg_parser.add_argument(
+        "--format",
+        choices=list(EXPORTERS),
+        dest="export_format",
+        help="the format to write the events in, instead of from the extension",
+    )
+    arg_parser.add_argument(
+        "--output-dir",
+        "-o",
+        dest="output_dir",
+        help="write a csv per calendar to this directory instead of cal.csv",
+    )
+    arg_parser.add_argument(
+        "--workers",
+        "-j",
+        type=int,
+        dest="workers",
+        help="number of processes for multiple calendars, defaults to one per cpu",
+    )
+    arg_parser.add_argument(
+        "--expand-workers",
+        type=int,
+        default=0,
+        dest="expand_workers",
+        help="split a single calendar by event series and expand it in this "
+        "many processes, the events are written in start order",
+    )
+    arg_parser.add_argument(
+        "--stream",
+        action="store_true",
+        dest="stream",
+        help="read very large calendars a few events at a time instead of "
+        "parsing the whole file, to bound memory",
+    )
+    arg_parser.add_argument(
+        "--watch",
+        action="store_true",
+        dest="watch",
+        help="keep running, and update the outputs and contacts whenever the "
+        "calendar files change, new files in a directory are picked up",
+    )
+    arg_parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=0.1,
+        dest="poll_interval",
+        help="with --watch, seconds between checks of the calendar files",
+    )
+    arg_parser.add_argument(
+        "--debounce",
+        type=float,
+        default=0.2,
+        dest="debounce",
+        help="with --watch, seconds without changes before the outputs are written",
+    )
+    arg_parser.add_argument(
+        "--fetch-concurrency",
+        type=int,
+        default=_FETCH_CONCURRENCY,
+        dest="fetch_concurrency",
+        help="the most calendar urls to download at once",
+    )
+    arg_parser.add_argument(
+        "--contacts-store",
+        dest="contacts_store",
+        help="keep contacts in this SQLite database instead of the contacts csv",
+    )
+    arg_parser.add_argument(
+        "--export-contacts",
+        action="store_true",
+        dest="export_contacts",
+        help="with a contacts store, also write the contacts csv",
+    )
+    arg_parser.add_argument(
+        "--find-contact",
+        action="append",
+        default=[],
+        dest="find_contacts",
+        metavar="ADDRESS",
+        help="print the contact with this e-mail address, can be repeated",
+    )
+    arg_parser.add_argument(
+        "--dedup",
+        action="store_true",
+        dest="dedup",
+        help="merge contacts that are probably the same person, such as "
+        "jane.doe@corp.com and jdoe@corp.com",
+    )
+    arg_parser.add_argument(
+        "--dedup-threshold",
+        type=float,
+        default=_DEDUP_THRESHOLD,
+        dest="dedup_threshold",
+        help="with --dedup, the lowest match score from 0 to 1 that is merged",
+    )
+    arg_parser.add_argument(
+        "--query",
+        choices=QUERIES,
+        dest="query",
+        help="instead of writing the events, index them and print as JSON the "
+        "events in a window (overlaps), who is busy in it (busy), a person's "
+        "free and busy times (free) or a person's overlapping events (conflicts)",
+    )
+    arg_parser.add_argument(
+        "--from",
+        type=parse_time,
+        dest="query_start",
+        help="with --query, the start of the window, defaults to --start",
+    )
+    arg_parser.add_argument(
+        "--to",
+        type=parse_time,
+        dest="query_end",
+        help="with --query, the end of the window, defaults to --end",
+    )
+    arg_parser.add_argument(
+        "--person",
+        dest="query_person",
+        metavar="ADDRESS",
+        help="with --query, the person, needed for free and conflicts",
+    )
+    arg_parser.add_argument(
+        "--cache-dir",
+        dest="cache_dir",
+        help="cache expanded events here so unchanged calendars aren't re-parsed",
+    )
+    arg_parser.add_argument(
+        "--incremental",
+        "-i",
+        action="store_true",
+        dest="incremental",
+        help="only process events changed since the last run and update the csv",
+    )
+    arg_parser.add_argument(
+        "--start",
+        type=parse_date,
+        dest="start_date",
+        help="the first day of events to include, YYYY-MM-DD",
+    )
+    arg_parser.add_argument(
+        "--end",
+        type=parse_date,
+        dest="end_date",
+        help="include events before this day, YYYY-MM-DD",
+    )
+    arg_parser.add_argument(
+        "--chunk",
+        choices=_EXPAND_CHUNKS,
+        dest="expand_chunk",
+        help="expand recurring events a month or a week at a time, or all at once",
+    )
+    arg_parser.add_argument(
+        "--profile",
+        action="store_true",
+        dest="profile",
+        help="log the time spent in each stage, counters and peak memory",
+    )
+    arg_parser.add_argument(
+        "--metrics-file",
+        dest="metrics_file",
+        help="with --profile, also write the metrics to this JSON file",
+    )
+    arg_parser.add_argument(
+        "--cprofile",
+        dest="cprofile_file",
+        help="with --profile, also save cProfile stats to this file",
+    )
     ns = arg_parser.parse_args()
     if ns.verbose:
         config["console_log_level"] = logging.DEBUG
     if ns.verbose_log:
         config["logfile_log_level"] = logging.DEBUG
+    if ns.contacts_store:
+        config["contacts_store"] = ns.contacts_store
+    if not ns.calendar_files:
+        # the contact commands on their own, nothing from the iCal side is
+        # imported
+        if not ns.find_contacts and not ns.export_contacts and not ns.dedup:
+            arg_parser.error(
+                "give a calendar file, or --find-contact, --export-contacts or "
+                "--dedup"
+            )
+        initialize_logging(
+            config["logfile_name"],
+            config["console_log_level"],
+            config["logfile_log_level"],
+        )
+        contacts_processor = CalendarProcessor()
+        contacts_processor.load_contacts(
+            config["contacts_file"], config["contacts_store"]
+        )
+        if ns.dedup:
+            contacts_processor.deduplicate_contacts(ns.dedup_threshold)
+        print_contacts(contacts_processor.contact_list, ns.find_contacts)
+        if ns.dedup or ns.export_contacts:
+            contacts_processor.save_contacts(
+                config["contacts_file"],
+                export=not config["contacts_store"] or ns.export_contacts,
+            )
+        arg_parser.exit()
+    calendar_paths = find_calendar_files(ns.calendar_files)
+    if ns.watch:
+        # a watched directory can start empty
+        if any(is_url(path) for path in ns.calendar_files):
+            arg_parser.error("--watch needs calendar files or directories, not urls")
+        if ns.incremental:
+            arg_parser.error("--watch already only processes the changes")
+    elif not calendar_paths:
+        arg_parser.error("no calendar files found")
+    if ns.query and (ns.watch or ns.incremental):
+        arg_parser.error("--query can't be used with --watch or --incremental")
+    if ns.query in ("free", "conflicts") and not ns.query_person:
+        arg_parser.error(f"--query {ns.query} needs --person")
+    if ns.incremental and len(calendar_paths) > 1 and not ns.output_dir:
+        arg_parser.error("--incremental with more than one calendar needs --output-dir")
+    if ns.output_file:
+        config["output_file"] = ns.output_file
+    if ns.cache_dir:
+        config["cache_dir"] = ns.cache_dir
+    if ns.start_date:
+        config["start_date"] = ns.start_date
+    if ns.end_date:
+        config["end_date"] = ns.end_date
+    if ns.expand_chunk:
+        config["expand_chunk"] = ns.expand_chunk
+    if config["expand_chunk"] not in _EXPAND_CHUNKS:
+        arg_parser.error(f"expand_chunk must be one of {', '.join(_EXPAND_CHUNKS)}")
+    if config["start_date"] >= config["end_date"]:
+        arg_parser.error("the start date must be before the end date")
+    try:
+        output_exporter = exporter_for(config["output_file"], ns.export_format)
+    except ImportError as err:
+        arg_parser.error(str(err))
+    if ns.incremental and output_exporter.name != "csv":
+        arg_parser.error("--incremental can only update csv files")
+    try:
+        addresses.configure(config["ignored_domains"], config["ignored_patterns"])
+    except re.error as err:
+        arg_parser.error(f"invalid ignored_patterns: {err}")
 
     initialize_logging(
         config["logfile_name"], config["console_log_level"], config["logfile_log_level"]
     )
 
-    initialize_contact_list(config["contacts_file"])
-    main(ns.calendar_file)
-    save_contact_list(config["contacts_file"])
+    calendar_cache = None
+    if config["cache_dir"]:
+        calendar_cache = CalendarCache(
+            config["cache_dir"], config["cache_max_size_mb"] * 1024 * 1024
+        )
+
+    run_metrics = PipelineMetrics() if ns.profile else None
+    profiler = None
+    if ns.profile and ns.cprofile_file:
+        import cProfile  # pylint: disable=C0415
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    processor = CalendarProcessor(
+        start_date=config["start_date"],
+        end_date=config["end_date"],
+        expand_chunk=config["expand_chunk"],
+        cache=calendar_cache,
+        export_format=ns.export_format,
+        metrics=run_metrics,
+        expand_workers=ns.expand_workers,
+        stream=ns.stream,
+    )
+    if ns.query:
+        import json  # pylint: disable=C0415
+
+        def query_events() -> Iterator[CalendarEvent]:
+            """the events of every calendar, for the index"""
+            for path_index, path_data in fetch_calendars(
+                calendar_paths, ns.fetch_concurrency
+            ):
+                with open_calendar(calendar_paths[path_index], path_data) as cal_file:
+                    yield from processor.events(cal_file)
+
+        answer = query(
+            EventIndex(query_events()),
+            ns.query,
+            ns.query_start or datetime.datetime(*config["start_date"]),
+            ns.query_end or datetime.datetime(*config["end_date"]),
+            ns.query_person,
+        )
+        print(json.dumps(answer, indent=2))
+        arg_parser.exit()
+    with _stage(run_metrics, "load_contacts"):
+        processor.load_contacts(config["contacts_file"], config["contacts_store"])
+    if ns.watch:
+        from calendar_watcher import CalendarWatcher  # pylint: disable=C0415
+
+        watcher = CalendarWatcher(
+            processor,
+            ns.calendar_files,
+            config["output_file"],
+            ns.output_dir,
+            config["contacts_file"],
+            export_contacts=not config["contacts_store"] or ns.export_contacts,
+            debounce=ns.debounce,
+        )
+        try:
+            watcher.run(ns.poll_interval)
+        except KeyboardInterrupt:
+            pass
+        arg_parser.exit()
+    if len(calendar_paths) == 1 and not ns.output_dir:
+        cal_data = None
+        if is_url(calendar_paths[0]):
+            with _stage(run_metrics, "fetch"):
+                cal_data = fetch_url(calendar_paths[0])
+        with open_calendar(calendar_paths[0], cal_data) as cal_file:
+            if ns.incremental:
+                processor.process_incremental(cal_file, config["output_file"])
+            else:
+                processor.process(cal_file, config["output_file"])
+    else:
+        processor.process_files(
+            calendar_paths,
+            ns.output_dir,
+            ns.workers,
+            incremental=ns.incremental,
+            fetch_concurrency=ns.fetch_concurrency,
+            output_file=config["output_file"],
+        )
+    if ns.dedup:
+        with _stage(run_metrics, "dedup_contacts"):
+            processor.deduplicate_contacts(ns.dedup_threshold)
+    with _stage(run_metrics, "save_contacts"):
+        processor.save_contacts(
+            config["contacts_file"],
+            export=not config["contacts_store"] or ns.export_contacts,
+        )
+    print_contacts(processor.contact_list, ns.find_contacts)
+
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(ns.cprofile_file)
+    if run_metrics:
+        run_metrics.log(_logger)
+        if ns.metrics_file:
+            run_metrics.save(ns.metrics_file)
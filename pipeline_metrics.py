@@ -0,0 +1,233 @@
+"""
+    timing and counters for the stages of the calendar pipeline
+"""
+from contextlib import contextmanager
+import json
+import logging
+import time
+from typing import Dict, Iterable, Iterator, List, TypeVar
+
+try:
+    import resource
+except ImportError:  # not available on windows
+    resource = None  # type: ignore
+
+_Item = TypeVar("_Item")
+
+
+def _peak_memory_kb() -> int:
+    """
+    _peak_memory_kb get the peak resident memory of this process and any
+    finished child processes
+
+    Returns:
+        int: the peak in kilobytes, 0 if it can't be measured
+    """
+    if resource is None:
+        return 0
+    return max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+
+
+class PipelineMetrics:
+    """
+    wall and cpu time, and item counts, per stage plus named counters. The
+    stages are generators feeding each other, so time is always charged to the
+    innermost running stage: a stage's time doesn't include the stages it pulls
+    its input from
+    """
+
+    def __init__(self) -> None:
+        """
+        __init__ initialize the metrics with nothing recorded
+        """
+        self.wall: Dict[str, float] = {}
+        self.cpu: Dict[str, float] = {}
+        self.items: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {}
+        self.peak_memory_kb = 0
+        self._stack: List[str] = []
+        self._last_wall = 0.0
+        self._last_cpu = 0.0
+
+    def __str__(self) -> str:
+        """
+        __str__ return a string summary of the object
+
+        Returns:
+            str: a description of the object
+        """
+        return f"pipeline metrics: {len(self.wall)} stages"
+
+    def __getstate__(self) -> dict:
+        """
+        __getstate__ only the results are pickled, running stages aren't
+        carried over to another process
+
+        Returns:
+            dict: the state to pickle
+        """
+        state = dict(vars(self))
+        state["_stack"] = []
+        return state
+
+    def _switch(self) -> None:
+        """
+        _switch charge the time since the last switch to the running stage
+        """
+        now_wall = time.perf_counter()
+        now_cpu = time.process_time()
+        if self._stack:
+            stage = self._stack[-1]
+            self.wall[stage] = self.wall.get(stage, 0.0) + now_wall - self._last_wall
+            self.cpu[stage] = self.cpu.get(stage, 0.0) + now_cpu - self._last_cpu
+        self._last_wall = now_wall
+        self._last_cpu = now_cpu
+
+    def _enter(self, name: str) -> None:
+        """
+        _enter start running a stage, pausing the one that was running
+
+        Args:
+            name (str): the stage
+        """
+        self._switch()
+        self._stack.append(name)
+        self.wall.setdefault(name, 0.0)
+        self.cpu.setdefault(name, 0.0)
+
+    def _exit(self) -> None:
+        """
+        _exit stop running the current stage, resuming the one it paused
+        """
+        self._switch()
+        self._stack.pop()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        stage time a block of code as a stage
+
+        Args:
+            name (str): the stage
+        """
+        self._enter(name)
+        try:
+            yield
+        finally:
+            self._exit()
+
+    def timed(self, name: str, iterable: Iterable[_Item]) -> Iterator[_Item]:
+        """
+        timed time a generator stage and count the items it produces
+
+        Args:
+            name (str): the stage
+            iterable (Iterable[_Item]): the stage's output
+
+        Yields:
+            _Item: the items, unchanged
+        """
+        iterator = iter(iterable)
+        self.items.setdefault(name, 0)
+        while True:
+            self._enter(name)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._exit()
+            self.items[name] += 1
+            yield item
+
+    def count(self, name: str, value: int = 1) -> None:
+        """
+        count add to a counter
+
+        Args:
+            name (str): the counter
+            value (int, optional): the amount to add. Defaults to 1.
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, other: "PipelineMetrics") -> None:
+        """
+        merge add the results from another process into these
+
+        Args:
+            other (PipelineMetrics): the other results
+        """
+        for name, value in other.wall.items():
+            self.wall[name] = self.wall.get(name, 0.0) + value
+        for name, value in other.cpu.items():
+            self.cpu[name] = self.cpu.get(name, 0.0) + value
+        for name, count in other.items.items():
+            self.items[name] = self.items.get(name, 0) + count
+        for name, count in other.counters.items():
+            self.count(name, count)
+        self.peak_memory_kb = max(self.peak_memory_kb, other.peak_memory_kb)
+
+    def record_peak_memory(self) -> None:
+        """
+        record_peak_memory keep the peak memory of this process so far, a
+        worker process does so before its results are sent back
+        """
+        self.peak_memory_kb = max(self.peak_memory_kb, _peak_memory_kb())
+
+    def to_dict(self) -> dict:
+        """
+        to_dict get a dictionary representation of the results, including the
+        peak memory so far
+
+        Returns:
+            dict: the dictionary
+        """
+        self.record_peak_memory()
+        return {
+            "stages": {
+                name: {
+                    "wall": self.wall[name],
+                    "cpu": self.cpu.get(name, 0.0),
+                    "items": self.items.get(name),
+                }
+                for name in self.wall
+            },
+            "counters": dict(self.counters),
+            "peak_memory_kb": self.peak_memory_kb,
+        }
+
+    def log(self, logger: logging.Logger, level: int = logging.INFO) -> None:
+        """
+        log write the results to a logger
+
+        Args:
+            logger (logging.Logger): the logger
+            level (int, optional): the level to log at. Defaults to logging.INFO.
+        """
+        results = self.to_dict()
+        for name, stage in results["stages"].items():
+            items = f", {stage['items']} items" if stage["items"] is not None else ""
+            logger.log(
+                level,
+                "stage %s: %.3fs wall, %.3fs cpu%s",
+                name,
+                stage["wall"],
+                stage["cpu"],
+                items,
+            )
+        for name, count in results["counters"].items():
+            logger.log(level, "%s: %d", name, count)
+        logger.log(level, "peak memory: %d KB", results["peak_memory_kb"])
+
+    def save(self, filename: str) -> None:
+        """
+        save write the results to a JSON file
+
+        Args:
+            filename (str): the file to write
+        """
+        with open(filename, "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, indent=2)
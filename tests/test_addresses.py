@@ -0,0 +1,61 @@
+from typing import Iterator
+
+import pytest
+
+import addresses
+import contact
+import contact_list
+
+
+@pytest.fixture(autouse=True)
+def default_rules() -> Iterator[None]:
+    yield
+    addresses.configure()
+
+
+def test_parse_person() -> None:
+    assert addresses.parse_person("mailto:foo@devnull.com") == "foo@devnull.com"
+    assert not addresses.parse_person("mailto:room@resource.calendar.google.com")
+    assert addresses.parse_person("foo") == "foo"
+
+
+def test_canonical() -> None:
+    assert addresses.canonical(" MAILTO:Foo@DevNull.com ") == "foo@devnull.com"
+    assert addresses.canonical("Foo@X.com") is addresses.canonical("foo@x.com")
+
+
+def test_configure() -> None:
+    addresses.configure(["@lists.devnull.com"], [r"^room-"])
+    assert addresses.rules() == (("@lists.devnull.com",), ("^room-",))
+    assert not addresses.parse_person("mailto:team@lists.devnull.com")
+    assert not addresses.parse_person("mailto:Room-4@devnull.com")
+    assert addresses.parse_person("mailto:roomba@devnull.com") == "roomba@devnull.com"
+    # the google resources are only ignored by default
+    assert addresses.parse_person("mailto:r@resource.calendar.google.com")
+
+
+def test_infer_name() -> None:
+    assert addresses.infer_name("kevin.goldsmith@devnull.com") == ("kevin", "goldsmith")
+    assert addresses.infer_name("kevin@devnull.com") == ("kevin", "")
+    assert addresses.infer_name("a.b.c@devnull.com") == ("a", "b.c")
+
+
+def test_contact_case() -> None:
+    a = contact.Contact(email="Kevin.Goldsmith@DevNull.com")
+    assert a.first_name == "Kevin"
+    assert a.last_name == "Goldsmith"
+    assert a.email == ["kevin.goldsmith@devnull.com"]
+    assert contact.Contact(email="mailto:Jane.Doe@X.com").first_name == "Jane"
+    # an address from a calendar is canonical, the name keeps the case the
+    # calendar wrote it in
+    address = addresses.parse_person("mailto:Fred.Flintstone@Bedrock.com")
+    assert address == "fred.flintstone@bedrock.com"
+    fred = contact.Contact(email=address)
+    assert (fred.first_name, fred.last_name) == ("Fred", "Flintstone")
+    b = contact.Contact(email=["foo@devnull.com", "FOO@devnull.com "])
+    assert b.email == ["foo@devnull.com"]
+
+    list = contact_list.ContactList()
+    list.add(contact.Contact(email="foo@x.com"))
+    assert not list.add(contact.Contact(email="Foo@X.com"))
+    assert len(list.contacts) == 1
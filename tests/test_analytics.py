@@ -0,0 +1,95 @@
+import datetime
+from typing import List
+
+from icalendar import Event  # type: ignore
+
+import analytics
+import calendar_event
+
+
+def make_event(
+    day: int, hour: float, minutes: int, organizer: str, attendees: List[str]
+) -> calendar_event.CalendarEvent:
+    start = datetime.datetime(
+        2023, 1, day, tzinfo=datetime.timezone.utc
+    ) + datetime.timedelta(hours=hour)
+    event = Event()
+    event.add("uid", f"{day}-{hour}")
+    event.add("summary", "meeting")
+    event.add("dtstart", start)
+    event.add("dtend", start + datetime.timedelta(minutes=minutes))
+    event.add("dtstamp", datetime.datetime(2022, 12, 2, 0, 0))
+    event.add("organizer", f"mailto:{organizer}")
+    event.add("attendee", [f"mailto:{attendee}" for attendee in attendees])
+    return calendar_event.CalendarEvent(event)
+
+
+def make_arrays() -> analytics.EventArrays:
+    all_day = Event()
+    all_day.add("summary", "holiday")
+    all_day.add("dtstart", datetime.date(2023, 1, 2))
+    all_day.add("dtend", datetime.date(2023, 1, 3))
+    all_day.add("dtstamp", datetime.datetime(2022, 12, 2, 0, 0))
+    return analytics.EventArrays(
+        [
+            # monday the 2nd: 9:00-10:00, 10:00-10:30 then 14:00-15:00
+            make_event(2, 9, 60, "a@x.com", ["a@x.com", "b@x.com", "c@x.com"]),
+            make_event(2, 10, 30, "b@x.com", ["a@x.com", "b@x.com"]),
+            make_event(2, 14, 60, "a@x.com", ["c@x.com"]),
+            # the next week
+            make_event(9, 9, 30, "c@x.com", ["a@x.com", "b@x.com"]),
+            calendar_event.CalendarEvent(all_day),
+        ]
+    )
+
+
+def test_event_arrays() -> None:
+    arrays = make_arrays()
+    assert str(arrays) == "event arrays: 4 events, 3 people"
+    assert arrays.people == ["a@x.com", "b@x.com", "c@x.com"]
+    assert len(arrays.participant_person) == 10
+
+
+def test_hours() -> None:
+    arrays = make_arrays()
+    hours = analytics.hours_per_person(arrays)
+    assert hours == {"a@x.com": 3.0, "b@x.com": 2.0, "c@x.com": 2.5}
+    assert list(hours) == ["a@x.com", "c@x.com", "b@x.com"]
+    assert analytics.hours_per_organizer(arrays) == {
+        "a@x.com": 2.0,
+        "b@x.com": 0.5,
+        "c@x.com": 0.5,
+    }
+    assert analytics.hours_per_week(arrays) == {"2023-01-02": 2.5, "2023-01-09": 0.5}
+
+
+def test_co_occurrence() -> None:
+    assert analytics.co_occurrence(make_arrays()) == [
+        ("a@x.com", "b@x.com", 3),
+        ("a@x.com", "c@x.com", 3),
+        ("b@x.com", "c@x.com", 2),
+    ]
+    assert analytics.co_occurrence(make_arrays(), top=1) == [("a@x.com", "b@x.com", 3)]
+    # the meetings of three are left out
+    assert analytics.co_occurrence(make_arrays(), max_meeting_size=2) == [
+        ("a@x.com", "b@x.com", 1),
+        ("a@x.com", "c@x.com", 1),
+    ]
+
+
+def test_back_to_back() -> None:
+    # a and b go straight from the 9:00 to the 10:00 meeting
+    assert analytics.back_to_back(make_arrays()) == {"a@x.com": 0.25, "b@x.com": 1 / 3}
+
+
+def test_focus_time() -> None:
+    # a has 10:30 to 14:00 free and c 10:00 to 14:00, the gaps between days
+    # don't count
+    assert analytics.focus_time(make_arrays()) == {"c@x.com": 4.0, "a@x.com": 3.5}
+
+
+def test_summary() -> None:
+    result = analytics.summary(make_arrays(), top=2)
+    assert result["events"] == 4
+    assert len(result["hours_per_person"]) == 2
+    assert analytics.summary(analytics.EventArrays([]))["co_occurrence"] == []
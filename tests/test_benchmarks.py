@@ -0,0 +1,51 @@
+import pathlib
+
+from icalendar import Calendar  # type: ignore
+
+from benchmarks import run_benchmarks, startup
+from benchmarks.synthetic_calendar import generate_calendar
+
+
+def test_generate_calendar() -> None:
+    ical_data = generate_calendar(events=20, attendees=3, people=10, seed=2)
+    assert ical_data == generate_calendar(events=20, attendees=3, people=10, seed=2)
+    assert ical_data != generate_calendar(events=20, attendees=3, people=10, seed=3)
+    events = Calendar.from_ical(ical_data).walk("VEVENT")
+    assert len(events) == 20
+    assert all(len(event["attendee"]) == 3 for event in events)
+
+
+def test_run_benchmarks() -> None:
+    results = run_benchmarks.run_benchmarks(
+        {"events": 10, "attendees": 2, "people": 5},
+        ((2023, 1, 1), (2023, 2, 1)),
+        repeat=1,
+    )
+    assert results["counts"]["contacts"] <= 5
+    assert set(results["stages"]) >= {"from_ical", "expand", "save_calendar_list"}
+    assert len(results["stages"]["expand"]["runs"]) == 1
+
+
+def test_memory_per_occurrence() -> None:
+    results = run_benchmarks.run_benchmarks(
+        {"events": 20, "recurring": 1.0, "attendees": 10, "people": 50},
+        ((2023, 1, 1), (2023, 4, 1)),
+        repeat=1,
+    )
+    # an occurrence shares its series' strings and attendees, so it's little
+    # more than the slotted object and its times
+    assert 0 < results["memory"]["calendar_events"]["per_occurrence"] < 400
+    # and so does one read back from the cache, which would otherwise have its
+    # own copy of every string and attendee
+    assert 0 < results["memory"]["cached_events"]["per_occurrence"] < 400
+    assert results["memory"]["contacts"]["per_contact"] > 0
+
+
+def test_startup_heavy_imports(tmp_path: pathlib.Path) -> None:
+    assert startup.heavy_imports(None, str(tmp_path)) == []
+    assert startup.heavy_imports(["--help"], str(tmp_path)) == []
+    assert startup.heavy_imports(["--find-contact", "a@x.com"], str(tmp_path)) == []
+    (tmp_path / "cal.ics").write_bytes(
+        generate_calendar(events=2, attendees=1, people=2, seed=1)
+    )
+    assert "icalendar" in startup.heavy_imports(["cal.ics"], str(tmp_path))
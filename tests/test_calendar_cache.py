@@ -0,0 +1,56 @@
+import io
+import os
+import pathlib
+
+import calendar_cache
+
+
+def test_key_for_file(tmp_path: pathlib.Path) -> None:
+    cache = calendar_cache.CalendarCache(str(tmp_path))
+    cache_file = io.BytesIO(b"BEGIN:VCALENDAR")
+    key = cache.key_for_file(cache_file, (2023, 1, 1), (2023, 1, 31))
+    assert cache_file.tell() == 0
+    assert key == cache.key_for_file(cache_file, (2023, 1, 1), (2023, 1, 31))
+    assert key != cache.key_for_file(cache_file, (2023, 1, 1), (2023, 2, 28))
+    assert key != cache.key_for_file(
+        cache_file, (2023, 1, 1), (2023, 1, 31), ("start",)
+    )
+    other_file = io.BytesIO(b"BEGIN:VCALENDAR\r\n")
+    assert key != cache.key_for_file(other_file, (2023, 1, 1), (2023, 1, 31))
+
+
+def test_store_and_load(tmp_path: pathlib.Path) -> None:
+    cache = calendar_cache.CalendarCache(str(tmp_path))
+    assert cache.load("abc") is None
+    events = ["one", "two", "three"]
+    assert list(cache.store("abc", iter(events))) == events
+    loaded = cache.load("abc")
+    assert loaded is not None
+    assert list(loaded) == events
+    # records referring to the same object more than once, as an event's start
+    # and end share a timezone
+    zones = [[f"zone {index}"] for index in range(3)]
+    events = [(zone, zone) for zone in zones]
+    list(cache.store("shared", iter(events)))
+    loaded = cache.load("shared")
+    assert loaded is not None
+    assert list(loaded) == events
+
+
+def test_partial_store_not_cached(tmp_path: pathlib.Path) -> None:
+    cache = calendar_cache.CalendarCache(str(tmp_path))
+    stored = cache.store("abc", iter(["one", "two"]))
+    next(stored)
+    stored.close()
+    assert cache.load("abc") is None
+    assert not os.listdir(tmp_path)
+
+
+def test_evict(tmp_path: pathlib.Path) -> None:
+    cache = calendar_cache.CalendarCache(str(tmp_path), max_size=1)
+    list(cache.store("old", ["x" * 100]))
+    list(cache.store("new", ["y" * 100]))
+    assert cache.load("old") is None
+    cache.max_size = 1024
+    list(cache.store("newer", ["z" * 100]))
+    assert cache.load("newer") is not None
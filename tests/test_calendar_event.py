@@ -0,0 +1,66 @@
+import datetime
+
+from icalendar import Event, vCalAddress, vDDDTypes, vText  # type: ignore
+
+import calendar_event
+
+
+def make_event() -> Event:
+    event = Event()
+    event.add("summary", "1:1")
+    event.add("dtstart", datetime.datetime(2023, 1, 10, 20, 0))
+    event.add("dtend", datetime.datetime(2023, 1, 10, 20, 30))
+    event.add("dtstamp", datetime.datetime(2022, 12, 2, 0, 0))
+    event.add("organizer", vCalAddress("mailto:fred.flintstone@devnull.com"))
+    return event
+
+
+def test_single_attendee() -> None:
+    event = make_event()
+    event.add("attendee", vCalAddress("mailto:kevin.goldsmith@devnull.com"))
+    cal_event = calendar_event.CalendarEvent(event)
+    assert cal_event.organizer == "fred.flintstone@devnull.com"
+    assert cal_event.attendees == ("kevin.goldsmith@devnull.com",)
+
+
+def test_dict_for_csv() -> None:
+    event = make_event()
+    event.add("attendee", vCalAddress("mailto:kevin.goldsmith@devnull.com"))
+    event.add("attendee", vCalAddress("mailto:barney@devnull.com"))
+    row = calendar_event.CalendarEvent(event).dict_for_csv()
+    assert row["summary"] == "1:1"
+    assert row["start"] == "2023-01-10 20:00:00"
+    assert row["attendees"] == "kevin.goldsmith@devnull.com,barney@devnull.com"
+
+
+def test_shared_attendees() -> None:
+    event = make_event()
+    event.add("attendee", vCalAddress("mailto:kevin.goldsmith@devnull.com"))
+    event.add("attendee", vCalAddress("mailto:barney@devnull.com"))
+    first = calendar_event.CalendarEvent(event)
+    second = calendar_event.CalendarEvent(event)
+    assert first.attendees is second.attendees
+    assert first.to_dict()["attendees"] == (
+        "kevin.goldsmith@devnull.com",
+        "barney@devnull.com",
+    )
+
+
+def test_builder_reuses_series() -> None:
+    event = make_event()
+    event.add("uid", "a1")
+    event.add("attendee", vCalAddress("mailto:kevin.goldsmith@devnull.com"))
+    event.add("attendee", vCalAddress("mailto:barney@devnull.com"))
+    occurrence = event.copy()
+    occurrence["dtstart"] = vDDDTypes(datetime.datetime(2023, 1, 11, 20, 0))
+    occurrence["dtend"] = vDDDTypes(datetime.datetime(2023, 1, 11, 20, 30))
+    moved = event.copy()
+    moved["summary"] = vText("moved")
+
+    builder = calendar_event.CalendarEventBuilder()
+    first = builder.build(event)
+    second = builder.build(occurrence)
+    assert second.attendees is first.attendees
+    assert second.start == datetime.datetime(2023, 1, 11, 20, 0)
+    assert second.summary == "1:1"
+    assert builder.build(moved).summary == "moved"
@@ -0,0 +1,103 @@
+import http.client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pathlib
+import threading
+import time
+from typing import Iterator
+
+import pytest
+
+import calendar_sources
+from contact_list import ContactList
+import parse_calendar
+
+CALENDAR = b"""BEGIN:VCALENDAR
+VERSION:2.0
+PRODID:test
+BEGIN:VEVENT
+UID:a1
+SUMMARY:Standup
+DTSTART:20230110T170000Z
+DTEND:20230110T171500Z
+DTSTAMP:20221201T000000Z
+STATUS:CONFIRMED
+ORGANIZER:mailto:kevin.goldsmith@devnull.com
+ATTENDEE:mailto:fred.flintstone@devnull.com
+END:VEVENT
+END:VCALENDAR
+"""
+
+
+class CalendarHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path == "/missing.ics":
+            self.send_error(404)
+            return
+        if self.path == "/slow.ics":
+            time.sleep(0.5)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/calendar")
+        self.end_headers()
+        self.wfile.write(CALENDAR)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def server() -> Iterator[str]:
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), CalendarHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_source_stem() -> None:
+    assert calendar_sources.source_stem("cals/work.ics") == "work"
+    assert calendar_sources.source_stem("https://example.org/dav/work/") == "work"
+    assert calendar_sources.source_stem("https://example.org") == "example"
+
+
+def test_fetch_calendars(server: str) -> None:
+    sources = [f"{server}/slow.ics", "local.ics", f"{server}/fast.ics"]
+    fetched = list(calendar_sources.fetch_calendars(sources, concurrency=3))
+    # the slow download doesn't hold up the others
+    assert fetched[-1] == (0, CALENDAR)
+    assert sorted(fetched[:2], key=lambda item: item[0]) == [
+        (1, None),
+        (2, CALENDAR),
+    ]
+
+
+def test_fetch_calendars_error(server: str) -> None:
+    with pytest.raises(OSError):
+        list(calendar_sources.fetch_calendars([f"{server}/missing.ics"]))
+
+
+def test_fetch_calendars_bad_url() -> None:
+    # http.client.InvalidURL, not an OSError, still ends the fetch
+    with pytest.raises(http.client.InvalidURL):
+        list(calendar_sources.fetch_calendars(["http://localhost:abc/x.ics", "a.ics"]))
+
+
+def test_process_calendar_urls(
+    server: str, tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "local.ics").write_bytes(CALENDAR)
+    contact_list = ContactList()
+    parse_calendar.process_calendar_files(
+        [f"{server}/work.ics", "local.ics", f"{server}/slow.ics"],
+        contact_list,
+        "out",
+        workers=1,
+        start_date=(2023, 1, 1),
+        end_date=(2023, 2, 1),
+    )
+    for name in ["work", "local", "slow"]:
+        assert (tmp_path / "out" / f"{name}.csv").read_bytes() == (
+            tmp_path / "out" / "local.csv"
+        ).read_bytes()
+    assert len(contact_list.contacts) == 2
@@ -0,0 +1,173 @@
+import os
+import pathlib
+import threading
+import time
+
+import pytest
+
+from calendar_watcher import CalendarWatcher
+import parse_calendar
+
+CALENDAR = """BEGIN:VCALENDAR
+VERSION:2.0
+PRODID:test
+BEGIN:VEVENT
+UID:daily
+SUMMARY:Daily
+DTSTART:20230102T090000Z
+DTEND:20230102T091500Z
+DTSTAMP:20221201T000000Z
+RRULE:FREQ=DAILY;COUNT=5
+STATUS:CONFIRMED
+ORGANIZER:mailto:boss.person@x.com
+ATTENDEE:mailto:jane.doe@x.com
+END:VEVENT
+BEGIN:VEVENT
+UID:single
+SUMMARY:{summary}
+DTSTART:20230103T120000Z
+DTEND:20230103T130000Z
+DTSTAMP:20221201T000000Z
+STATUS:CONFIRMED
+END:VEVENT
+END:VCALENDAR
+"""
+
+
+def write_calendar(path: pathlib.Path, text: str, mtime: int) -> None:
+    path.write_text(text)
+    # a time in the past, so the file has settled and every write is a change
+    os.utime(path, (mtime, mtime))
+
+
+def new_watcher(tmp_path: pathlib.Path, **kwargs) -> CalendarWatcher:
+    processor = parse_calendar.CalendarProcessor(
+        start_date=(2023, 1, 1), end_date=(2023, 2, 1)
+    )
+    return CalendarWatcher(
+        processor,
+        [str(tmp_path / "calendars")],
+        str(tmp_path / "calendar.csv"),
+        contacts_file=str(tmp_path / "contacts.json"),
+        **kwargs,
+    )
+
+
+def test_watcher(tmp_path: pathlib.Path) -> None:
+    (tmp_path / "calendars").mkdir()
+    calendar_path = tmp_path / "calendars" / "team.ics"
+    write_calendar(calendar_path, CALENDAR.format(summary="Lunch"), 1_000_000)
+    watcher = new_watcher(tmp_path)
+    assert watcher.poll() == [str(calendar_path)]
+    assert watcher.poll() == []
+    watcher.flush()
+    output = (tmp_path / "calendar.csv").read_text()
+    assert len(output.splitlines()) == 7
+    assert "Lunch" in output
+    assert (tmp_path / "contacts.json").exists()
+    assert watcher.processor.contact_list.find_by_email("jane.doe@x.com")
+
+    # only the series that changed is expanded again
+    daily = watcher._calendars[str(calendar_path)].events["daily"]
+    write_calendar(calendar_path, CALENDAR.format(summary="Brunch"), 1_000_001)
+    assert watcher.poll() == [str(calendar_path)]
+    assert watcher._calendars[str(calendar_path)].events["daily"] is daily
+    watcher.flush()
+    output = (tmp_path / "calendar.csv").read_text()
+    assert "Brunch" in output and "Lunch" not in output
+
+    # touched but not changed
+    os.utime(calendar_path, (1_000_002, 1_000_002))
+    assert watcher.poll() == []
+
+    # a series removed
+    text = CALENDAR.format(summary="Brunch")
+    start = text.index("BEGIN:VEVENT\nUID:single")
+    text = text[:start] + text[text.index("END:VCALENDAR") :]
+    write_calendar(calendar_path, text, 1_000_003)
+    assert watcher.poll() == [str(calendar_path)]
+    assert list(watcher._calendars[str(calendar_path)].events) == ["daily"]
+    watcher.flush()
+    assert len((tmp_path / "calendar.csv").read_text().splitlines()) == 6
+
+    # a calendar removed
+    calendar_path.unlink()
+    assert watcher.poll() == [str(calendar_path)]
+    watcher.flush()
+    assert len((tmp_path / "calendar.csv").read_text().splitlines()) == 1
+
+
+def test_watcher_retries_failed_update(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    (tmp_path / "calendars").mkdir()
+    calendar_path = tmp_path / "calendars" / "team.ics"
+    write_calendar(calendar_path, CALENDAR.format(summary="Lunch"), 1_000_000)
+    watcher = new_watcher(tmp_path)
+    assert watcher.poll() == [str(calendar_path)]
+
+    expand_calendar = watcher.processor.expand_calendar
+
+    def fail(*args: object) -> None:
+        raise ValueError("bad event")
+
+    write_calendar(calendar_path, CALENDAR.format(summary="Brunch"), 1_000_001)
+    monkeypatch.setattr(watcher.processor, "expand_calendar", fail)
+    assert watcher.poll() == []
+    # the file hasn't changed since, but the series are tried again
+    monkeypatch.setattr(watcher.processor, "expand_calendar", expand_calendar)
+    assert watcher.poll() == [str(calendar_path)]
+    watcher.flush()
+    assert "Brunch" in (tmp_path / "calendar.csv").read_text()
+
+    # a new calendar that can't be read isn't watched until it can be
+    other_path = tmp_path / "calendars" / "other.ics"
+    write_calendar(other_path, CALENDAR.format(summary="Dinner"), 1_000_000)
+    monkeypatch.setattr(watcher.processor, "expand_calendar", fail)
+    assert watcher.poll() == []
+    assert str(other_path) not in watcher._calendars
+    monkeypatch.setattr(watcher.processor, "expand_calendar", expand_calendar)
+    assert watcher.poll() == [str(other_path)]
+
+
+def test_watcher_output_dir(tmp_path: pathlib.Path) -> None:
+    (tmp_path / "calendars").mkdir()
+    first = tmp_path / "calendars" / "first.ics"
+    second = tmp_path / "calendars" / "second.ics"
+    write_calendar(first, CALENDAR.format(summary="Lunch"), 1_000_000)
+    watcher = new_watcher(tmp_path, output_dir=str(tmp_path / "out"))
+    watcher.poll()
+    watcher.flush()
+    assert sorted(os.listdir(tmp_path / "out")) == ["first.csv"]
+
+    write_calendar(second, CALENDAR.format(summary="Dinner"), 1_000_000)
+    assert watcher.poll() == [str(second)]
+    watcher.flush()
+    assert sorted(os.listdir(tmp_path / "out")) == ["first.csv", "second.csv"]
+    assert "Dinner" in (tmp_path / "out" / "second.csv").read_text()
+
+    first.unlink()
+    watcher.poll()
+    watcher.flush()
+    assert sorted(os.listdir(tmp_path / "out")) == ["second.csv"]
+
+
+def test_watcher_run(tmp_path: pathlib.Path) -> None:
+    (tmp_path / "calendars").mkdir()
+    write_calendar(
+        tmp_path / "calendars" / "team.ics",
+        CALENDAR.format(summary="Lunch"),
+        1_000_000,
+    )
+    watcher = new_watcher(tmp_path, debounce=0)
+    stop = threading.Event()
+    thread = threading.Thread(target=watcher.run, args=(0.01, stop))
+    thread.start()
+    for _ in range(500):
+        if (tmp_path / "calendar.csv").exists():
+            break
+        time.sleep(0.01)
+    stop.set()
+    thread.join()
+    assert len((tmp_path / "calendar.csv").read_text().splitlines()) == 7
+    assert not watcher._changed
@@ -0,0 +1,102 @@
+import logging
+import pathlib
+
+import pytest
+
+import contact
+import contact_dedup
+import contact_list
+import contact_store
+
+
+def test_soundex() -> None:
+    assert contact_dedup.soundex("Robert") == "R163"
+    assert contact_dedup.soundex("Rupert") == "R163"
+    assert contact_dedup.soundex("Ashcraft") == "A261"
+    assert contact_dedup.soundex("Tymczak") == "T522"
+    assert contact_dedup.soundex("Pfister") == "P236"
+
+
+def test_jaro_winkler() -> None:
+    assert contact_dedup.jaro_winkler("martha", "marhta") == pytest.approx(0.9611, 1e-3)
+    assert contact_dedup.jaro_winkler("dwayne", "duane") == pytest.approx(0.84, 1e-3)
+    assert contact_dedup.jaro_winkler("dixon", "dicksonx") == pytest.approx(
+        0.8133, 1e-3
+    )
+    assert contact_dedup.jaro_winkler("same", "same") == 1.0
+    assert contact_dedup.jaro_winkler("abc", "xyz") == 0.0
+
+
+def _list(*contacts: contact.Contact) -> contact_list.ContactList:
+    new_list = contact_list.ContactList()
+    for contact_item in contacts:
+        new_list.add(contact_item)
+    return new_list
+
+
+def test_deduplicate() -> None:
+    contacts = _list(
+        contact.Contact(email="jane.doe@corp.com"),
+        contact.Contact(email="jdoe@corp.com"),
+        contact.Contact("Jane", "Doe", "jane@personal.org"),
+        contact.Contact(email="john.doe@corp.com"),
+        contact.Contact(email="jen.smith@corp.com"),
+        contact.Contact("Jennifer", "Smith", "jsmith@home.net"),
+    )
+    result = contact_dedup.deduplicate(contacts)
+    assert result.merged == 3
+    assert len(contacts.contacts) == 3
+    jane = contacts.find_by_email("jdoe@corp.com")
+    assert jane is not None
+    assert jane.email == ["jane.doe@corp.com", "jdoe@corp.com", "jane@personal.org"]
+    assert contacts.find_by_email("jane@personal.org") is jane
+    john = contacts.find_by_email("john.doe@corp.com")
+    assert john is not None and john is not jane
+    # jdoe could be john as well, so that pair is left for a person to check
+    assert [
+        (match.first.email[0], match.second.email[0]) for match in result.review
+    ] == [("jdoe@corp.com", "john.doe@corp.com")]
+
+
+def test_find_duplicates_review_only() -> None:
+    first = contact.Contact(email="kevin@a.com")
+    second = contact.Contact(email="kevin@b.com")
+    matches, pairs_scored = contact_dedup.find_duplicates([first, second])
+    assert pairs_scored == 1
+    assert [(match.first, match.second) for match in matches] == [(first, second)]
+    assert matches[0].score == pytest.approx(0.8)
+    result = contact_dedup.deduplicate(_list(first, second))
+    assert result.merged == 0
+    assert len(result.review) == 1
+
+
+def test_find_duplicates_block_size(caplog: pytest.LogCaptureFixture) -> None:
+    contacts = [contact.Contact(email=f"kevin@{index}.com") for index in range(30)]
+    assert len(contact_dedup.find_duplicates(contacts)[0]) == 435
+    caplog.set_level(logging.INFO, logger="contact_dedup")
+    matches, pairs_scored = contact_dedup.find_duplicates(contacts, max_block_size=20)
+    # each contact is only scored with the 10 after it
+    assert pairs_scored == len(matches) == 20 * 10 + 9 * 10 // 2
+    assert "30 contacts" in caplog.text
+
+
+def test_deduplicate_store(tmp_path: pathlib.Path) -> None:
+    filename = str(tmp_path / "contacts.db")
+    store = contact_store.StoredContactList(filename)
+    store.add(contact.Contact(email="jane.doe@corp.com"))
+    store.add(contact.Contact("Jane", "Doe", "jane@personal.org"))
+    store.add(contact.Contact(email="fred@aol.com"))
+    store.save()
+    store.close()
+
+    store = contact_store.StoredContactList(filename)
+    assert contact_dedup.deduplicate(store).merged == 1
+    assert len(store) == 2
+    store.save()
+    store.close()
+
+    store = contact_store.StoredContactList(filename)
+    assert len(store) == 2
+    jane = store.find_by_email("jane@personal.org")
+    assert jane is not None
+    assert jane.email == ["jane.doe@corp.com", "jane@personal.org"]
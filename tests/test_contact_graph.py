@@ -0,0 +1,143 @@
+import datetime
+import pathlib
+from typing import List
+from xml.etree import ElementTree
+
+from icalendar import Event  # type: ignore
+import pytest
+
+import calendar_event
+import contact_graph
+
+UTC = datetime.timezone.utc
+
+
+def make_event(
+    uid: str, day: int, minutes: int, people: List[str]
+) -> calendar_event.CalendarEvent:
+    start = datetime.datetime(2023, 1, day, 9, tzinfo=UTC)
+    event = Event()
+    event.add("uid", uid)
+    event.add("summary", uid)
+    event.add("dtstart", start)
+    event.add("dtend", start + datetime.timedelta(minutes=minutes))
+    event.add("dtstamp", datetime.datetime(2022, 12, 2, 0, 0))
+    event.add("organizer", f"mailto:{people[0]}@x.com")
+    event.add("attendee", [f"mailto:{person}@x.com" for person in people[1:]])
+    return calendar_event.CalendarEvent(event)
+
+
+def make_graph() -> contact_graph.ContactGraph:
+    offsite = Event()
+    offsite.add("uid", "offsite")
+    offsite.add("summary", "offsite")
+    offsite.add("dtstart", datetime.date(2023, 1, 2))
+    offsite.add("dtend", datetime.date(2023, 1, 5))
+    offsite.add("dtstamp", datetime.datetime(2022, 12, 2, 0, 0))
+    offsite.add("attendee", ["mailto:a@x.com", "mailto:f@x.com"])
+    events = [
+        # a, b and c are a team, d, e and f another, c and d link them
+        make_event("team1", day, 30, ["a", "b", "c"])
+        for day in range(2, 7)
+    ]
+    events += [make_event("team2", day, 30, ["d", "e", "f"]) for day in range(2, 7)]
+    events += [
+        make_event("a-b", 9, 60, ["a", "b"]),
+        make_event("c-d", 9, 120, ["c", "d"]),
+        make_event("all-hands", 10, 60, ["a", "b", "c", "d", "e", "f", "g"]),
+        calendar_event.CalendarEvent(offsite),
+    ]
+    return contact_graph.ContactGraph(events, max_meeting_size=6)
+
+
+def address(person: str) -> str:
+    return f"{person}@x.com"
+
+
+def test_build() -> None:
+    graph = make_graph()
+    assert str(graph) == "contact graph: 7 people, 7 edges"
+    assert len(graph) == 7
+    assert graph.large_meetings == 1
+    assert graph.collaborators(address("a")) == [
+        (address("b"), 6, 3.5),
+        (address("c"), 5, 2.5),
+    ]
+    assert graph.collaborators(address("c"), top=1) == [(address("a"), 5, 2.5)]
+    assert graph.collaborators(address("c"), weight="meetings")[2] == (
+        address("d"),
+        1,
+        2.0,
+    )
+    assert graph.collaborators(address("d"), weight="hours")[0] == (
+        address("e"),
+        5,
+        2.5,
+    )
+    assert graph.collaborators(address("g")) == []
+    with pytest.raises(KeyError):
+        graph.collaborators("nobody@x.com")
+    with pytest.raises(ValueError):
+        graph.collaborators(address("a"), weight="minutes")
+
+
+def test_add_after_query() -> None:
+    graph = make_graph()
+    assert graph.edge_count == 7
+    graph.add(make_event("a-h", 11, 30, ["a", "h"]))
+    assert graph.edge_count == 8
+    assert graph.collaborators(address("h")) == [(address("a"), 1, 0.5)]
+
+
+def test_clustering() -> None:
+    graph = make_graph()
+    assert graph.clustering(address("a")) == 1.0
+    # of c's collaborators a, b and d, only a and b meet
+    assert graph.clustering(address("c")) == pytest.approx(1 / 3)
+    assert graph.clustering(address("g")) == 0.0
+
+
+def test_communities() -> None:
+    graph = make_graph()
+    assert [sorted(group) for group in graph.communities()] == [
+        [address("a"), address("b"), address("c")],
+        [address("d"), address("e"), address("f")],
+    ]
+    assert len(graph.communities(min_size=1)) == 3
+
+
+def test_shortest_path() -> None:
+    graph = make_graph()
+    assert graph.shortest_path(address("a"), address("f")) == [
+        address("a"),
+        address("c"),
+        address("d"),
+        address("f"),
+    ]
+    assert graph.shortest_path(address("b"), address("e"), weighted=True) == [
+        address("b"),
+        address("c"),
+        address("d"),
+        address("e"),
+    ]
+    assert graph.shortest_path(address("a"), address("a")) == [address("a")]
+    assert graph.shortest_path(address("a"), address("g")) is None
+    assert graph.shortest_path(address("a"), address("g"), weighted=True) is None
+
+
+def test_write_graphml(tmp_path: pathlib.Path) -> None:
+    graph = make_graph()
+    filename = tmp_path / "graph.graphml"
+    graph.write_graphml(str(filename), min_meetings=2)
+    namespace = {"g": "http://graphml.graphdrawing.org/xmlns"}
+    root = ElementTree.parse(filename).getroot()
+    nodes = root.findall("g:graph/g:node", namespace)
+    assert [node.find("g:data", namespace).text for node in nodes] == [
+        address(person) for person in "abcdefg"
+    ]
+    edges = root.findall("g:graph/g:edge", namespace)
+    # c-d only met once
+    assert len(edges) == 6
+    assert edges[0].attrib == {"source": "n0", "target": "n1"}
+    assert [data.text for data in edges[0]] == ["6", "3.50"]
+    assert not (tmp_path / "graph.graphml.tmp").exists()
@@ -97,3 +97,168 @@ def test_load_from_file(tmp_path: pathlib.Path) -> None:
     list2.load_from_file(test_file_name)
     assert len(list2.contacts) == 3
     assert list2.contacts[2] == list.contacts[2]
+
+
+def test_find_by_name() -> None:
+    list = contact_list.ContactList()
+    list.add(contact.Contact(email="kevin@devnull.com"))
+    assert len(list.find_by_name("kevin", "")) == 1
+    list.add(contact.Contact("kevin", "goldsmith", "kevin@devnull.com"))
+    assert len(list.contacts) == 1
+    assert not list.find_by_name("kevin", "")
+    assert list.find_by_name("kevin", "goldsmith")[0].email == ["kevin@devnull.com"]
+
+
+def test_merge() -> None:
+    list = contact_list.ContactList()
+    list.add(contact.Contact("kevin", "goldsmith", "foo@devnull.com"))
+    list.add(contact.Contact("fred", "flintstone", "ff@aol.com"))
+    list2 = contact_list.ContactList()
+    list2.add(contact.Contact("kevin", "goldsmith", "blah@devnull.com"))
+    list2.add(contact.Contact("Barney", "Rubble", "br@foobar.org"))
+    list.merge(list2)
+    assert len(list.contacts) == 3
+    assert list.find_by_email("blah@devnull.com") is list.find_by_email(
+        "foo@devnull.com"
+    )
+    assert list.find_by_email("br@foobar.org") is not None
+
+
+def test_load_from_file_indexes(tmp_path: pathlib.Path) -> None:
+    list = contact_list.ContactList()
+    list.add(contact.Contact("Barney", "Rubble", ["br@foobar.org", "wqeqw@qweqw.qweq"]))
+    test_file_name = str(tmp_path / "testfile.csv")
+    list.save_to_file(test_file_name)
+
+    list2 = contact_list.ContactList()
+    list2.load_from_file(test_file_name)
+    assert list2.find_by_email("wqeqw@qweqw.qweq") is list2.contacts[0]
+    list2.add(contact.Contact(email="br@foobar.org"))
+    assert len(list2.contacts) == 1
+
+
+def test_add_new_address_for_known_contact() -> None:
+    list = contact_list.ContactList()
+    list.add(contact.Contact("kevin", "goldsmith", "foo@devnull.com"))
+    list.add(contact.Contact("kevin", "", ["foo@devnull.com", "new@devnull.com"]))
+    list.add(contact.Contact("", "", ["other@devnull.com", "foo@devnull.com"]))
+    assert len(list.contacts) == 1
+    assert list.contacts[0].email == [
+        "foo@devnull.com",
+        "new@devnull.com",
+        "other@devnull.com",
+    ]
+    assert list.find_by_email("other@devnull.com") is list.contacts[0]
+
+
+def test_save_to_file_format(tmp_path: pathlib.Path) -> None:
+    list = contact_list.ContactList()
+    list.add(contact.Contact("kevin", "goldsmith", "foo@devnull.com"))
+    list.add(contact.Contact("Barney", 'Rub"ble', ["br@foobar.org", "wq@qw.qweq"]))
+    test_file_name = str(tmp_path / "testfile.csv")
+    list.save_to_file(test_file_name)
+    with open(test_file_name, "rb") as file:
+        assert file.read() == (
+            b"first_name,last_name,email_1,email_2\r\n"
+            b"kevin,goldsmith,foo@devnull.com,\r\n"
+            b'Barney,"Rub""ble",br@foobar.org,wq@qw.qweq\r\n'
+        )
+
+
+class Unwritable:
+    def __str__(self) -> str:
+        raise RuntimeError("can't write this")
+
+
+def test_save_to_file_interrupted(tmp_path: pathlib.Path) -> None:
+    list = contact_list.ContactList()
+    list.add(contact.Contact("kevin", "goldsmith", "foo@devnull.com"))
+    test_file_name = str(tmp_path / "testfile.csv")
+    list.save_to_file(test_file_name)
+
+    broken = contact.Contact("fred", "flintstone", "ff@aol.com")
+    broken.last_name = Unwritable()  # type: ignore
+    list.contacts.append(broken)
+    with pytest.raises(RuntimeError):
+        list.save_to_file(test_file_name)
+    assert os.listdir(tmp_path) == ["testfile.csv"]
+    list2 = contact_list.ContactList()
+    list2.load_from_file(test_file_name)
+    assert len(list2.contacts) == 1
+
+
+def test_add_many() -> None:
+    list = contact_list.ContactList()
+    list.add(contact.Contact("kevin", "goldsmith", "foo@devnull.com"))
+    result = list.add_many(
+        [
+            contact.Contact(email="foo@devnull.com"),
+            contact.Contact("fred", "flintstone", "ff@aol.com"),
+            contact.Contact("kevin", "goldsmith", "blah@devnull.com"),
+            contact.Contact("fred", "flintstone", "fred@aol.com"),
+            contact.Contact(email="br@foobar.org"),
+        ]
+    )
+    assert result == (2, 3, [])
+    assert [item.first_name for item in list.contacts] == ["kevin", "fred", "br"]
+    assert list.contacts[0].email == ["foo@devnull.com", "blah@devnull.com"]
+    assert list.contacts[1].email == ["ff@aol.com", "fred@aol.com"]
+    assert list.find_by_email("fred@aol.com") is list.contacts[1]
+
+
+def test_add_many_matches_add() -> None:
+    new_contacts = [
+        contact.Contact(email=f"first{n % 7}.last{n % 7}@devnull.com")
+        for n in range(50)
+    ]
+    new_contacts.append(contact.Contact("first3", "last3", "other@aol.com"))
+    one_by_one = contact_list.ContactList()
+    for new_contact in new_contacts:
+        one_by_one.add(
+            contact.Contact(
+                new_contact.first_name, new_contact.last_name, new_contact.email
+            )
+        )
+    batch = contact_list.ContactList()
+    batch.add_many(new_contacts)
+    assert [item.to_dict() for item in batch.contacts] == [
+        item.to_dict() for item in one_by_one.contacts
+    ]
+
+
+def test_add_many_bridges_new_contacts() -> None:
+    list = contact_list.ContactList()
+    result = list.add_many(
+        [
+            contact.Contact("a", "", "a@devnull.com"),
+            contact.Contact("b", "", "b@devnull.com"),
+            contact.Contact("", "", ["a@devnull.com", "b@devnull.com"]),
+        ]
+    )
+    assert result == (1, 2, [])
+    assert list.contacts[0].email == ["a@devnull.com", "b@devnull.com"]
+    assert list.find_by_email("b@devnull.com") is list.contacts[0]
+
+
+def test_add_many_conflicts() -> None:
+    list = contact_list.ContactList()
+    list.add(contact.Contact("kevin", "goldsmith", "foo@devnull.com"))
+    list.add(contact.Contact("fred", "flintstone", "ff@aol.com"))
+    first = contact.Contact(email=["foo@devnull.com", "ff@aol.com"])
+    second = contact.Contact(email=["ff@aol.com", "foo@devnull.com"])
+    result = list.add_many([first, contact.Contact(email="br@foobar.org"), second])
+    assert result.added == 1
+    assert result.conflicts == [first, second]
+    assert len(list.contacts) == 3
+
+
+def test_merge_groups() -> None:
+    contacts = contact_list.ContactList()
+    contacts.add(contact.Contact(email="jane.doe@corp.com"))
+    contacts.add(contact.Contact("Jane", "Doe", "jane@personal.org"))
+    contacts.add(contact.Contact(email="fred@aol.com"))
+    jane, other_jane, fred = contacts.contacts
+    assert contacts.merge_groups([[jane, other_jane], [fred]]) == 1
+    assert contacts.contacts == [jane, fred]
+    assert contacts.find_by_email("jane@personal.org") is jane
+    assert jane.email == ["jane.doe@corp.com", "jane@personal.org"]
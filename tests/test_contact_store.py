@@ -0,0 +1,100 @@
+import pathlib
+
+import contact
+import contact_list
+import contact_store
+
+
+def _store(tmp_path: pathlib.Path) -> contact_store.StoredContactList:
+    return contact_store.StoredContactList(str(tmp_path / "contacts.db"))
+
+
+def test_save_and_reopen(tmp_path: pathlib.Path) -> None:
+    store = _store(tmp_path)
+    assert store.add(contact.Contact("kevin", "goldsmith", "foo@devnull.com"))
+    assert store.add(contact.Contact("fred", "flintstone", "ff@aol.com"))
+    assert len(store) == 2
+    store.save()
+    store.close()
+
+    store = _store(tmp_path)
+    assert len(store) == 2
+    # nothing is loaded until it's looked up
+    assert len(store.contacts) == 0
+    found = store.find_by_email("ff@aol.com")
+    assert found is not None and found.first_name == "fred"
+    assert len(store.contacts) == 1
+    assert store.find_by_email("nobody@aol.com") is None
+    assert len(store.find_by_name("kevin", "goldsmith")) == 1
+    assert str(store) == "contact list: 2 items"
+
+
+def test_add_merges_with_stored(tmp_path: pathlib.Path) -> None:
+    store = _store(tmp_path)
+    store.add(contact.Contact("kevin", "goldsmith", "foo@devnull.com"))
+    store.save()
+    store.close()
+
+    store = _store(tmp_path)
+    assert not store.add(contact.Contact("kevin", "goldsmith", "blah@devnull.com"))
+    assert not store.add(contact.Contact(email="foo@devnull.com"))
+    store.save()
+    assert len(store) == 1
+    store.close()
+
+    store = _store(tmp_path)
+    found = store.find_by_email("blah@devnull.com")
+    assert found is not None
+    assert found.email == ["foo@devnull.com", "blah@devnull.com"]
+
+
+def test_save_only_changed(tmp_path: pathlib.Path) -> None:
+    store = _store(tmp_path)
+    store.add(contact.Contact("kevin", "goldsmith", "foo@devnull.com"))
+    store.add(contact.Contact("fred", "flintstone", "ff@aol.com"))
+    store.save()
+    assert not store._dirty
+    store.add(contact.Contact("fred", "flintstone", "fred@aol.com"))
+    assert len(store._dirty) == 1
+    store.save()
+    assert len(store) == 2
+
+
+def test_add_many_known_not_changed(tmp_path: pathlib.Path) -> None:
+    people = [
+        contact.Contact(f"first{index}", f"last{index}", f"p{index}@x.com")
+        for index in range(5)
+    ]
+    store = _store(tmp_path)
+    store.add_many(people)
+    store.save()
+    store.close()
+
+    store = _store(tmp_path)
+    result = store.add_many(
+        contact.Contact(f"first{index}", f"last{index}", f"p{index}@x.com")
+        for index in range(5)
+    )
+    assert result.added == 0
+    assert not store._dirty
+    store.add_many([contact.Contact("first0", "last0", "other@x.com")])
+    assert len(store._dirty) == 1
+
+
+def test_import_export(tmp_path: pathlib.Path) -> None:
+    csv_list = contact_list.ContactList()
+    csv_list.add(contact.Contact("kevin", "goldsmith", ["foo@devnull.com", "k@g.com"]))
+    csv_list.add(contact.Contact("fred", "flintstone", "ff@aol.com"))
+    csv_list.add(contact.Contact("Barney", "Rubble", "br@foobar.org"))
+    csv_file = tmp_path / "contacts.csv"
+    csv_list.save_to_file(str(csv_file))
+
+    store = _store(tmp_path)
+    store.load_from_file(str(csv_file))
+    assert len(store) == 3
+    found = store.find_by_email("k@g.com")
+    assert found is not None and found.last_name == "goldsmith"
+
+    export_file = tmp_path / "export.csv"
+    store.save_to_file(str(export_file))
+    assert export_file.read_bytes() == csv_file.read_bytes()
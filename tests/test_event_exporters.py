@@ -0,0 +1,90 @@
+import datetime
+import json
+import pathlib
+from typing import List
+
+from icalendar import Event, vCalAddress  # type: ignore
+import pytest
+
+import calendar_event
+import event_exporters
+
+
+def make_events() -> List[calendar_event.CalendarEvent]:
+    events = []
+    for day in range(1, 4):
+        event = Event()
+        event.add("uid", f"e{day}")
+        event.add("summary", "1:1")
+        event.add(
+            "dtstart",
+            datetime.datetime(2023, 1, day, 20, 0, tzinfo=datetime.timezone.utc),
+        )
+        event.add(
+            "dtend",
+            datetime.datetime(2023, 1, day, 20, 30, tzinfo=datetime.timezone.utc),
+        )
+        event.add("dtstamp", datetime.datetime(2022, 12, 2, 0, 0))
+        event.add("organizer", vCalAddress("mailto:fred.flintstone@devnull.com"))
+        event.add("attendee", [vCalAddress("mailto:a@devnull.com"), "mailto:b@x.com"])
+        events.append(calendar_event.CalendarEvent(event))
+    return events
+
+
+def test_exporter_for() -> None:
+    assert event_exporters.exporter_for("cal.csv").name == "csv"
+    assert event_exporters.exporter_for("cal.JSONL").name == "jsonl"
+    assert event_exporters.exporter_for("cal.out").name == "csv"
+    assert event_exporters.exporter_for("cal.csv", "jsonl").name == "jsonl"
+    with pytest.raises(ValueError):
+        event_exporters.exporter_for("cal.csv", "xml")
+    # an exporter that can't write can't be made
+    with pytest.raises(TypeError):
+        type("Incomplete", (event_exporters.EventExporter,), {})()
+
+
+def test_csv(tmp_path: pathlib.Path) -> None:
+    exporter = event_exporters.CsvExporter(batch_size=2)
+    exporter.write(make_events(), str(tmp_path / "a.csv"))
+    exporter.write(make_events()[:1], str(tmp_path / "b.csv"))
+    lines = (tmp_path / "a.csv").read_text().splitlines()
+    assert lines[0] == ",".join(event_exporters.CSV_FIELDS)
+    assert len(lines) == 4
+    assert lines[1].endswith('"a@devnull.com,b@x.com",e1')
+
+    exporter.combine(
+        [str(tmp_path / "a.csv"), str(tmp_path / "b.csv")], str(tmp_path / "c.csv")
+    )
+    combined = (tmp_path / "c.csv").read_text().splitlines()
+    assert combined == lines + [lines[1]]
+
+
+def test_jsonl(tmp_path: pathlib.Path) -> None:
+    exporter = event_exporters.JsonLinesExporter(batch_size=2)
+    exporter.write(make_events(), str(tmp_path / "a.jsonl"))
+    records = [
+        json.loads(line) for line in (tmp_path / "a.jsonl").read_text().splitlines()
+    ]
+    assert [record["uid"] for record in records] == ["e1", "e2", "e3"]
+    assert records[0]["start"] == "2023-01-01T20:00:00+00:00"
+    assert records[0]["attendees"] == ["a@devnull.com", "b@x.com"]
+
+
+def test_parquet(tmp_path: pathlib.Path) -> None:
+    parquet = pytest.importorskip("pyarrow.parquet")
+    exporter = event_exporters.ParquetExporter(batch_size=2)
+    exporter.write(make_events(), str(tmp_path / "a.parquet"))
+    exporter.write([], str(tmp_path / "b.parquet"))
+    exporter.combine(
+        [str(tmp_path / "a.parquet"), str(tmp_path / "b.parquet")],
+        str(tmp_path / "c.parquet"),
+    )
+    parquet_file = parquet.ParquetFile(str(tmp_path / "c.parquet"))
+    assert parquet_file.num_row_groups == 2
+    table = parquet_file.read()
+    assert table.column("uid").to_pylist() == ["e1", "e2", "e3"]
+    assert table.column("start")[0].as_py() == datetime.datetime(
+        2023, 1, 1, 20, 0, tzinfo=datetime.timezone.utc
+    )
+    assert table.column("all_day").to_pylist() == [False] * 3
+    assert table.column("attendees")[0].as_py() == ["a@devnull.com", "b@x.com"]
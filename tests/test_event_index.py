@@ -0,0 +1,152 @@
+import datetime
+from typing import List
+
+from icalendar import Event  # type: ignore
+import pytest
+
+import calendar_event
+import event_index
+
+UTC = datetime.timezone.utc
+
+
+def make_event(
+    uid: str, day: int, hour: float, minutes: int, attendees: List[str]
+) -> calendar_event.CalendarEvent:
+    start = datetime.datetime(2023, 1, day, tzinfo=UTC) + datetime.timedelta(hours=hour)
+    event = Event()
+    event.add("uid", uid)
+    event.add("summary", uid)
+    event.add("dtstart", start)
+    event.add("dtend", start + datetime.timedelta(minutes=minutes))
+    event.add("dtstamp", datetime.datetime(2022, 12, 2, 0, 0))
+    event.add("attendee", [f"mailto:{attendee}" for attendee in attendees])
+    return calendar_event.CalendarEvent(event)
+
+
+def make_index() -> event_index.EventIndex:
+    offsite = Event()
+    offsite.add("uid", "offsite")
+    offsite.add("summary", "offsite")
+    offsite.add("dtstart", datetime.date(2023, 1, 2))
+    offsite.add("dtend", datetime.date(2023, 1, 5))
+    offsite.add("dtstamp", datetime.datetime(2022, 12, 2, 0, 0))
+    offsite.add("attendee", ["mailto:c@x.com"])
+    return event_index.EventIndex(
+        [
+            make_event("standup", 3, 9, 15, ["a@x.com", "b@x.com"]),
+            make_event("review", 3, 10, 60, ["a@x.com"]),
+            make_event("lunch", 3, 10.5, 60, ["a@x.com", "b@x.com"]),
+            calendar_event.CalendarEvent(offsite),
+        ]
+    )
+
+
+def uids(events: List[calendar_event.CalendarEvent]) -> List[str]:
+    return [cal_event.uid for cal_event in events]
+
+
+def at(day: int, hour: float) -> datetime.datetime:
+    return datetime.datetime(2023, 1, day, tzinfo=UTC) + datetime.timedelta(hours=hour)
+
+
+def test_overlapping() -> None:
+    index = make_index()
+    assert str(index) == "event index: 4 events, 3 people"
+    assert uids(index.overlapping(at(3, 9), at(3, 10.25))) == [
+        "offsite",
+        "standup",
+        "review",
+    ]
+    # touching the window doesn't count
+    assert uids(index.overlapping(at(3, 9.25), at(3, 10), "a@x.com")) == []
+    assert uids(index.overlapping(at(6, 0), at(7, 0))) == []
+    assert index.who_is_busy(at(3, 11), at(3, 12)) == {"a@x.com", "b@x.com", "c@x.com"}
+
+
+def test_add() -> None:
+    index = make_index()
+    index.add(make_event("late", 3, 9.5, 15, ["d@x.com"]))
+    assert uids(index.overlapping(at(3, 9), at(3, 10), "d@x.com")) == ["late"]
+    assert uids(index.overlapping(at(3, 9), at(3, 10))) == [
+        "offsite",
+        "standup",
+        "late",
+    ]
+
+
+def test_unsorted_load(monkeypatch: pytest.MonkeyPatch) -> None:
+    # small blocks, so adding splits them
+    monkeypatch.setattr(event_index, "_BLOCK_SIZE", 4)
+    events = [
+        make_event(f"e{index}", 1 + index % 7, (index * 5) % 24, 30, ["a@x.com"])
+        for index in range(50)
+    ]
+    loaded = event_index.EventIndex(events)
+    added = event_index.EventIndex()
+    for cal_event in events:
+        added.add(cal_event)
+    for person in [None, "a@x.com"]:
+        assert uids(loaded.overlapping(at(1, 0), at(9, 0), person)) == uids(
+            added.overlapping(at(1, 0), at(9, 0), person)
+        )
+    assert uids(loaded.overlapping(at(2, 12), at(2, 13))) == ["e36"]
+    assert loaded.people() == ["a@x.com"]
+
+
+def test_query_bound(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(event_index, "_BLOCK_SIZE", 8)
+    intervals = event_index._Intervals()
+    # a month long event and ten thousand one minute meetings during it
+    rows = [(0, 30 * 24 * 3600, "long")]
+    rows.extend((60 * index, 60 * index + 60, f"m{index}") for index in range(10000))
+    intervals.extend(reversed(rows))
+    window = (6000, 6060)
+    assert [row[2] for row in intervals.overlapping(*window)] == ["long", "m100"]
+    # only the blocks with an event in the window are visited, and at most one
+    # more, not every block the long event spans
+    assert len(intervals._blocks_overlapping(*window)) <= 3
+
+
+def test_busy_and_free() -> None:
+    index = make_index()
+    assert index.busy("a@x.com", at(3, 8), at(3, 11)) == [
+        (at(3, 9), at(3, 9.25)),
+        (at(3, 10), at(3, 11)),
+    ]
+    assert index.free("a@x.com", at(3, 8), at(3, 12)) == [
+        (at(3, 8), at(3, 9)),
+        (at(3, 9.25), at(3, 10)),
+        (at(3, 11.5), at(3, 12)),
+    ]
+    assert index.free("c@x.com", at(3, 8), at(3, 12)) == []
+    assert index.free("z@x.com", at(3, 8), at(3, 12)) == [(at(3, 8), at(3, 12))]
+
+
+def test_conflicts() -> None:
+    index = make_index()
+    assert [
+        (first.uid, second.uid) for first, second in index.conflicts("a@x.com")
+    ] == [("review", "lunch")]
+    new_event = make_event("planning", 3, 9, 30, ["b@x.com", "c@x.com"])
+    assert uids(index.conflicts_with(new_event)) == ["offsite", "standup"]
+
+
+def test_query() -> None:
+    index = make_index()
+    window = (at(3, 9), at(3, 10.25))
+    assert [item["uid"] for item in event_index.query(index, "overlaps", *window)] == [
+        "offsite",
+        "standup",
+        "review",
+    ]
+    assert event_index.query(index, "busy", *window) == [
+        "a@x.com",
+        "b@x.com",
+        "c@x.com",
+    ]
+    free = event_index.query(index, "free", *window, person="b@x.com")
+    assert free["busy"] == [[at(3, 9).isoformat(), at(3, 9.25).isoformat()]]
+    assert len(event_index.query(index, "conflicts", *window, person="a@x.com")) == 1
+    with pytest.raises(ValueError):
+        event_index.query(index, "free", *window)
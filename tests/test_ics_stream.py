@@ -0,0 +1,107 @@
+import io
+import pathlib
+
+from icalendar import Calendar  # type: ignore
+
+import ics_stream
+
+CALENDAR = b"""BEGIN:VCALENDAR\r
+VERSION:2.0\r
+PRODID:test\r
+X-WR-CALNAME:Team\r
+BEGIN:VTIMEZONE\r
+TZID:Office Time\r
+BEGIN:STANDARD\r
+DTSTART:19700101T000000\r
+TZOFFSETFROM:+0100\r
+TZOFFSETTO:+0100\r
+END:STANDARD\r
+END:VTIMEZONE\r
+BEGIN:VEVENT\r
+UID:weekly-with-a-very-long-uid-that-the-exporter-folded-onto-a-second-li\r
+ ne@example.com\r
+SUMMARY:Weekly\r
+DTSTART;TZID=Office Time:20230102T090000\r
+DTEND;TZID=Office Time:20230102T093000\r
+DTSTAMP:20221201T000000Z\r
+RRULE:FREQ=WEEKLY;COUNT=4\r
+STATUS:CONFIRMED\r
+BEGIN:VALARM\r
+UID:alarm\r
+ACTION:DISPLAY\r
+TRIGGER:-PT5M\r
+END:VALARM\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+UID:single\r
+SUMMARY:Single\r
+DTSTART:20230103T120000Z\r
+DTEND:20230103T130000Z\r
+DTSTAMP:20221201T000000Z\r
+STATUS:CONFIRMED\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+UID:weekly-with-a-very-long-uid-that-the-exporter-folded-onto-a-second-line@exa\r
+ mple.com\r
+RECURRENCE-ID;TZID=Office Time:20230109T090000\r
+SUMMARY:Weekly moved\r
+DTSTART;TZID=Office Time:20230109T110000\r
+DTEND;TZID=Office Time:20230109T113000\r
+DTSTAMP:20221201T000000Z\r
+STATUS:CONFIRMED\r
+END:VEVENT\r
+END:VCALENDAR\r
+"""
+WEEKLY = "weekly-with-a-very-long-uid-that-the-exporter-folded-onto-a-second-line@example.com"
+
+
+def test_scan(tmp_path: pathlib.Path) -> None:
+    calendar_path = tmp_path / "team.ics"
+    calendar_path.write_bytes(CALENDAR)
+    stream = ics_stream.IcsStream(open(calendar_path, "rb"))
+    assert str(stream) == f"ics stream: {calendar_path}, 2 series, 1 timezones"
+    assert len(stream) == 2
+    template = stream.template()
+    assert template["X-WR-CALNAME"] == "Team"
+    assert [component.name for component in template.subcomponents] == ["VTIMEZONE"]
+    # the modified occurrence is handed out with its series
+    calendars = list(stream.calendars(batch_size=1))
+    assert [
+        [
+            (str(event["uid"]), str(event["summary"]))
+            for event in calendar.walk("VEVENT")
+        ]
+        for calendar in calendars
+    ] == [[(WEEKLY, "Weekly"), (WEEKLY, "Weekly moved")], [("single", "Single")]]
+    assert len(calendars[0].walk("VALARM")) == 1
+    assert calendars[1]["PRODID"] == "test"
+    stream.close()
+
+
+def test_shards() -> None:
+    stream = ics_stream.IcsStream(io.BytesIO(CALENDAR))
+    shards = stream.shards(4)
+    assert [uids for uids, _ in shards] == [[WEEKLY], ["single"]]
+    first_shard = Calendar.from_ical(shards[0][1])
+    assert len(first_shard.walk("VEVENT")) == 2
+    assert len(first_shard.walk("VTIMEZONE")) == 1
+    assert [uids for uids, _ in stream.shards(1)] == [[WEEKLY, "single"]]
+
+
+def test_no_events() -> None:
+    stream = ics_stream.IcsStream(
+        io.StringIO("BEGIN:VCALENDAR\nVERSION:2.0\nPRODID:test\nEND:VCALENDAR\n")
+    )
+    assert len(stream) == 0
+    assert list(stream.calendars()) == []
+    assert stream.template()["PRODID"] == "test"
+    assert stream.shards(2) == []
+
+
+def test_shards_without_events() -> None:
+    # only a timezone, the header is all there is
+    end = CALENDAR.index(b"BEGIN:VEVENT")
+    stream = ics_stream.IcsStream(io.BytesIO(CALENDAR[:end] + b"END:VCALENDAR"))
+    assert len(stream) == 0
+    assert stream.shards(2) == []
+    assert stream.template()["X-WR-CALNAME"] == "Team"
@@ -0,0 +1,72 @@
+import pathlib
+
+from icalendar import Calendar  # type: ignore
+
+import incremental
+
+CALENDAR = b"""BEGIN:VCALENDAR
+VERSION:2.0
+PRODID:test
+BEGIN:VEVENT
+UID:a1
+SUMMARY:Standup
+DTSTART:20230102T170000Z
+DTEND:20230102T171500Z
+DTSTAMP:20221201T000000Z
+RRULE:FREQ=DAILY;COUNT=10
+END:VEVENT
+BEGIN:VEVENT
+UID:a1
+SUMMARY:Standup moved
+RECURRENCE-ID:20230103T170000Z
+DTSTART:20230103T180000Z
+DTEND:20230103T181500Z
+DTSTAMP:20221201T000000Z
+LAST-MODIFIED:20221205T000000Z
+END:VEVENT
+BEGIN:VEVENT
+UID:a2
+SUMMARY:1:1
+DTSTART:20230110T200000Z
+DTEND:20230110T203000Z
+DTSTAMP:20221202T000000Z
+END:VEVENT
+END:VCALENDAR
+"""
+
+
+def test_event_stamps() -> None:
+    stamps, max_stamp = incremental.event_stamps(Calendar.from_ical(CALENDAR))
+    assert set(stamps) == {"a1", "a2"}
+    assert "2022-12-05" in stamps["a1"]
+    assert max_stamp == "2022-12-05T00:00:00+00:00"
+
+
+def test_filter_calendar() -> None:
+    filtered = incremental.filter_calendar(Calendar.from_ical(CALENDAR), {"a1"})
+    assert [str(event["uid"]) for event in filtered.walk("VEVENT")] == ["a1", "a1"]
+    assert filtered["prodid"] == "test"
+
+
+def test_changes(tmp_path: pathlib.Path) -> None:
+    state_file = incremental.state_file_for(str(tmp_path / "cal.csv"))
+    state = incremental.IncrementalState(state_file)
+    changed, removed = state.changes(
+        {"a1": "x", "a2": "y"}, (2023, 1, 1), (2023, 1, 31)
+    )
+    assert changed == {"a1", "a2"}
+    assert not removed
+    state.update({"a1": "x", "a2": "y"}, "y", (2023, 1, 1), (2023, 1, 31))
+    state.save()
+
+    state = incremental.IncrementalState(state_file)
+    assert state.max_stamp == "y"
+    changed, removed = state.changes(
+        {"a1": "z", "a3": "y"}, (2023, 1, 1), (2023, 1, 31)
+    )
+    assert changed == {"a1", "a3"}
+    assert removed == {"a2"}
+    changed, removed = state.changes(
+        {"a1": "x", "a2": "y"}, (2023, 1, 1), (2023, 2, 28)
+    )
+    assert changed == {"a1", "a2"}
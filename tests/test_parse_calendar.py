@@ -0,0 +1,318 @@
+import concurrent.futures
+import datetime
+import io
+import pathlib
+import pickle
+import threading
+from typing import List
+
+from icalendar import Calendar  # type: ignore
+import pytest
+
+from calendar_cache import CalendarCache
+from calendar_event import CalendarEvent
+from contact_list import ContactList
+import parse_calendar
+from pipeline_metrics import PipelineMetrics
+
+CALENDAR = b"""BEGIN:VCALENDAR
+VERSION:2.0
+PRODID:test
+BEGIN:VEVENT
+UID:a1
+SUMMARY:Overnight
+DTSTART:20230131T230000Z
+DTEND:20230201T010000Z
+DTSTAMP:20221201T000000Z
+RRULE:FREQ=WEEKLY;COUNT=30
+STATUS:CONFIRMED
+END:VEVENT
+BEGIN:VEVENT
+UID:a2
+SUMMARY:Allday
+DTSTART;VALUE=DATE:20230301
+DTEND;VALUE=DATE:20230302
+DTSTAMP:20221201T000000Z
+RRULE:FREQ=MONTHLY;COUNT=12
+STATUS:CONFIRMED
+END:VEVENT
+BEGIN:VEVENT
+UID:a3
+SUMMARY:Cancelled
+DTSTART:20230111T200000Z
+DTEND:20230111T203000Z
+DTSTAMP:20221202T000000Z
+STATUS:CANCELLED
+END:VEVENT
+END:VCALENDAR
+"""
+
+
+def meeting_calendar(attendee: str) -> io.BytesIO:
+    calendar_file = io.BytesIO(
+        f"""BEGIN:VCALENDAR
+VERSION:2.0
+PRODID:test
+BEGIN:VEVENT
+UID:m-{attendee}
+SUMMARY:Weekly
+DTSTART:20230102T170000Z
+DTEND:20230102T173000Z
+DTSTAMP:20221201T000000Z
+RRULE:FREQ=WEEKLY;COUNT=3
+STATUS:CONFIRMED
+ORGANIZER:mailto:boss.person@x.com
+ATTENDEE:mailto:{attendee}@x.com
+END:VEVENT
+END:VCALENDAR
+""".encode()
+    )
+    calendar_file.name = f"{attendee}.ics"
+    return calendar_file
+
+
+def test_parse_date() -> None:
+    assert parse_calendar.parse_date("2023-01-31") == (2023, 1, 31)
+    with pytest.raises(ValueError):
+        parse_calendar.parse_date("31/01/2023")
+
+
+def test_expansion_chunks() -> None:
+    chunks = list(
+        parse_calendar._expansion_chunks((2023, 1, 15), (2023, 3, 10), "month")
+    )
+    assert chunks == [
+        (datetime.datetime(2023, 1, 15), datetime.datetime(2023, 2, 1)),
+        (datetime.datetime(2023, 2, 1), datetime.datetime(2023, 3, 1)),
+        (datetime.datetime(2023, 3, 1), datetime.datetime(2023, 3, 10)),
+    ]
+    assert (
+        len(
+            list(parse_calendar._expansion_chunks((2022, 12, 1), (2023, 2, 1), "month"))
+        )
+        == 2
+    )
+    assert (
+        len(list(parse_calendar._expansion_chunks((2023, 1, 1), (2023, 1, 29), "week")))
+        == 4
+    )
+    assert (
+        len(list(parse_calendar._expansion_chunks((2023, 1, 1), (2024, 1, 1), "none")))
+        == 1
+    )
+
+
+def test_expand_events_chunked() -> None:
+    calendar = Calendar.from_ical(CALENDAR)
+    expected = sorted(
+        (str(event["uid"]), event["dtstart"].dt.isoformat())
+        for event in parse_calendar.expand_events(
+            calendar, (2023, 1, 1), (2023, 12, 1), "none"
+        )
+    )
+    assert len(expected) == 30 + 9 + 1
+    for expand_chunk in ["month", "week"]:
+        events = parse_calendar.expand_events(
+            calendar, (2023, 1, 1), (2023, 12, 1), expand_chunk
+        )
+        assert (
+            sorted(
+                (str(event["uid"]), event["dtstart"].dt.isoformat()) for event in events
+            )
+            == expected
+        )
+
+
+def test_confirmed_events() -> None:
+    calendar = Calendar.from_ical(CALENDAR)
+    events = parse_calendar.confirmed_events(
+        parse_calendar.expand_events(calendar, (2023, 1, 1), (2023, 2, 1))
+    )
+    assert [str(event["uid"]) for event in events] == ["a1"]
+
+
+def test_calendar_processor(tmp_path: pathlib.Path) -> None:
+    processor = parse_calendar.CalendarProcessor()
+    seen: List[str] = []
+    count = processor.process(
+        meeting_calendar("jane.doe"),
+        on_event=lambda cal_event: seen.append(cal_event.start.isoformat()),
+    )
+    assert count == 3
+    assert seen[0] == "2023-01-02T17:00:00+00:00"
+    assert processor.contact_list.find_by_email("jane.doe@x.com")
+    # a second processor doesn't see the first one's contacts
+    other = parse_calendar.CalendarProcessor()
+    assert len(list(other.events(meeting_calendar("john.roe")))) == 3
+    assert other.contact_list.find_by_email("jane.doe@x.com") is None
+    assert other.contact_list.find_by_email("john.roe@x.com")
+
+    processor.process(meeting_calendar("john.roe"), str(tmp_path / "cal.csv"))
+    assert len((tmp_path / "cal.csv").read_text().splitlines()) == 4
+    copy = pickle.loads(pickle.dumps(processor))
+    assert copy.contact_list.find_by_email("john.roe@x.com")
+
+
+def test_collect_contacts_metrics() -> None:
+    def collect(contact_list: ContactList, *attendees: str) -> PipelineMetrics:
+        metrics = PipelineMetrics()
+        events = [
+            cal_event
+            for attendee in attendees
+            for cal_event in parse_calendar.calendar_events(
+                meeting_calendar(attendee), (2023, 1, 1), (2023, 2, 1)
+            )
+        ]
+        list(parse_calendar.collect_contacts(events, contact_list, metrics))
+        return metrics
+
+    contact_list = ContactList()
+    # both series have the same organizer, but nothing was in the list yet
+    metrics = collect(contact_list, "jane.doe", "john.roe")
+    assert metrics.counters == {"contacts_added": 3, "contacts_merged": 0}
+    metrics = collect(contact_list, "jane.doe", "ann.poe")
+    assert metrics.counters == {"contacts_added": 1, "contacts_merged": 2}
+
+
+@pytest.mark.parametrize("stored", [False, True])
+def test_calendar_processor_threads(tmp_path: pathlib.Path, stored: bool) -> None:
+    processor = parse_calendar.CalendarProcessor()
+    if stored:
+        processor.load_contacts(
+            str(tmp_path / "contacts.csv"), str(tmp_path / "contacts.db")
+        )
+    names = [f"person{index}.last" for index in range(8)]
+    # the pool's result raises anything a thread raised
+    with concurrent.futures.ThreadPoolExecutor(4) as pool:
+        for count in pool.map(
+            processor.process, [meeting_calendar(name) for name in names]
+        ):
+            assert count == 3
+    assert all(processor.contact_list.find_by_email(f"{name}@x.com") for name in names)
+    assert len(processor.contact_list.contacts) == len(names) + 1
+
+    with concurrent.futures.ThreadPoolExecutor(1) as pool:
+        pool.submit(
+            processor.save_contacts, str(tmp_path / "contacts.csv"), False
+        ).result()
+    copy = pickle.loads(pickle.dumps(processor))
+    assert copy.contact_list.find_by_email("person3.last@x.com")
+    if stored:
+        assert len(copy.contact_list) == len(names) + 1
+        assert not copy.contact_list._dirty
+        copy.process(meeting_calendar("new.person"))
+        assert len(copy.contact_list._dirty) == 1
+        copy.contact_list.save()
+        assert len(copy.contact_list) == len(names) + 2
+
+
+SERIES_CALENDAR = CALENDAR.replace(
+    b"PRODID:test\n",
+    b"""PRODID:test
+X-WR-TIMEZONE:Europe/Berlin
+BEGIN:VEVENT
+UID:b1
+SUMMARY:Standup
+DTSTART:20230102T080000Z
+DTEND:20230102T081500Z
+DTSTAMP:20221201T000000Z
+RRULE:FREQ=DAILY;COUNT=20
+STATUS:CONFIRMED
+END:VEVENT
+BEGIN:VEVENT
+UID:b1
+SUMMARY:Standup moved
+RECURRENCE-ID:20230104T080000Z
+DTSTART:20230104T100000Z
+DTEND:20230104T101500Z
+DTSTAMP:20221201T000000Z
+STATUS:CONFIRMED
+END:VEVENT
+""",
+)
+
+
+def test_shard_calendar() -> None:
+    calendar = Calendar.from_ical(SERIES_CALENDAR)
+    shards = parse_calendar.shard_calendar(calendar, 3)
+    assert [uids for uids, _ in shards] == [["b1"], ["a1", "a2"], ["a3"]]
+    # the modified occurrence stays with its series, the calendar's properties
+    # go in every shard
+    first_shard = Calendar.from_ical(shards[0][1])
+    assert len(first_shard.walk("VEVENT")) == 2
+    assert first_shard["X-WR-TIMEZONE"] == "Europe/Berlin"
+    assert len(parse_calendar.shard_calendar(calendar, 1)) == 1
+
+
+def test_sharded_calendar_events() -> None:
+    def events(expand_workers: int) -> List[CalendarEvent]:
+        calendar_file = io.StringIO(SERIES_CALENDAR.decode())
+        calendar_file.name = "series.ics"
+        return list(
+            parse_calendar.calendar_events(
+                calendar_file,
+                (2023, 1, 1),
+                (2023, 12, 1),
+                expand_workers=expand_workers,
+            )
+        )
+
+    def rows(cal_events: List[CalendarEvent]) -> List[dict]:
+        return [cal_event.dict_for_csv() for cal_event in cal_events]
+
+    sharded = events(2)
+    assert len(sharded) == 20 + 30 + 9
+    assert sorted(rows(sharded), key=str) == sorted(rows(events(0)), key=str)
+    starts = [parse_calendar._start_key(cal_event) for cal_event in sharded]
+    assert starts == sorted(starts)
+    assert rows(events(3)) == rows(sharded)
+    # the X-WR-TIMEZONE calendar was normalized in the workers
+    assert (sharded[0].uid, sharded[0].start.hour) == ("b1", 9)
+    assert sharded[2].summary == "Standup moved"
+
+
+def test_cached_sharded_events(tmp_path: pathlib.Path) -> None:
+    cache = CalendarCache(str(tmp_path / "cache"))
+
+    def starts(expand_workers: int) -> list:
+        processor = parse_calendar.CalendarProcessor(
+            start_date=(2023, 1, 1),
+            end_date=(2023, 12, 1),
+            cache=cache,
+            expand_workers=expand_workers,
+        )
+        calendar_file = io.BytesIO(SERIES_CALENDAR)
+        calendar_file.name = "series.ics"
+        return [
+            parse_calendar._start_key(cal_event)
+            for cal_event in processor.events(calendar_file)
+        ]
+
+    serial = starts(0)
+    assert serial != sorted(serial)
+    # the events cached by the serial run aren't in start order
+    sharded = starts(2)
+    assert sharded == sorted(serial)
+    assert starts(2) == sharded
+
+
+def test_streamed_calendar_events(tmp_path: pathlib.Path) -> None:
+    calendar_path = tmp_path / "series.ics"
+    calendar_path.write_bytes(SERIES_CALENDAR)
+
+    def rows(stream: bool, expand_workers: int = 0) -> List[dict]:
+        with open(calendar_path, "rb") as calendar_file:
+            return [
+                cal_event.dict_for_csv()
+                for cal_event in parse_calendar.calendar_events(
+                    calendar_file,
+                    (2023, 1, 1),
+                    (2023, 12, 1),
+                    expand_workers=expand_workers,
+                    stream=stream,
+                )
+            ]
+
+    streamed = rows(True)
+    assert sorted(streamed, key=str) == sorted(rows(False), key=str)
+    assert rows(True, 2) == rows(False, 2)
@@ -0,0 +1,57 @@
+import json
+import pathlib
+import pickle
+import time
+
+import pipeline_metrics
+
+
+def slow_numbers(count: int) -> list:
+    time.sleep(0.02)
+    return list(range(count))
+
+
+def test_timed() -> None:
+    metrics = pipeline_metrics.PipelineMetrics()
+    numbers = metrics.timed("numbers", iter(slow_numbers(3)))
+    doubled = metrics.timed("doubled", (number * 2 for number in numbers))
+    with metrics.stage("write"):
+        assert list(doubled) == [0, 2, 4]
+    assert metrics.items == {"numbers": 3, "doubled": 3}
+    assert set(metrics.wall) == {"write", "numbers", "doubled"}
+    # the sleep happened before the pipeline was timed
+    assert metrics.wall["write"] < 0.02
+
+
+def test_stage_is_exclusive() -> None:
+    metrics = pipeline_metrics.PipelineMetrics()
+    with metrics.stage("outer"):
+        with metrics.stage("inner"):
+            time.sleep(0.02)
+    assert metrics.wall["inner"] >= 0.02
+    assert metrics.wall["outer"] < 0.02
+
+
+def test_count_and_merge() -> None:
+    metrics = pipeline_metrics.PipelineMetrics()
+    metrics.count("events_seen")
+    metrics.count("events_seen", 2)
+    with metrics.stage("parse"):
+        pass
+    metrics.record_peak_memory()
+    other = pickle.loads(pickle.dumps(metrics))
+    other.count("contacts_added")
+    # a worker's peak goes back with its results
+    assert other.peak_memory_kb == metrics.peak_memory_kb
+    metrics.merge(other)
+    assert metrics.counters == {"events_seen": 6, "contacts_added": 1}
+    assert "parse" in metrics.to_dict()["stages"]
+
+
+def test_save(tmp_path: pathlib.Path) -> None:
+    metrics = pipeline_metrics.PipelineMetrics()
+    metrics.count("events_seen")
+    metrics_file = str(tmp_path / "metrics.json")
+    metrics.save(metrics_file)
+    with open(metrics_file, encoding="utf-8") as file:
+        assert json.load(file)["counters"] == {"events_seen": 1}